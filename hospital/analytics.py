@@ -0,0 +1,211 @@
+"""Doctor utilization, cancellation and no-show analytics computed with NumPy.
+
+A year of appointments is millions of rows, and looping over ORM objects
+to count them takes minutes. ``Analytics.report(start, end)`` instead asks
+SQLite for one packed integer per appointment (doctor id, day, hour and
+status in one int64, see ``PACKED_APPOINTMENTS``), reads them straight from
+the DBAPI cursor into a NumPy array and computes every metric with
+``bincount`` group-bys:
+
+- utilization: booked (not cancelled) appointments over the slots the
+  booking grid offers (``SLOTS_PER_DAY`` per doctor per day, as in
+  ``doctor_availability()``);
+- cancellation rate: cancelled over all appointments;
+- no-show rate: appointments in the past still marked scheduled, over past
+  appointments that were not cancelled;
+- busiest hours: appointments per hour of the day.
+
+Each is given per doctor and per specialization. Reports are cached for
+``ANALYTICS_CACHE_TTL`` seconds per range, and ranges are limited to
+``ANALYTICS_MAX_DAYS``. NumPy is optional: without it ``available`` is
+False and the report views say so.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+from sqlalchemy import select
+
+try:
+    import numpy as np
+except ImportError:  # analytics are optional; the rest of the app doesn't need NumPy
+    np = None
+
+# The booking grid of doctor_availability(): 09:00-17:00 in 30-minute slots, every day
+SLOTS_PER_DAY = 16
+
+SCHEDULED, COMPLETED, CANCELLED = 0, 1, 2
+
+# One int64 per appointment: doctor id << 23 | day offset (16 bits) << 7 | hour (5 bits) << 2 | status (2 bits)
+PACKED_APPOINTMENT = """
+SELECT (doctor_id << 23)
+       | (CAST(julianday(appointment_date) - julianday(:start) AS INTEGER) << 7)
+       | (CAST(substr(appointment_time, 1, 2) AS INTEGER) << 2)
+       | CASE status WHEN 'completed' THEN 1 WHEN 'cancelled' THEN 2 ELSE 0 END
+FROM {table} WHERE appointment_date BETWEEN :start AND :end
+"""
+
+# Current and archived appointments (see archive.py)
+PACKED_APPOINTMENTS = ' UNION ALL '.join(PACKED_APPOINTMENT.format(table=table)
+                                         for table in ('appointment', 'appointment_archive'))
+
+FETCH_SIZE = 500000
+
+
+def load_appointments(connection, start, end):
+    """The packed appointments of start..end as one int64 array."""
+    # The raw sqlite3 cursor: SQLAlchemy would build a Row object per appointment
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(PACKED_APPOINTMENTS, {'start': start.isoformat(), 'end': end.isoformat()})
+        chunks = []
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            chunks.append(np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)))
+    finally:
+        cursor.close()
+    return np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+
+
+def _rates(numerator, denominator):
+    return np.divide(numerator, denominator, out=np.zeros(len(numerator)), where=denominator > 0)
+
+
+def compute(packed, start, end, doctors, today=None):
+    """Metrics per doctor and per specialization.
+
+    doctors is a list of (id, name, specialization id, specialization name);
+    appointments of doctors not in it are ignored.
+    """
+    today = today or date.today()
+    days = (end - start).days + 1
+    status = packed & 3
+    hour = (packed >> 2) & 31
+    day = (packed >> 7) & 0xFFFF
+    doctor_id = packed >> 23
+
+    # Doctor id -> row in `doctors`
+    ids = np.array([doctor[0] for doctor in doctors], dtype=np.int64)
+    size = int(max(ids.max(initial=0), doctor_id.max(initial=0))) + 1
+    lookup = np.full(size, -1, dtype=np.int64)
+    lookup[ids] = np.arange(len(ids))
+    row = lookup[doctor_id]
+    known = row >= 0
+    row, status, hour, day = row[known], status[known], hour[known], day[known]
+
+    count = len(doctors)
+    past = day < (today - start).days
+    by_doctor = {
+        'appointments': np.bincount(row, minlength=count),
+        'cancelled': np.bincount(row[status == CANCELLED], minlength=count),
+        'completed': np.bincount(row[status == COMPLETED], minlength=count),
+        'no_shows': np.bincount(row[past & (status == SCHEDULED)], minlength=count),
+        'past_kept': np.bincount(row[past & (status != CANCELLED)], minlength=count),
+        'capacity': np.full(count, SLOTS_PER_DAY * days),
+    }
+    doctor_hours = np.bincount(row * 24 + hour, minlength=count * 24).reshape(count, 24)
+
+    # Specializations: sum their doctors' columns
+    specializations = sorted({(doctor[2], doctor[3]) for doctor in doctors})
+    position = {specialization_id: index for index, (specialization_id, _) in enumerate(specializations)}
+    group = np.array([position[doctor[2]] for doctor in doctors], dtype=np.int64)
+    by_specialization = {name: np.bincount(group, weights=values, minlength=len(specializations)).astype(np.int64)
+                         for name, values in by_doctor.items()}
+    specialization_hours = np.zeros((len(specializations), 24), dtype=np.int64)
+    np.add.at(specialization_hours, group, doctor_hours)
+
+    doctor_rows = _summaries(by_doctor, doctor_hours, [
+        {'id': doctor[0], 'name': doctor[1], 'specialization': doctor[3]} for doctor in doctors])
+    specialization_rows = _summaries(by_specialization, specialization_hours, [
+        {'id': specialization_id, 'name': name, 'doctors': int((group == index).sum())}
+        for index, (specialization_id, name) in enumerate(specializations)])
+    hours = doctor_hours.sum(axis=0)
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'days': days,
+        'appointments': int(by_doctor['appointments'].sum()),
+        'hours': hours.tolist(),
+        'busiest_hour': int(hours.argmax()) if hours.any() else None,
+        'specializations': specialization_rows,
+        'doctors': doctor_rows,
+    }
+
+
+def _summaries(columns, hours, labels):
+    booked = columns['appointments'] - columns['cancelled']
+    utilization = _rates(booked, columns['capacity'])
+    cancellation_rate = _rates(columns['cancelled'], columns['appointments'])
+    no_show_rate = _rates(columns['no_shows'], columns['past_kept'])
+    busiest = hours.argmax(axis=1)
+    rows = []
+    for index, label in enumerate(labels):
+        rows.append({
+            **label,
+            'appointments': int(columns['appointments'][index]),
+            'booked': int(booked[index]),
+            'completed': int(columns['completed'][index]),
+            'cancelled': int(columns['cancelled'][index]),
+            'no_shows': int(columns['no_shows'][index]),
+            'capacity': int(columns['capacity'][index]),
+            'utilization': round(float(utilization[index]), 4),
+            'cancellation_rate': round(float(cancellation_rate[index]), 4),
+            'no_show_rate': round(float(no_show_rate[index]), 4),
+            'busiest_hour': int(busiest[index]) if hours[index].any() else None,
+            'hours': hours[index].tolist(),
+        })
+    rows.sort(key=lambda summary: summary['utilization'], reverse=True)
+    return rows
+
+
+class Analytics:
+    """Computes and caches the analytics reports."""
+
+    def __init__(self, app=None):
+        self.cache_ttl = 0
+        self.max_days = 0
+        self._cache = OrderedDict()  # (start, end) -> (computed at, report)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ANALYTICS_CACHE_TTL', 300)
+        app.config.setdefault('ANALYTICS_MAX_DAYS', 3 * 366)
+        app.extensions['analytics'] = self
+        self.cache_ttl = app.config['ANALYTICS_CACHE_TTL']
+        self.max_days = app.config['ANALYTICS_MAX_DAYS']
+
+    @property
+    def available(self):
+        return np is not None
+
+    def report(self, start, end):
+        """The report for days start..end, from the cache when it is fresh."""
+        key = (start, end)
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self.cache_ttl:
+            return cached[1]
+
+        from extensions import db
+        from models import Doctor, Specialization
+
+        started = time.perf_counter()
+        connection = db.session.connection()
+        doctors = connection.execute(
+            select(Doctor.id, Doctor.first_name + ' ' + Doctor.last_name, Specialization.id, Specialization.name)
+            .join(Specialization, Doctor.specialization_id == Specialization.id).order_by(Doctor.id)
+        ).all()
+        packed = load_appointments(connection, start, end)
+        report = compute(packed, start, end, doctors)
+        report['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+        with self._lock:
+            self._cache[key] = (time.monotonic(), report)
+            while len(self._cache) > 32:
+                self._cache.popitem(last=False)
+        return report
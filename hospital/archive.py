@@ -0,0 +1,104 @@
+"""Archival of old appointments and medical records.
+
+The hot tables grow forever, and the listings, the conflict check and the
+calendar all pay for years of finished rows they never show. ``Archiver.run()``
+moves appointments and records dated before the horizon (today minus
+``ARCHIVE_AFTER_DAYS``) into ``appointment_archive`` and
+``medical_record_archive`` (models ``ArchivedAppointment`` and
+``ArchivedMedicalRecord``), ``ARCHIVE_BATCH_SIZE`` rows per transaction with
+``ARCHIVE_BATCH_PAUSE`` between transactions, so requests can write in
+between. Rows keep their ids; record files stay where they are.
+
+What sees archived rows:
+
+- history: the patient page, the patient's records page and export, file
+  downloads, bulk exports (bulk_export.py), analytics (analytics.py) and
+  ``rollups.rebuild()``. Archived rows are read-only;
+- not the operational views: appointment listings, the calendar,
+  availability and conflict checks, doctor and dashboard counts.
+
+The move is a plain INSERT ... SELECT and DELETE, below the ORM, so it does
+not touch the report rollups (archived rows still count) or the change feed
+(nothing changed). Deleting a patient deletes their archived rows too.
+
+SQLite gives a new row max(id) + 1, so if the newest row of a table were
+archived its id could be handed out again. The newest row is therefore never
+archived.
+
+    flask --app app archive               # run from cron
+"""
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, func, insert, literal, select
+
+
+def archives():
+    """Hot model -> (archive model, date column name)."""
+    from models import Appointment, ArchivedAppointment, ArchivedMedicalRecord, MedicalRecord
+    return {
+        Appointment: (ArchivedAppointment, 'appointment_date'),
+        MedicalRecord: (ArchivedMedicalRecord, 'record_date'),
+    }
+
+
+class Archiver:
+    """Moves rows past the horizon into the archive tables."""
+
+    def __init__(self, db, app=None):
+        self.db = db
+        self.after_days = 0
+        self.batch_size = 0
+        self.batch_pause = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ARCHIVE_AFTER_DAYS', 2 * 365)
+        app.config.setdefault('ARCHIVE_BATCH_SIZE', 500)
+        app.config.setdefault('ARCHIVE_BATCH_PAUSE', 0.05)  # seconds between batches
+        app.extensions['archiver'] = self
+        self.after_days = app.config['ARCHIVE_AFTER_DAYS']
+        self.batch_size = app.config['ARCHIVE_BATCH_SIZE']
+        self.batch_pause = app.config['ARCHIVE_BATCH_PAUSE']
+
+    def horizon(self, today=None):
+        """Rows dated before this day are archived."""
+        return (today or date.today()) - timedelta(days=self.after_days)
+
+    def run(self, before=None, limit=None):
+        """Archives rows dated before ``before`` (default: the horizon); returns the count per table."""
+        before = before or self.horizon()
+        return {model.__tablename__: self._archive(model, archive_model, date_name, before, limit)
+                for model, (archive_model, date_name) in archives().items()}
+
+    def _archive(self, model, archive_model, date_name, before, limit):
+        hot, archive = model.__table__, archive_model.__table__
+        names = [column.name for column in hot.columns]
+        moved = 0
+        while limit is None or moved < limit:
+            size = self.batch_size if limit is None else min(self.batch_size, limit - moved)
+            with self.db.engine.begin() as connection:
+                newest = select(func.max(hot.c.id)).scalar_subquery()
+                ids = connection.scalars(
+                    select(hot.c.id).where(hot.c[date_name] < before, hot.c.id < newest)
+                    .order_by(hot.c.id).limit(size)).all()
+                if not ids:
+                    break
+                connection.execute(insert(archive).from_select(
+                    names + ['archived_at'],
+                    select(*hot.columns, literal(datetime.utcnow(), archive.c.archived_at.type))
+                    .where(hot.c.id.in_(ids))))
+                connection.execute(delete(hot).where(hot.c.id.in_(ids)))
+            moved += len(ids)
+            time.sleep(self.batch_pause)  # let requests write between batches
+        return moved
+
+    def stats(self):
+        """Rows in the hot and archive tables, and the current horizon."""
+        with self.db.engine.connect() as connection:
+            counts = {model.__tablename__: {
+                'hot': connection.scalar(select(func.count()).select_from(model.__table__)),
+                'archived': connection.scalar(select(func.count()).select_from(archive_model.__table__)),
+            } for model, (archive_model, _) in archives().items()}
+        return {'horizon': self.horizon().isoformat(), 'tables': counts}
@@ -0,0 +1,149 @@
+"""Static asset pipeline: bundling, fingerprinting and precompression.
+
+``flask --app app assets-build`` (or ``python assets.py``) concatenates the
+bundles below, writes each output under ``static/dist`` with a content hash
+in its filename, adds gzip (and brotli, when the ``brotli`` package is
+installed) variants next to it and records the mapping in
+``static/dist/manifest.json``.
+
+At runtime templates call ``asset_url('css/app.css')``. With a manifest the
+URL points at the hashed file under ``/assets/``, which is served with the
+best precompressed variant the client accepts and a far-future immutable
+Cache-Control header. Without a manifest (a fresh checkout, development) it
+falls back to the plain ``static`` URL of the source file.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import abort, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip variants are always built
+    brotli = None
+
+# Output name -> source files (relative to the static folder), concatenated in order
+BUNDLES = {
+    'css/app.css': ['css/style.css'],
+    'js/app.js': ['js/main.js'],
+}
+
+# Per-page stylesheets are fingerprinted one by one rather than bundled, so a
+# page only downloads its own rules and class names cannot clash across pages
+PAGE_STYLES = 'css/pages'
+
+DIST_FOLDER = 'dist'
+MANIFEST_NAME = 'manifest.json'
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def collect_outputs(static_folder):
+    """Returns {output name: [source files]} for the bundles and page styles."""
+    outputs = {name: list(sources) for name, sources in BUNDLES.items()}
+    pages_dir = os.path.join(static_folder, PAGE_STYLES)
+    if os.path.isdir(pages_dir):
+        for filename in sorted(os.listdir(pages_dir)):
+            if filename.endswith('.css'):
+                name = f"{PAGE_STYLES}/{filename}"
+                outputs[name] = [name]
+    return outputs
+
+
+def build(static_folder):
+    """Writes the fingerprinted, precompressed assets and their manifest."""
+    dist = os.path.join(static_folder, DIST_FOLDER)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+
+    for name, sources in collect_outputs(static_folder).items():
+        content = b''
+        for source in sources:
+            with open(os.path.join(static_folder, source), 'rb') as handle:
+                content += handle.read().rstrip() + b'\n'
+
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        stem, extension = os.path.splitext(name)
+        hashed_name = f"{stem}.{digest}{extension}"
+        target = os.path.join(dist, hashed_name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        with open(target, 'wb') as handle:
+            handle.write(content)
+        with open(target + '.gz', 'wb') as handle:
+            handle.write(gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(target + '.br', 'wb') as handle:
+                handle.write(brotli.compress(content, quality=11))
+
+        manifest[name] = hashed_name
+
+    with open(os.path.join(dist, MANIFEST_NAME), 'w') as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+    return manifest
+
+
+class Assets:
+    """Resolves logical asset names and serves the built files."""
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        self.dist_folder = os.path.join(app.static_folder, DIST_FOLDER)
+        self.manifest = self.load_manifest()
+        app.extensions['assets'] = self
+        app.jinja_env.globals['asset_url'] = self.url
+        app.add_url_rule('/assets/<path:filename>', 'asset', self.serve)
+
+    def rebuild(self):
+        """Builds the assets and serves the new manifest; returns it."""
+        self.manifest = build(self.static_folder)
+        return self.manifest
+
+    def load_manifest(self):
+        try:
+            with open(os.path.join(self.dist_folder, MANIFEST_NAME)) as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return {}
+
+    def url(self, name):
+        """URL for a logical asset name such as 'css/app.css'."""
+        hashed_name = self.manifest.get(name)
+        if hashed_name is None:
+            source = BUNDLES.get(name, [name])[0]
+            return url_for('static', filename=source)
+        return url_for('asset', filename=hashed_name)
+
+    def serve(self, filename):
+        if filename not in self.manifest.values():
+            abort(404)
+
+        accepted = request.accept_encodings
+        for encoding, suffix in ENCODINGS:
+            if accepted[encoding] and os.path.exists(os.path.join(self.dist_folder, filename + suffix)):
+                response = send_from_directory(self.dist_folder, filename + suffix,
+                                               mimetype=mimetypes.guess_type(filename)[0], max_age=31536000)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(self.dist_folder, filename, max_age=31536000)
+
+        response.headers['Cache-Control'] = CACHE_CONTROL
+        response.vary.add('Accept-Encoding')
+        return response
+
+
+if __name__ == '__main__':
+    static_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    built = build(static_folder)
+    print(f"Built {len(built)} assets into {os.path.join(static_folder, DIST_FOLDER)}")
@@ -0,0 +1,184 @@
+"""Audit trail: who created, changed, deleted or downloaded what, and when.
+
+Every write view calls ``audit.record(action, entity, entity_id, text)``
+after its commit. That only appends to an in-process buffer; the request
+never waits for an INSERT of its own. A writer thread (started lazily, once
+per process, so it survives a pre-fork server) writes the buffer to the
+``audit_event`` table in one transaction when ``AUDIT_BATCH_SIZE`` events
+are waiting or ``AUDIT_FLUSH_INTERVAL`` seconds have passed, and once more
+at exit. A failed batch stays in the buffer and is retried with the next.
+
+The table is append-only: on SQLite, triggers refuse UPDATE and DELETE.
+
+The newest ``AUDIT_RECENT_SIZE`` events are also kept in a ring buffer, so
+the admin dashboard's activity feed needs no query. Events recorded by
+other workers are picked up by reloading the ring from the table at most
+every ``AUDIT_RECENT_REFRESH`` seconds.
+"""
+import atexit
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime
+
+from flask import session
+from sqlalchemy import DDL, Column, DateTime, Integer, String, event, insert, select
+
+Event = namedtuple('Event', 'created_at user_id username action entity entity_id description')
+
+# (entity, action) -> dashboard title and Font Awesome icon
+ACTIVITY_LABELS = {
+    ('patient', 'create'): ('New Patient Registered', 'user-plus'),
+    ('patient', 'update'): ('Patient Updated', 'user-edit'),
+    ('patient', 'delete'): ('Patient Deleted', 'user-minus'),
+    ('appointment', 'create'): ('Appointment Scheduled', 'calendar-plus'),
+    ('appointment', 'update'): ('Appointment Updated', 'calendar-check'),
+    ('appointment', 'delete'): ('Appointment Deleted', 'calendar-minus'),
+    ('record', 'create'): ('Medical Record Added', 'file-medical'),
+    ('record', 'update'): ('Medical Record Updated', 'file-medical'),
+    ('record', 'delete'): ('Medical Record Deleted', 'file-excel'),
+    ('record', 'download'): ('File Downloaded', 'file-download'),
+    ('patient', 'export'): ('Records Exported', 'file-export'),
+    ('bulk_export', 'export'): ('Bulk Export', 'file-csv'),
+}
+
+
+class AuditLog:
+    """Buffers audit events and writes them in batches from a background thread."""
+
+    def __init__(self, db, app=None):
+        self.db = db
+        self.table = db.Table(
+            'audit_event',
+            Column('id', Integer, primary_key=True),
+            Column('created_at', DateTime, nullable=False, index=True),
+            Column('user_id', Integer),
+            Column('username', String(50)),
+            Column('action', String(20), nullable=False),  # create, update, delete, download, export
+            Column('entity', String(30), nullable=False),  # patient, appointment, record
+            Column('entity_id', Integer),
+            Column('description', String(255), nullable=False),
+        )
+        for operation in ('UPDATE', 'DELETE'):
+            event.listen(self.table, 'after_create', DDL(
+                f"CREATE TRIGGER IF NOT EXISTS audit_event_no_{operation.lower()} BEFORE {operation} "
+                "ON audit_event BEGIN SELECT RAISE(ABORT, 'audit_event is append-only'); END"
+            ).execute_if(dialect='sqlite'))
+        self.app = None
+        self.batch_size = 0
+        self.flush_interval = 0
+        self.recent_refresh = 0
+        self.recorded = 0
+        self.written = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self._pending = []
+        self._recent = deque()
+        self._recent_loaded = None  # monotonic time of the last reload from the table
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._pid = None
+        self._exit_hook = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('AUDIT_BATCH_SIZE', 100)
+        app.config.setdefault('AUDIT_FLUSH_INTERVAL', 2.0)
+        app.config.setdefault('AUDIT_RECENT_SIZE', 50)
+        app.config.setdefault('AUDIT_RECENT_REFRESH', 30)
+        app.extensions['audit'] = self
+        self.app = app
+        self.batch_size = app.config['AUDIT_BATCH_SIZE']
+        self.flush_interval = app.config['AUDIT_FLUSH_INTERVAL']
+        self.recent_refresh = app.config['AUDIT_RECENT_REFRESH']
+        self._recent = deque(self._recent, maxlen=app.config['AUDIT_RECENT_SIZE'])
+        self._recent_loaded = None
+        if not self._exit_hook:
+            atexit.register(self.flush)
+            self._exit_hook = True
+
+    def record(self, action, entity, entity_id=None, description=''):
+        """Queues an event for the signed-in user; call after the change is committed."""
+        audit_event = Event(datetime.now(), session.get('user_id'), session.get('username'),
+                            action, entity, entity_id, description[:255])
+        self._ensure_writer()
+        with self._lock:
+            self._pending.append(audit_event)
+            self._recent.appendleft(audit_event)
+            self.recorded += 1
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.notify()
+
+    def flush(self):
+        """Writes every buffered event in one transaction; returns how many."""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch or self.app is None:
+            return 0
+        try:
+            with self.app.app_context():
+                with self.db.engine.begin() as connection:
+                    connection.execute(insert(self.table), [audit_event._asdict() for audit_event in batch])
+        except Exception:
+            with self._lock:
+                self._pending[:0] = batch
+                self.failed_batches += 1
+            self.app.logger.exception('Could not write %d audit events; will retry', len(batch))
+            return 0
+        with self._lock:
+            self.written += len(batch)
+            self.batches += 1
+        return len(batch)
+
+    def recent(self, limit=10):
+        """Newest events first, from memory; reloads from the table when stale."""
+        loaded = self._recent_loaded
+        if loaded is None or time.monotonic() - loaded >= self.recent_refresh:
+            self._reload_recent()
+        with self._lock:
+            return list(self._recent)[:limit]
+
+    def stats(self):
+        return {'recorded': self.recorded, 'written': self.written, 'pending': len(self._pending),
+                'batches': self.batches, 'failed_batches': self.failed_batches}
+
+    def _reload_recent(self):
+        # Write our own buffer first so the table holds every worker's events
+        self.flush()
+        table = self.table
+        with self.db.engine.connect() as connection:
+            rows = connection.execute(
+                select(*[table.c[field] for field in Event._fields])
+                .order_by(table.c.id.desc()).limit(self._recent.maxlen)
+            ).all()
+        with self._lock:
+            # Events recorded while we were reading are newer than anything in the table
+            events = list(reversed(self._pending)) + [Event(*row) for row in rows]
+            self._recent = deque(events[:self._recent.maxlen], maxlen=self._recent.maxlen)
+            self._recent_loaded = time.monotonic()
+
+    def _ensure_writer(self):
+        # Threads don't survive fork, so a pre-forked worker starts its own writer
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    threading.Thread(target=self._write_loop, name='audit-writer', daemon=True).start()
+                    self._pid = os.getpid()
+
+    def _write_loop(self):
+        while True:
+            with self._lock:
+                if len(self._pending) < self.batch_size:
+                    self._wakeup.wait(self.flush_interval)
+            self.flush()
+
+
+def activity(audit_event):
+    """Dashboard feed item for an event."""
+    title, icon = ACTIVITY_LABELS.get((audit_event.entity, audit_event.action),
+                                      (f'{audit_event.entity.title()} {audit_event.action}', 'history'))
+    who = audit_event.username or 'Someone'
+    return {'action': title, 'description': f'{who}: {audit_event.description}',
+            'timestamp': audit_event.created_at, 'icon': icon}
@@ -0,0 +1,236 @@
+"""Online backups of the SQLite database, and restores from them.
+
+Copying hospital.db while workers write gives a torn file, and locking it
+for the copy stalls every write for as long as the copy takes.
+``Backups.create()`` uses SQLite's online backup API instead, in steps of
+``BACKUP_PAGES_PER_STEP`` pages with a ``BACKUP_STEP_PAUSE`` sleep between
+them, so a multi-gigabyte copy is spread out and leaves I/O for requests:
+
+- in WAL mode (the app's, see create_app) the backup holds one read
+  transaction for the whole copy: it copies a consistent snapshot, and
+  writers are never blocked (the WAL just cannot be checkpointed past the
+  snapshot until the copy ends);
+- in rollback-journal mode (a database no worker has opened since) each
+  step takes the read lock only while it runs. A write between two steps
+  makes SQLite restart the copy; after ``BACKUP_MAX_RESTARTS`` restarts the
+  backup gives up with ``BackupError`` rather than hold the lock and stall
+  writers. Run it again later, at a quieter time.
+
+The copy is checked with ``PRAGMA quick_check``, compressed (zstd with the
+``zstandard`` package, else gzip; ``BACKUP_COMPRESSION``) and written to
+``BACKUP_FOLDER`` as ``hospital-<UTC timestamp>.db[.zst|.gz]`` next to a
+``.json`` manifest with the SHA-256 of the file and of the database inside
+it. After each backup, ``prune()`` applies the retention: the newest
+``BACKUP_KEEP`` backups are kept, and older ones go once they are older than
+``BACKUP_MAX_AGE_DAYS``.
+
+``restore()`` verifies both checksums and the database, then copies it over
+the live database with the backup API, under SQLite's locks, so running
+workers never see a half-restored file. Restart the workers afterwards:
+their caches (principals, fragments, analytics) describe the old data.
+
+    flask --app app backup              # run from cron for scheduled backups
+    flask --app app backup-list
+    flask --app app restore instance/backups/hospital-20250101T020000Z.db.zst
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+try:
+    import zstandard
+except ImportError:  # gzip is always there
+    zstandard = None
+
+EXTENSIONS = {'zstd': '.zst', 'gzip': '.gz', 'none': ''}
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class BackupError(Exception):
+    pass
+
+
+def _open_compressed(path, mode, compression):
+    if compression == 'zstd':
+        stream = open(path, mode)
+        if 'w' in mode:
+            return zstandard.ZstdCompressor(level=10, threads=-1).stream_writer(stream, closefd=True)
+        return zstandard.ZstdDecompressor().stream_reader(stream, closefd=True)
+    if compression == 'gzip':
+        return gzip.open(path, mode, compresslevel=6)
+    return open(path, mode)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _check(path):
+    connection = sqlite3.connect(path)
+    try:
+        result = connection.execute('PRAGMA quick_check').fetchone()[0]
+    finally:
+        connection.close()
+    if result != 'ok':
+        raise BackupError(f'{path} failed quick_check: {result}')
+
+
+class Backups:
+    """Creates, lists, prunes and restores database backups."""
+
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('BACKUP_FOLDER', os.path.join(app.instance_path, 'backups'))
+        app.config.setdefault('BACKUP_PAGES_PER_STEP', 1024)
+        app.config.setdefault('BACKUP_STEP_PAUSE', 0.02)  # seconds between steps
+        app.config.setdefault('BACKUP_MAX_RESTARTS', 3)
+        app.config.setdefault('BACKUP_COMPRESSION', 'zstd' if zstandard is not None else 'gzip')
+        app.config.setdefault('BACKUP_KEEP', 7)
+        app.config.setdefault('BACKUP_MAX_AGE_DAYS', 30)
+        app.extensions['backups'] = self
+        self.app = app
+
+    @property
+    def folder(self):
+        return self.app.config['BACKUP_FOLDER']
+
+    def create(self, database, progress=None):
+        """Backs up the SQLite file ``database``; returns the manifest."""
+        config = self.app.config
+        compression = config['BACKUP_COMPRESSION']
+        if compression == 'zstd' and zstandard is None:
+            raise BackupError('zstd compression needs the zstandard package')
+        os.makedirs(self.folder, exist_ok=True)
+        started = datetime.utcnow()
+        name = f"hospital-{started.strftime('%Y%m%dT%H%M%SZ')}.db{EXTENSIONS[compression]}"
+
+        with tempfile.TemporaryDirectory(dir=self.folder) as workdir:
+            copy = os.path.join(workdir, 'hospital.db')
+            pages, restarts = self._copy(database, copy, progress)
+            _check(copy)
+            database_sha256 = _sha256(copy)
+
+            # Compress into a temporary name: a crash never leaves a truncated backup behind
+            partial = os.path.join(workdir, name)
+            with open(copy, 'rb') as source, _open_compressed(partial, 'wb', compression) as target:
+                shutil.copyfileobj(source, target, CHUNK_SIZE)
+            manifest = {
+                'file': name,
+                'created_at': started.isoformat() + 'Z',
+                'seconds': round((datetime.utcnow() - started).total_seconds(), 1),
+                'source': os.path.abspath(database),
+                'pages': pages,
+                'restarts': restarts,
+                'compression': compression,
+                'database_bytes': os.path.getsize(copy),
+                'database_sha256': database_sha256,
+                'bytes': os.path.getsize(partial),
+                'sha256': _sha256(partial),
+            }
+            os.replace(partial, os.path.join(self.folder, name))
+        with open(os.path.join(self.folder, name + '.json'), 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+        return manifest
+
+    def _copy(self, database, copy, progress):
+        config = self.app.config
+        pause = config['BACKUP_STEP_PAUSE']
+        source = sqlite3.connect(database, timeout=30, isolation_level=None)
+        target = sqlite3.connect(copy)
+        try:
+            wal = source.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+            state = {'remaining': None, 'restarts': 0, 'pages': 0}
+            if wal:
+                # A read transaction the backup steps reuse: they then copy one snapshot and never restart
+                source.execute('BEGIN')
+                source.execute('SELECT count(*) FROM sqlite_master').fetchone()
+
+            def step(status, remaining, pages):
+                if state['remaining'] is not None and remaining >= state['remaining'] > 0:
+                    # Another connection wrote: SQLite started over
+                    state['restarts'] += 1
+                    if state['restarts'] >= config['BACKUP_MAX_RESTARTS']:
+                        raise BackupError(f"The backup restarted {state['restarts']} times because of writes; "
+                                          'try again later (a database in WAL mode never restarts)')
+                state['remaining'], state['pages'] = remaining, pages
+                if progress is not None:
+                    progress(pages - remaining, pages)
+                # Leave I/O (and, in rollback mode, the lock) to requests between steps
+                if remaining:
+                    time.sleep(pause)
+
+            source.backup(target, pages=config['BACKUP_PAGES_PER_STEP'], progress=step)
+            if wal:
+                source.execute('COMMIT')
+            return state['pages'], state['restarts']
+        finally:
+            target.close()
+            source.close()
+
+    def list(self):
+        """Manifests of the backups in the folder, newest first."""
+        if not os.path.isdir(self.folder):
+            return []
+        manifests = []
+        for entry in sorted(os.listdir(self.folder), reverse=True):
+            if entry.startswith('hospital-') and entry.endswith('.json'):
+                with open(os.path.join(self.folder, entry)) as manifest_file:
+                    manifests.append(json.load(manifest_file))
+        return manifests
+
+    def prune(self, now=None):
+        """Applies the retention; returns the names of the backups removed."""
+        now = now or datetime.utcnow()
+        keep = self.app.config['BACKUP_KEEP']
+        max_age = timedelta(days=self.app.config['BACKUP_MAX_AGE_DAYS'])
+        removed = []
+        for manifest in self.list()[keep:]:
+            created_at = datetime.fromisoformat(manifest['created_at'].rstrip('Z'))
+            if now - created_at > max_age:
+                for path in (manifest['file'], manifest['file'] + '.json'):
+                    if os.path.exists(os.path.join(self.folder, path)):
+                        os.remove(os.path.join(self.folder, path))
+                removed.append(manifest['file'])
+        return removed
+
+    def restore(self, backup, database):
+        """Replaces the database ``database`` with the backup file ``backup``; returns its manifest."""
+        with open(backup + '.json') as manifest_file:
+            manifest = json.load(manifest_file)
+        if _sha256(backup) != manifest['sha256']:
+            raise BackupError(f'{backup} does not match the checksum in its manifest')
+        if manifest['compression'] == 'zstd' and zstandard is None:
+            raise BackupError('This backup is zstd-compressed and needs the zstandard package')
+
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(database))) as workdir:
+            copy = os.path.join(workdir, 'hospital.db')
+            with _open_compressed(backup, 'rb', manifest['compression']) as source, open(copy, 'wb') as target:
+                shutil.copyfileobj(source, target, CHUNK_SIZE)
+            if _sha256(copy) != manifest['database_sha256']:
+                raise BackupError(f'The database in {backup} does not match its checksum')
+            _check(copy)
+
+            # One step: the live database is locked for the copy and switches over at once
+            source = sqlite3.connect(copy)
+            target = sqlite3.connect(database, timeout=60)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+        return manifest
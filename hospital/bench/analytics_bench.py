@@ -0,0 +1,114 @@
+"""Analytics report time on a large synthetic appointment table.
+
+Generates a database with bench/synthetic_data.py (20M appointments by
+default; pass --database to reuse one), then times analytics.py on the last
+year and on the whole table. Load is the packed SQL scan and fetch, compute
+the NumPy group-bys. For comparison it times the ORM approach (load
+Appointment objects, count in a Python loop) on --orm-sample appointments
+and extrapolates to the same row counts.
+
+    python bench/analytics_bench.py
+    python bench/analytics_bench.py --appointments 2000000
+    python bench/analytics_bench.py --database /tmp/bench/hospital.db
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from query_bench import BENCH_DIR, HOSPITAL_DIR
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def orm_loop(db, Appointment, limit, today):
+    """The per-object way: hydrate appointments and count them in Python."""
+    counts = Counter()
+    for appointment in db.session.query(Appointment).limit(limit).yield_per(10000):
+        counts[appointment.doctor_id, appointment.status] += 1
+        counts[appointment.doctor_id, appointment.appointment_time.hour] += 1
+        if appointment.status == 'scheduled' and appointment.appointment_date < today:
+            counts[appointment.doctor_id, 'no_show'] += 1
+    db.session.rollback()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', help='existing synthetic database (default: generate one)')
+    parser.add_argument('--appointments', type=int, default=20000000)
+    parser.add_argument('--doctors', type=int, default=500)
+    parser.add_argument('--orm-sample', type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database = args.database
+        if database is None:
+            database = os.path.join(workdir, 'analytics.db')
+            subprocess.run([sys.executable, os.path.join(BENCH_DIR, 'synthetic_data.py'), '--database', database,
+                            '--uploads', os.path.join(workdir, 'uploads'), '--patients', '100000',
+                            '--doctors', str(args.doctors), '--appointments', str(args.appointments),
+                            '--records', '0', '--staff-users', '1'], check=True)
+
+        # The day synthetic_data.py generated the data around (a reused database may predate --today)
+        manifest_path = os.path.splitext(database)[0] + '.manifest.json'
+        today = date.today()
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as handle:
+                today = date.fromisoformat(json.load(handle).get('today', today.isoformat()))
+
+        os.environ['HOSPITAL_DATABASE_URI'] = 'sqlite:///' + os.path.abspath(database)
+        os.environ['HOSPITAL_UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+        sys.path.insert(0, HOSPITAL_DIR)
+        from analytics import compute, load_appointments
+        from app import create_app
+        from extensions import db
+        from models import Appointment, Doctor, Specialization
+        from sqlalchemy import func, select
+
+        app = create_app()
+        results = {}
+        with app.app_context():
+            first, last = db.session.execute(select(func.min(Appointment.appointment_date),
+                                                    func.max(Appointment.appointment_date))).one()
+            _, orm_seconds = timed(orm_loop, db, Appointment, args.orm_sample, today)
+            sampled = min(args.orm_sample, db.session.scalar(select(func.count(Appointment.id))))
+            orm_per_row = orm_seconds / max(sampled, 1)
+
+            connection = db.session.connection()
+            doctors = connection.execute(
+                select(Doctor.id, Doctor.first_name + ' ' + Doctor.last_name, Specialization.id, Specialization.name)
+                .join(Specialization, Doctor.specialization_id == Specialization.id).order_by(Doctor.id)
+            ).all()
+
+            print(f"{'range':10} {'rows':>11} {'load s':>8} {'compute s':>10} {'total s':>8} {'ORM est. s':>11}")
+            for label, start, end in [('last year', today - timedelta(days=364), today),
+                                      ('all', first, last)]:
+                packed, load_seconds = timed(load_appointments, connection, start, end)
+                _, compute_seconds = timed(compute, packed, start, end, doctors, today)
+                results[label] = {
+                    'start': start.isoformat(), 'end': end.isoformat(), 'rows': len(packed),
+                    'load_seconds': round(load_seconds, 2), 'compute_seconds': round(compute_seconds, 3),
+                    'total_seconds': round(load_seconds + compute_seconds, 2),
+                    'orm_estimate_seconds': round(orm_per_row * len(packed), 1),
+                }
+                result = results[label]
+                print(f"{label:10} {result['rows']:>11,} {result['load_seconds']:>8} {result['compute_seconds']:>10} "
+                      f"{result['total_seconds']:>8} {result['orm_estimate_seconds']:>11}")
+                del packed
+
+        print(f"ORM loop: {sampled:,} appointments in {orm_seconds:.2f}s")
+        print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
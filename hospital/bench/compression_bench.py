@@ -0,0 +1,86 @@
+"""Bandwidth and latency of the heavy pages with and without compression.
+
+Seeds a synthetic database (bench/query_bench.py's scale), logs in and
+fetches the appointments listing, patients page, calendar feed and
+availability JSON once per encoding the process supports. For each it
+reports the bytes on the wire, the server time (including compression) and
+the estimated time to the last byte over a slow link:
+
+    latency = server time + RTT + bytes * 8 / bandwidth
+
+    python bench/compression_bench.py --bandwidth-kbps 2000 --rtt-ms 80
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from query_bench import HOSPITAL_DIR, seed_hospital
+
+
+def pages(manifest):
+    first = date.fromisoformat(manifest['first_appointment_day'])
+    busy_day = first + timedelta(days=(date.fromisoformat(manifest['last_appointment_day']) - first).days // 2)
+    week_end = busy_day + timedelta(days=6)
+    return {
+        'appointments (status=cancelled)': '/appointments?status=cancelled',
+        'appointments (one day)': f'/appointments?date={busy_day}',
+        'patients': '/patients',
+        'calendar (one week)': f'/api/calendar-appointments?start={busy_day}&end={week_end}',
+        'doctor availability': f'/api/doctor-availability/1?date={busy_day}',
+    }
+
+
+def fetch(client, url, encoding, repeat):
+    """Size and encoding of the body sent, and the best server time over ``repeat`` fetches."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url, headers={'Accept-Encoding': encoding})
+        body = response.get_data()
+        times.append(time.perf_counter() - started)
+        assert response.status_code == 200, (url, response.status_code)
+    # Bodies under COMPRESS_MIN_SIZE go out uncompressed whatever was asked for
+    return len(body), min(times), response.headers.get('Content-Encoding', 'identity')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bandwidth-kbps', type=float, default=2000, help='link bandwidth, kilobits per second')
+    parser.add_argument('--rtt-ms', type=float, default=80, help='link round-trip time')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database, manifest = seed_hospital(workdir)
+        os.environ['HOSPITAL_DATABASE_URI'] = 'sqlite:///' + database
+        os.environ['HOSPITAL_UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+        os.environ['HOSPITAL_RATE_LIMITS'] = '0'  # repeated API calls from one user
+        sys.path.insert(0, HOSPITAL_DIR)
+        from app import create_app
+
+        app = create_app()
+        client = app.test_client()
+        client.post('/login', data={'username': manifest['staff_users'][0], 'password': manifest['staff_password']})
+        encodings = ['identity'] + list(app.extensions['compression'].encoders)
+
+        results = {}
+        print(f"{'page':34} {'accepted':>9} {'sent':>9} {'bytes':>10} {'ratio':>7} {'server ms':>10} {'latency ms':>11}")
+        for label, url in pages(manifest).items():
+            results[label] = {}
+            for encoding in encodings:
+                size, server, sent = fetch(client, url, encoding, args.repeat)
+                latency = server * 1000 + args.rtt_ms + size * 8 / args.bandwidth_kbps
+                results[label][encoding] = {'sent': sent, 'bytes': size, 'server_ms': round(server * 1000, 1),
+                                            'latency_ms': round(latency, 1)}
+                ratio = size / results[label]['identity']['bytes']
+                print(f"{label:34} {encoding:>9} {sent:>9} {size:>10} {ratio:>7.1%} {server * 1000:>10.1f} {latency:>11.1f}")
+
+        print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
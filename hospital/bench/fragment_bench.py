@@ -0,0 +1,79 @@
+"""Server time and bytes per list interaction: full page vs. list fragment.
+
+Replays the interactions the list pages now handle with partial updates
+(paging, search-as-you-type, filter changes) against a seeded database,
+once as a full page load and once with ``X-Fragment: list``, and reports the
+best server time and the response size, plain and gzip-compressed.
+
+    python bench/fragment_bench.py --repeat 5
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from query_bench import HOSPITAL_DIR, seed_hospital
+
+
+def interactions(manifest):
+    first = date.fromisoformat(manifest['first_appointment_day'])
+    day = first + timedelta(days=(date.fromisoformat(manifest['last_appointment_day']) - first).days // 2)
+    last_name = manifest['last_names'][0]
+    return {
+        'patients: next page': '/patients?page=2',
+        'patients: search as you type': f'/patients?search={last_name[:3]}',
+        'doctors: filter specialization': '/doctors?specialization=2',
+        'appointments: filter day': f'/appointments?view=list&date={day}',
+        'appointments: filter day + doctor': f'/appointments?view=list&date={day}&doctor=1',
+    }
+
+
+def measure(client, url, headers, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url, headers=headers)
+        body = response.get_data()
+        times.append(time.perf_counter() - started)
+        assert response.status_code == 200, (url, response.status_code)
+    return min(times), body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database, manifest = seed_hospital(workdir)
+        os.environ['HOSPITAL_DATABASE_URI'] = 'sqlite:///' + database
+        os.environ['HOSPITAL_UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+        sys.path.insert(0, HOSPITAL_DIR)
+        from app import create_app
+
+        app = create_app()
+        client = app.test_client()
+        client.post('/login', data={'username': manifest['staff_users'][0], 'password': manifest['staff_password']})
+
+        results = {}
+        print(f"{'interaction':36} {'variant':>9} {'server ms':>10} {'bytes':>9} {'gzip bytes':>11}")
+        for label, url in interactions(manifest).items():
+            results[label] = {}
+            for variant, fragment in (('full', None), ('fragment', 'list')):
+                headers = {'Accept-Encoding': 'identity'}
+                if fragment:
+                    headers['X-Fragment'] = fragment
+                server, body = measure(client, url, headers, args.repeat)
+                gzipped = len(client.get(url, headers={**headers, 'Accept-Encoding': 'gzip'}).get_data())
+                results[label][variant] = {'server_ms': round(server * 1000, 2), 'bytes': len(body),
+                                           'gzip_bytes': gzipped}
+                print(f"{label:36} {variant:>9} {server * 1000:>10.2f} {len(body):>9} {gzipped:>11}")
+
+        print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""Memory and CPU per large listing: ORM entities vs. projection rows.
+
+Loads the rows behind the hospital appointments listing and the
+hospital_app index both ways, touching the same fields the templates
+display, and reports wall time, CPU time and peak allocation for each.
+
+    python bench/listing_bench.py
+
+Each app runs in its own subprocess against a database seeded by
+bench/query_bench.py's seeding helpers.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from query_bench import HOSPITAL_APP_DIR, HOSPITAL_DIR, SCALE, seed_hospital, seed_hospital_app
+
+
+def measure(func, repeat):
+    """Best wall/CPU time over ``repeat`` runs and the peak allocation of one run."""
+    walls, cpus = [], []
+    for _ in range(repeat):
+        wall, cpu = time.perf_counter(), time.process_time()
+        rows = func()
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+    tracemalloc.start()
+    rows = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'rows': rows, 'wall_ms': round(min(walls) * 1000, 1), 'cpu_ms': round(min(cpus) * 1000, 1),
+            'peak_kib': round(peak / 1024)}
+
+
+def hospital_cases(workdir):
+    database, _ = seed_hospital(workdir)
+    os.environ['HOSPITAL_DATABASE_URI'] = 'sqlite:///' + database
+    os.environ['HOSPITAL_UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+    sys.path.insert(0, HOSPITAL_DIR)
+    import models as m
+    from app import create_app
+    from extensions import db, statements
+    from projections import AppointmentRow, fetch
+
+    filters = {'status': 'cancelled'}
+
+    def orm():
+        appointments = m.Appointment.query.join(m.Patient).join(m.Doctor)\
+                                    .filter(m.Appointment.status == filters['status'])\
+                                    .order_by(m.Appointment.appointment_date.desc(),
+                                              m.Appointment.appointment_time.desc()).all()
+        for apt in appointments:
+            (apt.appointment_date, apt.appointment_time, apt.status,
+             apt.patient_ref.first_name, apt.patient_ref.last_name, apt.patient_ref.age, apt.patient_ref.gender,
+             apt.doctor_ref.first_name, apt.doctor_ref.last_name, apt.doctor_ref.specialization_ref.name)
+        count = len(appointments)
+        db.session.remove()
+        return count
+
+    def projection():
+        appointments = fetch(db.session.connection(), statements.get('appointment_rows', ('status',)),
+                             AppointmentRow, filters)
+        for apt in appointments:
+            (apt.appointment_date, apt.appointment_time, apt.status,
+             apt.patient_first_name, apt.patient_last_name, apt.patient_age, apt.patient_gender,
+             apt.doctor_first_name, apt.doctor_last_name, apt.specialization_name)
+        count = len(appointments)
+        db.session.remove()
+        return count
+
+    return create_app(), {'hospital appointments (cancelled)': (orm, projection)}
+
+
+def hospital_app_cases(workdir):
+    os.environ['HOSPITAL_APP_DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'hospital_app.db')
+    os.chdir(workdir)
+    sys.path.insert(0, HOSPITAL_APP_DIR)
+    from app import app, init_db
+    import models
+    import projections as p
+
+    with app.app_context():
+        init_db()
+        seed_hospital_app(models.db, models, random.Random(SCALE['seed']))
+
+    def orm():
+        patients = models.Patient.query.all()
+        for patient in patients:
+            (patient.full_name, patient.age, patient.gender)
+        appointments = models.Appointment.query.all()
+        for apt in appointments:
+            (apt.patient.full_name, apt.doctor.full_name, apt.date_time)
+        doctors = models.Doctor.query.all()
+        for doctor in doctors:
+            (doctor.full_name, doctor.specialization)
+        count = len(patients) + len(appointments) + len(doctors)
+        models.db.session.remove()
+        return count
+
+    def projection():
+        connection = models.db.session.connection()
+        patients = p.fetch(connection, p.PATIENT_ROWS, p.PatientRow)
+        for patient in patients:
+            (patient.full_name, patient.age, patient.gender)
+        appointments = p.fetch(connection, p.APPOINTMENT_ROWS, p.AppointmentRow)
+        for apt in appointments:
+            (apt.patient_full_name, apt.doctor_full_name, apt.date_time)
+        doctors = p.fetch(connection, p.DOCTOR_ROWS, p.DoctorRow)
+        for doctor in doctors:
+            (doctor.full_name, doctor.specialization)
+        count = len(patients) + len(appointments) + len(doctors)
+        models.db.session.remove()
+        return count
+
+    return app, {'hospital_app index': (orm, projection)}
+
+
+CASES = {
+    'hospital': hospital_cases,
+    'hospital_app': hospital_app_cases,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--app', choices=sorted(CASES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.app:
+        results = {}
+        with tempfile.TemporaryDirectory() as workdir:
+            app, cases = CASES[args.app](workdir)
+            with app.app_context():
+                for label, (orm, projection) in cases.items():
+                    results[label] = {'orm': measure(orm, args.repeat),
+                                      'projection': measure(projection, args.repeat)}
+        print(json.dumps(results))
+        return
+
+    print(f"{'listing':36} {'rows':>7} {'path':>11} {'wall ms':>9} {'cpu ms':>9} {'peak KiB':>10}")
+    for name in sorted(CASES):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--app', name,
+                                 '--repeat', str(args.repeat)], check=True, capture_output=True, text=True).stdout
+        for label, paths in json.loads(output.strip().splitlines()[-1]).items():
+            for path, stats in paths.items():
+                print(f"{label:36} {stats['rows']:>7} {path:>11} {stats['wall_ms']:>9} {stats['cpu_ms']:>9} {stats['peak_kib']:>10}")
+            orm, projection = paths['orm'], paths['projection']
+            print(f"{'':36} {'':>7} {'saved':>11} {1 - projection['wall_ms'] / orm['wall_ms']:>9.0%} "
+                  f"{1 - projection['cpu_ms'] / orm['cpu_ms']:>9.0%} {1 - projection['peak_kib'] / orm['peak_kib']:>10.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+"""Scripted HTTP load test for the hospital app.
+
+Start the app against a synthetic database (see bench/synthetic_data.py),
+then run for example:
+
+    python bench/loadtest.py --manifest /tmp/bench/hospital.manifest.json \\
+        --base-url http://127.0.0.1:5000 --concurrency 16 --duration 60 \\
+        --output results/baseline.json
+
+    python bench/loadtest.py ... --output results/after.json --compare results/baseline.json
+
+Each virtual user logs in with its own staff account and then picks
+scenarios according to their weights. Virtual users call the API far
+faster than people do, so start the app with ``HOSPITAL_RATE_LIMITS=0``
+unless the run is meant to exercise the rate limits. Latency percentiles and throughput are
+reported per scenario and saved as JSON so runs can be compared.
+"""
+import argparse
+import http.cookiejar
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import date, datetime, timedelta
+
+# Scenario name -> relative weight in the mix
+DEFAULT_MIX = {
+    'login': 2,
+    'patients_search': 20,
+    'patients_page': 10,
+    'appointments_filter': 20,
+    'doctor_availability': 20,
+    'calendar': 10,
+    'upload': 3,
+    'export_txt': 3,
+    'export_docx': 1,
+}
+
+
+class HttpError(Exception):
+    pass
+
+
+class VirtualUser:
+    """One logged-in browser session issuing scenario requests."""
+
+    def __init__(self, base_url, username, password, manifest, rng, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.manifest = manifest
+        self.rng = rng
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+            NoRedirect(),
+        )
+
+    def request(self, path, data=None, headers=None):
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers or {})
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                body = response.read()
+                status = response.status
+        except urllib.error.HTTPError as error:
+            body = error.read()
+            status = error.code
+        if status >= 400:
+            raise HttpError(f"{status} for {path}")
+        return len(body)
+
+    # Scenarios -------------------------------------------------------------
+
+    def login(self):
+        form = urllib.parse.urlencode({'username': self.username, 'password': self.password}).encode()
+        return self.request('/login', form, {'Content-Type': 'application/x-www-form-urlencoded'})
+
+    def patients_search(self):
+        term = self.rng.choice(self.manifest['last_names'])[:self.rng.randint(3, 6)]
+        return self.request('/patients?' + urllib.parse.urlencode({'search': term}))
+
+    def patients_page(self):
+        last_page = max(self.manifest['patients'] // 10, 1)
+        return self.request(f"/patients?page={self.rng.randint(1, last_page)}")
+
+    def appointments_filter(self):
+        params = {'doctor': self.random_doctor(), 'date': self.random_day()}
+        if self.rng.random() < 0.5:
+            params['status'] = self.rng.choice(['scheduled', 'completed', 'cancelled'])
+        return self.request('/appointments?' + urllib.parse.urlencode(params))
+
+    def doctor_availability(self):
+        return self.request(f"/api/doctor-availability/{self.random_doctor()}?date={self.random_day()}")
+
+    def calendar(self):
+        start = date.fromisoformat(self.random_day())
+        end = start + timedelta(days=6)
+        return self.request(f"/api/calendar-appointments?start={start}&end={end}")
+
+    def upload(self):
+        boundary = uuid.uuid4().hex
+        content = (f"Diagnosis: {self.rng.choice(self.manifest['diagnoses'])}\n"
+                   "Observation: load test upload.\n" * 200).encode()
+        fields = {
+            'record_date': date.today().isoformat(),
+            'diagnosis': self.rng.choice(self.manifest['diagnoses']),
+            'description': 'Uploaded by the load test',
+        }
+        body = b''.join(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+            for name, value in fields.items()
+        )
+        body += (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="loadtest.txt"\r\n'
+                 'Content-Type: text/plain\r\n\r\n').encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+        return self.request(f"/patients/{self.random_patient()}/records/add", body,
+                            {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+
+    def export_txt(self):
+        return self.request(f"/patients/{self.random_patient()}/export?format=txt")
+
+    def export_docx(self):
+        return self.request(f"/patients/{self.random_patient()}/export?format=docx")
+
+    # Helpers ---------------------------------------------------------------
+
+    def random_patient(self):
+        return self.rng.randint(1, self.manifest['patients'])
+
+    def random_doctor(self):
+        return self.rng.randint(1, self.manifest['doctors'])
+
+    def random_day(self):
+        first = date.fromisoformat(self.manifest['first_appointment_day'])
+        last = date.fromisoformat(self.manifest['last_appointment_day'])
+        return (first + timedelta(days=self.rng.randrange((last - first).days + 1))).isoformat()
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Keeps redirects out of the measurement; a 302 counts as the response."""
+
+    def http_error_302(self, request, response, code, message, headers):
+        return response
+
+    http_error_301 = http_error_303 = http_error_307 = http_error_302
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, errors, elapsed):
+    latencies = sorted(latency for latency, _ in samples)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else 0,
+        'bytes': sum(size for _, size in samples),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else None,
+    }
+
+
+def run(args, manifest, mix):
+    samples = {name: [] for name in mix}
+    errors = {name: 0 for name in mix}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    issued = [0]
+
+    def worker(index):
+        rng = random.Random(args.seed * 1000 + index)
+        staff = manifest['staff_users']
+        user = VirtualUser(args.base_url, staff[index % len(staff)], manifest['staff_password'],
+                           manifest, rng, args.timeout)
+        user.login()
+        while time.perf_counter() < deadline:
+            with lock:
+                if args.requests and issued[0] >= args.requests:
+                    return
+                issued[0] += 1
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                size = getattr(user, name)()
+            except (HttpError, OSError):
+                with lock:
+                    errors[name] += 1
+                continue
+            latency = time.perf_counter() - started
+            with lock:
+                samples[name].append((latency, size))
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    all_samples = [sample for values in samples.values() for sample in values]
+    return {
+        'meta': {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'base_url': args.base_url,
+            'concurrency': args.concurrency,
+            'duration_s': round(elapsed, 2),
+            'seed': args.seed,
+            'mix': mix,
+            'dataset': {key: manifest[key] for key in ('patients', 'doctors', 'appointments', 'records', 'seed')},
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'label': args.label,
+        },
+        'overall': summarize(all_samples, sum(errors.values()), elapsed),
+        'scenarios': {name: summarize(samples[name], errors[name], elapsed) for name in mix},
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_report(results, baseline=None):
+    header = f"{'scenario':22} {'reqs':>7} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    print(header)
+    print('-' * len(header))
+    rows = list(results['scenarios'].items()) + [('overall', results['overall'])]
+    for name, stats in rows:
+        line = (f"{name:22} {stats['requests']:>7} {stats['errors']:>5} {stats['throughput_rps']:>8} "
+                f"{fmt(stats['p50_ms']):>9} {fmt(stats['p95_ms']):>9} {fmt(stats['p99_ms']):>9}")
+        if baseline:
+            old = baseline['overall'] if name == 'overall' else baseline['scenarios'].get(name)
+            if old and old['p95_ms'] and stats['p95_ms']:
+                line += f"   p95 {change(old['p95_ms'], stats['p95_ms'])}, rps {change(old['throughput_rps'], stats['throughput_rps'])}"
+        print(line)
+
+
+def fmt(value):
+    return '-' if value is None else f"{value:.1f}"
+
+
+def change(old, new):
+    if not old:
+        return 'n/a'
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--manifest', required=True, help='manifest written by synthetic_data.py')
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run')
+    parser.add_argument('--requests', type=int, default=0, help='stop after this many requests (0 = no limit)')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--mix', help='JSON object overriding scenario weights, e.g. \'{"upload": 0}\'')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--label', help='free-form note stored with the results')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='earlier results JSON to compare against')
+    args = parser.parse_args()
+
+    with open(args.manifest) as handle:
+        manifest = json.load(handle)
+    mix = dict(DEFAULT_MIX)
+    if args.mix:
+        mix.update(json.loads(args.mix))
+    mix = {name: weight for name, weight in mix.items() if weight > 0}
+    unknown = set(mix) - set(DEFAULT_MIX)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = run(args, manifest, mix)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)
+    print_report(results, baseline)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as handle:
+            json.dump(results, handle, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Logins per second under a burst of concurrent sign-ins.
+
+Creates ``--users`` staff accounts hashed with each method under test, then
+posts ``--logins`` logins from ``--concurrency`` threads through the test
+client (one client per thread) and reports throughput, latency percentiles
+and the hash pool's queue metrics. A method passes when the p99 of
+successful logins stays under ``--p99-budget`` milliseconds. Logins turned
+away with 503 (the queue is full, or the wait would exceed
+``PASSWORD_HASH_MAX_WAIT``, see passwords.py) are counted separately and
+retried after ``--backoff`` seconds, as a person would press the button
+again; lowering ``--queue-limit`` or ``--max-wait`` trades them against
+latency.
+
+    python bench/login_bench.py --concurrency 32 --logins 400
+    python bench/login_bench.py --methods scrypt:16384:8:1,pbkdf2:sha256:600000 --workers 2
+    python bench/login_bench.py --queue-limit 4
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from query_bench import HOSPITAL_DIR
+
+DEFAULT_METHODS = ['scrypt', 'scrypt:16384:8:1', 'pbkdf2:sha256:600000', 'pbkdf2:sha256:200000']
+PASSWORD = 'shift-change'
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def burst(app, usernames, logins, concurrency, backoff):
+    latencies, statuses = [], []
+    lock = threading.Lock()
+    remaining = iter(range(logins))
+
+    def worker():
+        client = app.test_client()
+        while True:
+            with lock:
+                index = next(remaining, None)
+            if index is None:
+                return
+            while True:
+                started = time.perf_counter()
+                response = client.post('/login', data={'username': usernames[index % len(usernames)],
+                                                       'password': PASSWORD})
+                elapsed = time.perf_counter() - started
+                with lock:
+                    if response.status_code == 302:
+                        latencies.append(elapsed)
+                    statuses.append(response.status_code)
+                if response.status_code != 503:
+                    break
+                time.sleep(backoff)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, sorted(latencies), statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--methods', default=','.join(DEFAULT_METHODS), help='comma-separated hash methods')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--workers', type=int, help='PASSWORD_HASH_WORKERS (default: CPU count)')
+    parser.add_argument('--queue-limit', type=int, default=64)
+    parser.add_argument('--max-wait', type=float, help='PASSWORD_HASH_MAX_WAIT in seconds (default: the app\'s)')
+    parser.add_argument('--backoff', type=float, default=0.5, help='seconds a client waits to retry after a 503')
+    parser.add_argument('--p99-budget', type=float, default=300, help='milliseconds')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ['HOSPITAL_DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'hospital.db')
+        os.environ['HOSPITAL_UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+        os.environ['HOSPITAL_RATE_LIMITS'] = '0'  # one client address signs everyone in
+        sys.path.insert(0, HOSPITAL_DIR)
+        from app import create_app
+        from cli import init_database
+        from extensions import db, passwords
+        from models import User
+
+        results = {}
+        print(f"{'method':24} {'hash ms':>8} {'logins/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'503s':>5} "
+              f"{'max queued':>10} {'wait ms':>8} {'p99 ok':>6}")
+        for method in [name.strip() for name in args.methods.split(',') if name.strip()]:
+            config = {'PASSWORD_HASH_METHOD': method, 'PASSWORD_HASH_QUEUE_LIMIT': args.queue_limit}
+            if args.workers:
+                config['PASSWORD_HASH_WORKERS'] = args.workers
+            if args.max_wait is not None:
+                config['PASSWORD_HASH_MAX_WAIT'] = args.max_wait
+            app = create_app(config)
+            usernames = [f'shift{i:03d}' for i in range(args.users)]
+            with app.app_context():
+                init_database(echo=lambda message: None)
+                User.query.filter(User.username.like('shift%')).delete(synchronize_session=False)
+                started = time.perf_counter()
+                password_hash = passwords.hash(PASSWORD)
+                hash_ms = (time.perf_counter() - started) * 1000
+                db.session.add_all([User(username=name, password_hash=password_hash, first_name='Shift',
+                                         last_name='Worker', role='user') for name in usernames])
+                db.session.commit()
+
+            passwords.max_queued = 0
+            completed, waited = passwords.completed, passwords.wait_seconds
+            elapsed, latencies, statuses = burst(app, usernames, args.logins, args.concurrency, args.backoff)
+            hashes = passwords.completed - completed
+            ok = statuses.count(302)
+            p99 = percentile(latencies, 0.99) * 1000
+            results[method] = {
+                'hash_ms': round(hash_ms, 1),
+                'logins_per_second': round(ok / elapsed, 1),
+                'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+                'p99_ms': round(p99, 1),
+                'rejected': statuses.count(503),
+                'failed': len(statuses) - ok - statuses.count(503),
+                'max_queued': passwords.max_queued,
+                'avg_wait_ms': round((passwords.wait_seconds - waited) / max(hashes, 1) * 1000, 1),
+                'p99_within_budget': p99 < args.p99_budget,
+            }
+            result = results[method]
+            print(f"{method:24} {result['hash_ms']:>8} {result['logins_per_second']:>9} {result['p50_ms']:>8} "
+                  f"{result['p99_ms']:>8} {result['rejected']:>5} {result['max_queued']:>10} "
+                  f"{result['avg_wait_ms']:>8} {'yes' if result['p99_within_budget'] else 'no':>6}")
+
+        print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""Memory ceiling checks for the export and upload routes.
+
+Builds a throwaway database with one large synthetic patient, drives the
+export and upload routes of both hospital apps through the Flask test client
+and fails when a route's peak allocation goes over its ceiling.
+
+    python bench/memory_ceilings.py                  # both apps
+    python bench/memory_ceilings.py --records 5000   # bigger patient
+
+Each app runs in its own subprocess against a temporary directory, so the
+real instance databases and upload folders are never touched.
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+HOSPITAL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOSPITAL_APP_DIR = os.path.join(os.path.dirname(HOSPITAL_DIR), 'hospital_app')
+
+MiB = 1024 * 1024
+
+# Allowed peak per route: a fixed allowance plus a per-record allowance
+CEILINGS = {
+    'hospital.export_txt': (8 * MiB, 6 * 1024),
+    'hospital.export_docx': (8 * MiB, 8 * 1024),
+    'hospital.upload': (40 * MiB, 0),
+    'hospital_app.export_all_records': (8 * MiB, 8 * 1024),
+    'hospital_app.upload_record': (40 * MiB, 0),
+}
+
+DESCRIPTION = ('Patient presented with intermittent symptoms; vitals recorded and '
+               'follow-up scheduled. ' * 24).strip()
+
+
+def ceiling_for(name, records):
+    fixed, per_record = CEILINGS[name]
+    return fixed + per_record * records
+
+
+def upload_payload(size):
+    """Returns a text attachment of roughly ``size`` bytes."""
+    header = 'Diagnosis: Hypertension\nDate: January 05, 2025\n\n'
+    line = 'Observation: blood pressure stable, continue current medication.\n'
+    return (header + line * (size // len(line))).encode('utf-8')
+
+
+def measure(call):
+    """Runs ``call`` and returns (result, peak bytes allocated while it ran)."""
+    baseline = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    result = call()
+    return result, tracemalloc.get_traced_memory()[1] - baseline
+
+
+def run_hospital(workdir, records, upload_size):
+    os.environ['HOSPITAL_DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'hospital.db')
+    os.environ['HOSPITAL_UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+    os.environ['HOSPITAL_MEMORY_PROFILING'] = '1'
+    os.environ['HOSPITAL_RATE_LIMITS'] = '0'  # repeated exports/uploads from one user
+    sys.path.insert(0, HOSPITAL_DIR)
+
+    from app import create_app
+    from cli import init_database
+    from extensions import db, memory_budget
+    from models import Patient, MedicalRecord
+
+    app = create_app()
+    with app.app_context():
+        init_database(echo=lambda message: None)
+        patient = Patient(first_name='Synthetic', last_name='Patient',
+                          date_of_birth=date(1950, 1, 1), gender='Female')
+        db.session.add(patient)
+        db.session.flush()
+        start = date.today() - timedelta(days=records)
+        db.session.bulk_insert_mappings(MedicalRecord, [
+            {
+                'patient_id': patient.id,
+                'diagnosis': f'Diagnosis {i % 40}',
+                'description': DESCRIPTION,
+                'file_name': f'scan_{i}.pdf' if i % 3 == 0 else None,
+                'record_date': start + timedelta(days=i),
+                'created_at': datetime.utcnow(),
+            }
+            for i in range(records)
+        ])
+        db.session.commit()
+        patient_id = patient.id
+
+    # Buffered responses are closed by the client, which ends the measurement
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    def peak_of(endpoint):
+        return memory_budget.report()[endpoint]['last_peak']
+
+    results = {}
+    response = client.get(f'/patients/{patient_id}/export?format=txt', buffered=True)
+    assert response.status_code == 200, response.status_code
+    results['hospital.export_txt'] = peak_of('exports.export_patient_records')
+
+    response = client.get(f'/patients/{patient_id}/export?format=docx', buffered=True)
+    assert response.status_code == 200, response.status_code
+    results['hospital.export_docx'] = peak_of('exports.export_patient_records')
+
+    response = client.post(f'/patients/{patient_id}/records/add', data={
+        'record_date': date.today().strftime('%Y-%m-%d'),
+        'diagnosis': 'Hypertension',
+        'description': 'Uploaded by the memory ceiling check',
+        'file': (io.BytesIO(upload_payload(upload_size)), 'large_record.txt'),
+    }, content_type='multipart/form-data', buffered=True)
+    assert response.status_code == 302, response.status_code
+    results['hospital.upload'] = peak_of('records.add_medical_record')
+    return results
+
+
+def run_hospital_app(workdir, records, upload_size):
+    os.environ['HOSPITAL_APP_DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'hospital.db')
+    os.chdir(workdir)  # hospital_app stores uploads relative to the working directory
+    sys.path.insert(0, HOSPITAL_APP_DIR)
+
+    from app import app, init_db
+    from models import db, Patient, MedicalRecord
+
+    with app.app_context():
+        init_db()
+        patient = Patient(first_name='Synthetic', last_name='Patient',
+                          date_of_birth=date(1950, 1, 1), gender='Female')
+        db.session.add(patient)
+        db.session.flush()
+        db.session.bulk_insert_mappings(MedicalRecord, [
+            {
+                'patient_id': patient.id,
+                'filename': f'record_{i}.txt',
+                'file_path': f'uploads/record_{i}.txt',
+                'diagnosis_summary': f'Diagnosis {i % 40}',
+                'upload_date': datetime.utcnow(),
+                'full_content': DESCRIPTION,
+            }
+            for i in range(records)
+        ])
+        db.session.commit()
+        patient_id = patient.id
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'Administrator', 'password': 'password'})
+
+    results = {}
+    response, peak = measure(lambda: client.get(f'/export_all_records/{patient_id}'))
+    assert response.status_code == 200, response.status_code
+    results['hospital_app.export_all_records'] = peak
+
+    response, peak = measure(lambda: client.post(f'/upload_record/{patient_id}', data={
+        'file': (io.BytesIO(upload_payload(upload_size)), 'large_record.txt'),
+    }, content_type='multipart/form-data'))
+    assert response.status_code == 302, response.status_code
+    results['hospital_app.upload_record'] = peak
+    return results
+
+
+RUNNERS = {
+    'hospital': run_hospital,
+    'hospital_app': run_hospital_app,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=2000, help='medical records on the synthetic patient')
+    parser.add_argument('--upload-mb', type=int, default=8, help='size of the uploaded attachment')
+    parser.add_argument('--app', choices=sorted(RUNNERS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    upload_size = args.upload_mb * MiB
+
+    if args.app:
+        # Child process: measure one app and print the peaks as JSON
+        tracemalloc.start()
+        with tempfile.TemporaryDirectory() as workdir:
+            os.makedirs(os.path.join(workdir, 'uploads'))
+            results = RUNNERS[args.app](workdir, args.records, upload_size)
+        print(json.dumps(results))
+        return 0
+
+    results = {}
+    for name in sorted(RUNNERS):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--app', name,
+             '--records', str(args.records), '--upload-mb', str(args.upload_mb)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results.update(json.loads(output.strip().splitlines()[-1]))
+
+    failures = 0
+    for name, peak in sorted(results.items()):
+        ceiling = ceiling_for(name, args.records)
+        status = 'ok' if peak <= ceiling else 'OVER'
+        failures += status != 'ok'
+        print(f"{name:36} peak {peak / MiB:8.1f} MiB   ceiling {ceiling / MiB:8.1f} MiB   {status}")
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
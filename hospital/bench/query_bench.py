@@ -0,0 +1,471 @@
+"""Query-level micro-benchmarks with regression thresholds.
+
+Runs the queries behind the hot routes of hospital/ and hospital_app/
+against seeded SQLite databases, recording the median time and the number
+of SQL statements each one issues. Benchmarks call the apps' registered
+statements, projections and view helpers themselves, so they follow the
+routes as those change; only queries a view builds inline are mirrored.
+
+    python bench/query_bench.py                    # compare with the stored baseline
+    python bench/query_bench.py --save-baseline    # record a new baseline
+    python bench/query_bench.py -k appointments    # only matching benchmarks
+
+A benchmark fails when its median time exceeds the baseline by more than
+--tolerance, or when it issues more statements than the baseline did.
+Timings are machine dependent: record the baseline on the machine that runs
+the comparison.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+
+from sqlalchemy.orm import contains_eager
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+HOSPITAL_DIR = os.path.dirname(BENCH_DIR)
+HOSPITAL_APP_DIR = os.path.join(os.path.dirname(HOSPITAL_DIR), 'hospital_app')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baselines', 'queries.json')
+
+# Dataset sizes the baseline was recorded with
+SCALE = {
+    'patients': 20000,
+    'doctors': 100,
+    'appointments': 200000,
+    'records': 50000,
+    'seed': 7,
+}
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Registers a query shape; ``name`` is prefixed with the app it belongs to."""
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+class Context:
+    """What a benchmark gets: the app's modules and a seeded random source.
+
+    ``statements``, ``projections`` and ``helpers`` are the app's own
+    registry (queries.py), Core projections and view helpers, so a
+    benchmark runs what the route runs rather than a copy of it.
+    """
+
+    def __init__(self, models, db, rng, manifest, statements=None, projections=None, helpers=None, purger=None):
+        self.models = models
+        self.db = db
+        self.rng = rng
+        self.manifest = manifest
+        self.statements = statements
+        self.projections = projections
+        self.helpers = helpers
+        self.purger = purger
+
+    def patient_id(self):
+        return self.rng.randint(1, self.manifest['patients'])
+
+    def doctor_id(self):
+        return self.rng.randint(1, self.manifest['doctors'])
+
+    def day(self):
+        first = date.fromisoformat(self.manifest['first_appointment_day'])
+        last = date.fromisoformat(self.manifest['last_appointment_day'])
+        return first + timedelta(days=self.rng.randrange((last - first).days + 1))
+
+    def today(self):
+        """The day the data was generated around (see synthetic_data.py --today)."""
+        return date.fromisoformat(self.manifest.get('today', date.today().isoformat()))
+
+    def slot(self):
+        return dt_time(9 + self.rng.randrange(8), self.rng.choice([0, 30]))
+
+
+# hospital/views -------------------------------------------------------------
+# Routes that go through the statement registry, the projections or a view
+# helper are benchmarked through them; the rest build their ORM queries
+# inline in the view and are mirrored here.
+
+@benchmark('hospital.patients_search')
+def patients_search(ctx):
+    Patient = ctx.models.Patient
+    search = ctx.rng.choice(ctx.manifest['last_names'])[:4]
+    criteria = [
+        (Patient.first_name.contains(search)) |
+        (Patient.last_name.contains(search)) |
+        (Patient.phone.contains(search)) |
+        (Patient.email.contains(search))
+    ]
+    ctx.helpers.age_bracket_counts(*criteria)
+    patients = Patient.query.filter(*criteria).paginate(page=ctx.rng.randint(1, 20), per_page=10,
+                                                        error_out=False).items
+    ctx.helpers.appointment_counts('patient_id', [patient.id for patient in patients])
+
+
+@benchmark('hospital.doctors_by_specialization')
+def doctors_by_specialization(ctx):
+    m = ctx.models
+    doctors = m.Doctor.query.join(m.Specialization).filter(
+        m.Doctor.specialization_id == ctx.rng.randint(1, 6)
+    ).paginate(page=1, per_page=10, error_out=False).items
+    ctx.helpers.appointment_counts('doctor_id', [doctor.id for doctor in doctors])
+    m.Specialization.query.all()
+
+
+@benchmark('hospital.appointments_filter')
+def appointments_filter(ctx):
+    p = ctx.projections
+    filters = {'appointment_date': ctx.day(), 'doctor_id': ctx.doctor_id(), 'status': 'scheduled'}
+    connection = ctx.db.session.connection()
+    p.fetch(connection, ctx.statements.get('appointment_rows', tuple(sorted(filters))), p.AppointmentRow, filters)
+    p.fetch(connection, ctx.statements.get('doctor_options'), p.PersonOption)
+    p.fetch(connection, ctx.statements.get('patient_options'), p.PersonOption)
+
+
+@benchmark('hospital.appointment_conflict')
+def appointment_conflict(ctx):
+    ctx.db.session.scalar(ctx.statements.get('appointment_conflict'), {
+        'doctor_id': ctx.doctor_id(),
+        'appointment_date': ctx.day(),
+        'appointment_time': ctx.slot(),
+    })
+
+
+@benchmark('hospital.doctor_availability')
+def doctor_availability(ctx):
+    booked = ctx.db.session.scalars(ctx.statements.get('booked_times'), {
+        'doctor_id': ctx.doctor_id(),
+        'appointment_date': ctx.day(),
+    })
+    [appointment_time.strftime('%H:%M') for appointment_time in booked]
+
+
+@benchmark('hospital.calendar_week')
+def calendar_week(ctx):
+    m = ctx.models
+    Appointment = m.Appointment
+    start = ctx.day()
+    # The route loads the whole range; 200 rows keep the round short and still show its per-row lazy loads
+    appointments = Appointment.query.join(Appointment.patient_ref).filter(
+        m.Patient.deleted_at.is_(None),
+        Appointment.appointment_date >= start,
+        Appointment.appointment_date <= start + timedelta(days=6),
+    ).options(contains_eager(Appointment.patient_ref)).limit(200).all()
+    [(apt.patient_ref.last_name, apt.doctor_ref.last_name) for apt in appointments]
+
+
+@benchmark('hospital.patient_detail')
+def patient_detail(ctx):
+    m = ctx.models
+    patient_id = ctx.patient_id()
+    params = {'patient_id': patient_id}
+    ctx.db.get_or_404(m.Patient, patient_id)
+    for name in ('recent_patient_appointments', 'recent_patient_archived_appointments',
+                 'recent_patient_records', 'recent_patient_archived_records'):
+        ctx.db.session.scalars(ctx.statements.get(name), params).all()
+
+
+@benchmark('hospital.distinct_diagnoses')
+def distinct_diagnoses(ctx):
+    m = ctx.models
+    patient_id = ctx.patient_id()
+    for model in (m.MedicalRecord, m.ArchivedMedicalRecord):
+        ctx.db.session.query(model.diagnosis.distinct()).filter_by(patient_id=patient_id).all()
+
+
+@benchmark('hospital.dashboard_counts')
+def dashboard_counts(ctx):
+    m = ctx.models
+    m.Patient.query.count()
+    m.Doctor.query.count()
+    m.Appointment.query.filter(*ctx.purger.live(m.Appointment)).count()
+    m.AccessRequest.query.filter_by(status='pending').count()
+
+
+@benchmark('hospital.admin_dashboard_counts')
+def admin_dashboard_counts(ctx):
+    m = ctx.models
+    db = ctx.db
+    now = datetime.combine(ctx.today(), dt_time(12))
+    m.User.query.count()
+    m.User.query.filter_by(is_active=True).count()
+    m.Patient.query.count()
+    m.Doctor.query.count()
+    m.Appointment.query.filter(*ctx.purger.live(m.Appointment)).count()
+    m.AccessRequest.query.filter_by(status='pending').count()
+    m.MedicalRecord.query.filter(*ctx.purger.live(m.MedicalRecord)).count()
+    m.Specialization.query.count()
+    m.Patient.query.filter(m.Patient.created_at >= now - timedelta(days=30)).count()
+    ctx.helpers.age_bracket_counts()
+    m.Appointment.query.filter(db.func.date(m.Appointment.appointment_date) == ctx.today(),
+                               *ctx.purger.live(m.Appointment)).count()
+    m.MedicalRecord.query.filter(m.MedicalRecord.created_at >= now - timedelta(days=7),
+                                 *ctx.purger.live(m.MedicalRecord)).count()
+
+
+@benchmark('hospital.doctor_detail_counts')
+def doctor_detail_counts(ctx):
+    Appointment = ctx.models.Appointment
+    doctor_id = ctx.doctor_id()
+    ctx.models.Doctor.query.get_or_404(doctor_id)
+    appointments = Appointment.query.filter_by(doctor_id=doctor_id).filter(*ctx.purger.live(Appointment))
+    appointments.order_by(Appointment.appointment_date.desc()).limit(10).all()
+    appointments.count()
+    appointments.filter_by(status='completed').count()
+    appointments.filter_by(status='scheduled').count()
+
+
+@benchmark('hospital.export_records')
+def export_records(ctx):
+    m = ctx.models
+    patient_id = ctx.patient_id()
+    m.Patient.query.get_or_404(patient_id)
+    for model in (m.MedicalRecord, m.ArchivedMedicalRecord):
+        model.query.filter_by(patient_id=patient_id).order_by(model.record_date.desc()).all()
+
+
+# hospital_app/app.py --------------------------------------------------------
+
+@benchmark('hospital_app.index')
+def hospital_app_index(ctx):
+    p = ctx.projections
+    connection = ctx.db.session.connection()
+    p.fetch(connection, p.PATIENT_ROWS, p.PatientRow)
+    p.fetch(connection, p.APPOINTMENT_ROWS, p.AppointmentRow)
+    p.fetch(connection, p.DOCTOR_ROWS, p.DoctorRow)
+
+
+@benchmark('hospital_app.booked_appointments')
+def hospital_app_booked(ctx):
+    Appointment = ctx.models.Appointment
+    Appointment.query.filter(
+        Appointment.doctor_id == ctx.doctor_id(),
+        ctx.db.func.date(Appointment.date_time) == ctx.day(),
+    ).all()
+
+
+@benchmark('hospital_app.patient_records')
+def hospital_app_patient_records(ctx):
+    m = ctx.models
+    patient_id = ctx.patient_id()
+    m.Patient.live().filter_by(id=patient_id).first_or_404()
+    m.MedicalRecord.query.filter(
+        m.MedicalRecord.patient_id == patient_id,
+        m.MedicalRecord.upload_date >= datetime.utcnow() - timedelta(days=30),
+    ).order_by(m.MedicalRecord.upload_date.desc()).all()
+
+
+@benchmark('hospital_app.export_all_records')
+def hospital_app_export(ctx):
+    m = ctx.models
+    patient_id = ctx.patient_id()
+    m.Patient.live().filter_by(id=patient_id).first_or_404()
+    m.MedicalRecord.query.filter_by(patient_id=patient_id).order_by(m.MedicalRecord.upload_date.asc()).all()
+
+
+# Seeding --------------------------------------------------------------------
+
+def seed_hospital(workdir):
+    database = os.path.join(workdir, 'hospital.db')
+    subprocess.run([sys.executable, os.path.join(BENCH_DIR, 'synthetic_data.py'),
+                    '--database', database, '--uploads', os.path.join(workdir, 'uploads'),
+                    '--patients', str(SCALE['patients']), '--doctors', str(SCALE['doctors']),
+                    '--appointments', str(SCALE['appointments']), '--records', str(SCALE['records']),
+                    '--staff-users', '1', '--seed', str(SCALE['seed'])],
+                   check=True, capture_output=True)
+    with open(os.path.join(workdir, 'hospital.manifest.json')) as handle:
+        return database, json.load(handle)
+
+
+def seed_hospital_app(db, models, rng):
+    """hospital_app's index loads every row, so it is seeded at a tenth of the scale."""
+    patients = SCALE['patients'] // 10
+    doctors = SCALE['doctors']
+    appointments = SCALE['appointments'] // 10
+    today = date.today()
+    db.session.bulk_insert_mappings(models.Patient, [
+        {'id': i, 'first_name': f'First{i}', 'last_name': f'Last{i}',
+         'date_of_birth': date(1940, 1, 1) + timedelta(days=rng.randrange(365 * 80)), 'gender': 'Female'}
+        for i in range(1, patients + 1)
+    ])
+    # The app already seeded a few doctors at import; these come after them
+    db.session.bulk_insert_mappings(models.Doctor, [
+        {'first_name': f'Doc{i}', 'last_name': f'Tor{i}', 'specialization': 'Cardiology'}
+        for i in range(1, doctors + 1)
+    ])
+    db.session.bulk_insert_mappings(models.Appointment, [
+        {'patient_id': rng.randint(1, patients), 'doctor_id': rng.randint(1, doctors),
+         'date_time': datetime.combine(today + timedelta(days=rng.randrange(-300, 60)), dt_time(9 + rng.randrange(8))),
+         'diagnosis': 'Synthetic'}
+        for _ in range(appointments)
+    ])
+    db.session.bulk_insert_mappings(models.MedicalRecord, [
+        {'patient_id': rng.randint(1, patients), 'filename': f'record_{i}.txt', 'file_path': f'uploads/record_{i}.txt',
+         'diagnosis_summary': 'Synthetic', 'upload_date': datetime.utcnow() - timedelta(days=rng.randrange(120)),
+         'full_content': 'Diagnosis: Synthetic\n' * 20}
+        for i in range(SCALE['records'] // 10)
+    ])
+    db.session.commit()
+    return {
+        'patients': patients,
+        'doctors': doctors,
+        'first_appointment_day': (today - timedelta(days=300)).isoformat(),
+        'last_appointment_day': (today + timedelta(days=60)).isoformat(),
+    }
+
+
+# Running --------------------------------------------------------------------
+
+def time_benchmark(func, ctx, rounds, counter):
+    timings = []
+    statements = []
+    for _ in range(rounds):
+        counter[0] = 0
+        started = time.perf_counter()
+        func(ctx)
+        timings.append(time.perf_counter() - started)
+        statements.append(counter[0])
+        ctx.db.session.remove()  # every request starts with an empty session
+    return {
+        'median_ms': round(statistics.median(timings) * 1000, 3),
+        'min_ms': round(min(timings) * 1000, 3),
+        'queries': max(statements),
+        'rounds': rounds,
+    }
+
+
+def run_app(name, selected, rounds, workdir):
+    """Child process: seeds one app's database and times its benchmarks."""
+    from sqlalchemy import event
+
+    rng = random.Random(SCALE['seed'])
+    if name == 'hospital':
+        database, manifest = seed_hospital(workdir)
+        os.environ['HOSPITAL_DATABASE_URI'] = 'sqlite:///' + database
+        os.environ['HOSPITAL_UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+        sys.path.insert(0, HOSPITAL_DIR)
+        from app import create_app
+        from extensions import purger, statements
+        from views import helpers
+        import models
+        import projections
+        flask_app, db = create_app(), models.db
+    else:
+        os.environ['HOSPITAL_APP_DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'hospital_app.db')
+        os.chdir(workdir)
+        sys.path.insert(0, HOSPITAL_APP_DIR)
+        from app import app as flask_app, init_db
+        import models
+        import projections
+        statements = helpers = purger = None
+        db = models.db
+        with flask_app.app_context():
+            init_db()
+            manifest = seed_hospital_app(db, models, rng)
+
+    results = {}
+    with flask_app.app_context():
+        counter = [0]
+
+        def count_statement(*args):
+            counter[0] += 1
+
+        event.listen(db.engine, 'before_cursor_execute', count_statement)
+        for bench_name in selected:
+            func = BENCHMARKS[bench_name]
+            ctx = Context(models, db, random.Random(bench_name), manifest,
+                          statements, projections, helpers, purger)
+            func(ctx)  # warm up caches and the SQLite page cache
+            db.session.remove()
+            results[bench_name] = time_benchmark(func, ctx, rounds, counter)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    failures = 0
+    print(f"{'benchmark':40} {'median ms':>10} {'base ms':>10} {'change':>8} {'queries':>8} {'base q':>7}  status")
+    for name, result in results.items():
+        old = baseline.get('benchmarks', {}).get(name)
+        status = 'new'
+        base_ms = base_q = change = '-'
+        if old:
+            base_ms = f"{old['median_ms']:.3f}"
+            base_q = str(old['queries'])
+            change = f"{(result['median_ms'] - old['median_ms']) / old['median_ms'] * 100:+.1f}%"
+            slower = result['median_ms'] > old['median_ms'] * (1 + tolerance)
+            more_queries = result['queries'] > old['queries']
+            status = 'SLOWER' if slower else 'MORE QUERIES' if more_queries else 'ok'
+            if more_queries and slower:
+                status = 'SLOWER, MORE QUERIES'
+            failures += status != 'ok'
+        print(f"{name:40} {result['median_ms']:>10.3f} {base_ms:>10} {change:>8} {result['queries']:>8} {base_q:>7}  {status}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-k', dest='keyword', help='only run benchmarks whose name contains this')
+    parser.add_argument('--rounds', type=int, default=25)
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown, 0.25 = 25%%')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--app', choices=['hospital', 'hospital_app'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    selected = sorted(name for name in BENCHMARKS if not args.keyword or args.keyword in name)
+
+    if args.app:
+        names = [name for name in selected if name.split('.')[0] == args.app]
+        with tempfile.TemporaryDirectory() as workdir:
+            results = run_app(args.app, names, args.rounds, workdir)
+        print(json.dumps(results))
+        return 0
+
+    results = {}
+    for app_name in ('hospital', 'hospital_app'):
+        if not any(name.startswith(app_name + '.') for name in selected):
+            continue
+        command = [sys.executable, os.path.abspath(__file__), '--app', app_name, '--rounds', str(args.rounds)]
+        if args.keyword:
+            command += ['-k', args.keyword]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        results.update(json.loads(output.strip().splitlines()[-1]))
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        baseline = {'scale': SCALE, 'recorded_at': datetime.now().isoformat(timespec='seconds'),
+                    'benchmarks': results}
+        if os.path.exists(args.baseline) and args.keyword:
+            with open(args.baseline) as handle:
+                previous = json.load(handle)
+            previous['benchmarks'].update(results)
+            baseline['benchmarks'] = previous['benchmarks']
+        with open(args.baseline, 'w') as handle:
+            json.dump(baseline, handle, indent=2, sort_keys=True)
+        compare(results, {}, args.tolerance)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        if baseline.get('scale') != SCALE:
+            parser.error('the stored baseline was recorded at a different scale; re-record it with --save-baseline')
+    failures = compare(results, baseline, args.tolerance)
+    if failures:
+        print(f"\n{failures} benchmark(s) regressed beyond the baseline")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
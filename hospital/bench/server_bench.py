@@ -0,0 +1,109 @@
+"""Throughput of the serve.py profiles on the standard load test.
+
+Seeds a database at bench/query_bench.py's scale, then for each profile
+starts ``serve.py --profile <name>`` on a free local port, runs
+bench/loadtest.py against it and stops the server again. Reports requests
+per second, latency percentiles and errors per profile side by side.
+
+    python bench/server_bench.py --duration 30 --concurrency 16
+    python bench/server_bench.py --profiles sync,threaded --workers 4
+
+Worker counts follow serve.py's CPU-based defaults unless --workers or
+--threads is given, so compare runs on the same machine only.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from query_bench import BENCH_DIR, HOSPITAL_DIR, seed_hospital
+
+sys.path.insert(0, HOSPITAL_DIR)
+from serve import PROFILES, profile_settings  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def wait_for_port(port, server, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited with {server.returncode}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server did not listen on {port} within {timeout}s")
+
+
+def run_profile(profile, manifest_path, env, args, workdir):
+    port = free_port()
+    command = [sys.executable, os.path.join(HOSPITAL_DIR, 'serve.py'), '--profile', profile,
+               '--bind', f'127.0.0.1:{port}']
+    if args.workers:
+        command += ['--workers', str(args.workers)]
+    if args.threads:
+        command += ['--threads', str(args.threads)]
+    server = subprocess.Popen(command, cwd=HOSPITAL_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    output = os.path.join(workdir, f'{profile}.json')
+    try:
+        wait_for_port(port, server)
+        subprocess.run([sys.executable, os.path.join(BENCH_DIR, 'loadtest.py'), '--manifest', manifest_path,
+                        '--base-url', f'http://127.0.0.1:{port}', '--concurrency', str(args.concurrency),
+                        '--duration', str(args.duration), '--mix', args.mix, '--label', f'serve.py {profile}',
+                        '--output', output], check=True, capture_output=True)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    with open(output) as handle:
+        return json.load(handle)['overall']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profiles', default=','.join(PROFILES), help='comma-separated serve.py profiles')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load per profile')
+    parser.add_argument('--workers', type=int, help='override the CPU-based worker count')
+    parser.add_argument('--threads', type=int, help='override the threads per worker')
+    parser.add_argument('--mix', default='{}', help="passed to loadtest.py, e.g. '{\"upload\": 0}'")
+    args = parser.parse_args()
+
+    profiles = [name.strip() for name in args.profiles.split(',') if name.strip()]
+    unknown = set(profiles) - set(PROFILES)
+    if unknown:
+        parser.error(f"unknown profiles: {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database, _ = seed_hospital(workdir)
+        manifest_path = os.path.join(workdir, 'hospital.manifest.json')
+        env = {**os.environ, 'HOSPITAL_DATABASE_URI': 'sqlite:///' + database,
+               'HOSPITAL_UPLOAD_FOLDER': os.path.join(workdir, 'uploads'),
+               'HOSPITAL_RATE_LIMITS': '0'}  # one staff account drives all the load
+
+        results = {}
+        print(f"{'profile':9} {'workers':>7} {'threads':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'p99 ms':>8} {'errors':>7}")
+        for profile in profiles:
+            settings = profile_settings(profile, workers=args.workers, threads=args.threads)
+            overall = run_profile(profile, manifest_path, env, args, workdir)
+            results[profile] = {'workers': settings['workers'], 'threads': settings.get('threads', 1), **overall}
+            print(f"{profile:9} {settings['workers']:>7} {settings.get('threads', 1):>7} "
+                  f"{overall['throughput_rps']:>8} {overall['p50_ms']:>8} {overall['p95_ms']:>8} "
+                  f"{overall['p99_ms']:>8} {overall['errors']:>7}")
+
+        print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
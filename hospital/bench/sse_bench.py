@@ -0,0 +1,194 @@
+"""Connections, memory per subscriber and fan-out latency of /api/events.
+
+Starts ``serve.py`` (gevent profile by default) against a throwaway
+database, signs in once and opens ``--subscribers`` event streams with that
+session. For each subscriber count it reports:
+
+- the open sockets and resident memory of every worker before and after the
+  streams were opened, and the difference per subscriber;
+- how long one patient registration, made through the app, takes to reach
+  every stream (p50/p99/max). The write lands on one worker and reaches the
+  others through the shared notification file, so this includes the poll
+  interval for most subscribers.
+
+    python bench/sse_bench.py --subscribers 100,500,1000
+    python bench/sse_bench.py --profile threaded --subscribers 8
+"""
+import argparse
+import http.client
+import json
+import os
+import selectors
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+from query_bench import HOSPITAL_DIR
+from server_bench import free_port, wait_for_port
+
+STREAM_PATH = '/api/events?channels=patient,appointment'
+
+
+def workers_of(server_pid):
+    with open(f'/proc/{server_pid}/task/{server_pid}/children') as handle:
+        return [int(pid) for pid in handle.read().split()]
+
+
+def worker_usage(pids):
+    """Open sockets and resident bytes per worker."""
+    usage = {}
+    for pid in pids:
+        sockets = sum(os.readlink(f'/proc/{pid}/fd/{fd}').startswith('socket:')
+                      for fd in os.listdir(f'/proc/{pid}/fd'))
+        with open(f'/proc/{pid}/status') as handle:
+            rss = next(int(line.split()[1]) * 1024 for line in handle if line.startswith('VmRSS:'))
+        usage[pid] = {'sockets': sockets, 'rss': rss}
+    return usage
+
+
+def sign_in(port):
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    connection.request('POST', '/login', urlencode({'username': 'admin', 'password': 'admin123'}),
+                       {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = connection.getresponse()
+    response.read()
+    cookie = response.getheader('Set-Cookie').split(';', 1)[0]
+    connection.close()
+    return cookie
+
+
+def open_streams(port, cookie, count, timeout=30):
+    """Opens count streams and waits until each has received its first chunk."""
+    selector = selectors.DefaultSelector()
+    request = (f'GET {STREAM_PATH} HTTP/1.1\r\nHost: 127.0.0.1\r\nCookie: {cookie}\r\n'
+               'Accept: text/event-stream\r\n\r\n').encode()
+    for _ in range(count):
+        stream = socket.create_connection(('127.0.0.1', port))
+        stream.sendall(request)
+        selector.register(stream, selectors.EVENT_READ, bytearray())
+    waiting = {key.fileobj for key in selector.get_map().values()}
+    deadline = time.monotonic() + timeout
+    while waiting and time.monotonic() < deadline:
+        for key, _ in selector.select(timeout=1):
+            chunk = key.fileobj.recv(65536)
+            key.data.extend(chunk)
+            if b'retry:' in key.data:
+                waiting.discard(key.fileobj)
+    if waiting:
+        raise RuntimeError(f'{len(waiting)} of {count} streams did not open within {timeout}s')
+    return selector
+
+
+def fan_out(port, cookie, selector, timeout=30):
+    """Registers a patient and returns how long each stream took to receive it."""
+    for key in selector.get_map().values():
+        key.data.clear()
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    started = time.perf_counter()
+    connection.request('POST', '/patients/add',
+                       urlencode({'first_name': 'Live', 'last_name': 'Update', 'date_of_birth': '1990-01-01',
+                                  'gender': 'Female'}),
+                       {'Content-Type': 'application/x-www-form-urlencoded', 'Cookie': cookie})
+    connection.getresponse().read()
+    connection.close()
+    latencies = []
+    waiting = {key.fileobj for key in selector.get_map().values()}
+    deadline = time.monotonic() + timeout
+    while waiting and time.monotonic() < deadline:
+        for key, _ in selector.select(timeout=1):
+            if key.fileobj not in waiting:
+                key.fileobj.recv(65536)
+                continue
+            key.data.extend(key.fileobj.recv(65536))
+            if b'event: patient' in key.data:
+                latencies.append(time.perf_counter() - started)
+                waiting.discard(key.fileobj)
+    return sorted(latencies), len(waiting)
+
+
+def close_streams(selector):
+    for key in list(selector.get_map().values()):
+        selector.unregister(key.fileobj)
+        key.fileobj.close()
+    selector.close()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profile', default='gevent', help='serve.py profile')
+    parser.add_argument('--workers', type=int, help='override the CPU-based worker count')
+    parser.add_argument('--subscribers', default='100,500', help='comma-separated stream counts')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = {**os.environ, 'HOSPITAL_DATABASE_URI': 'sqlite:///' + os.path.join(workdir, 'hospital.db'),
+               'HOSPITAL_UPLOAD_FOLDER': os.path.join(workdir, 'uploads'),
+               'HOSPITAL_EVENT_BUS_STORE': os.path.join(workdir, 'events.db'),
+               'HOSPITAL_RATE_LIMITS': '0'}
+        subprocess.run([sys.executable, '-c', 'from app import create_app; from cli import init_database; '
+                        'app = create_app(); app.app_context().push(); init_database(echo=lambda m: None)'],
+                       cwd=HOSPITAL_DIR, env=env, check=True)
+
+        port = free_port()
+        command = [sys.executable, os.path.join(HOSPITAL_DIR, 'serve.py'), '--profile', args.profile,
+                   '--bind', f'127.0.0.1:{port}']
+        if args.workers:
+            command += ['--workers', str(args.workers)]
+        server = subprocess.Popen(command, cwd=HOSPITAL_DIR, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        results = {}
+        try:
+            wait_for_port(port, server)
+            cookie = sign_in(port)
+            print(f"{'streams':>7} {'workers':>7} {'sockets':>8} {'KiB/sub':>8} {'p50 ms':>8} {'p99 ms':>8} "
+                  f"{'max ms':>8} {'missed':>6}")
+            for count in [int(value) for value in args.subscribers.split(',') if value.strip()]:
+                # Warm every worker up first, so the baseline includes the imports and pools
+                warm = open_streams(port, cookie, 4 * len(workers_of(server.pid)))
+                fan_out(port, cookie, warm)
+                close_streams(warm)
+                pids = workers_of(server.pid)
+                before = worker_usage(pids)
+                selector = open_streams(port, cookie, count)
+                time.sleep(1)
+                after = worker_usage(pids)
+                latencies, missed = fan_out(port, cookie, selector)
+                close_streams(selector)
+
+                sockets = sum(usage['sockets'] for usage in after.values()) - sum(
+                    usage['sockets'] for usage in before.values())
+                grown = sum(after[pid]['rss'] - before[pid]['rss'] for pid in pids)
+                results[count] = {
+                    'workers': len(pids),
+                    'sockets_opened': sockets,
+                    'sockets_per_worker': {pid: after[pid]['sockets'] for pid in pids},
+                    'bytes_per_subscriber': round(grown / count),
+                    'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+                    'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+                    'max_ms': round(latencies[-1] * 1000, 1) if latencies else 0.0,
+                    'missed': missed,
+                }
+                result = results[count]
+                print(f"{count:>7} {result['workers']:>7} {result['sockets_opened']:>8} "
+                      f"{result['bytes_per_subscriber'] / 1024:>8.1f} {result['p50_ms']:>8} {result['p99_ms']:>8} "
+                      f"{result['max_ms']:>8} {result['missed']:>6}")
+        finally:
+            # Quick shutdown: a graceful one would wait for streams the workers haven't seen close yet
+            server.send_signal(signal.SIGINT)
+            server.wait(timeout=30)
+
+        print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
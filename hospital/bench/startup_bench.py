@@ -0,0 +1,94 @@
+"""Cold start cost of each app: import, app creation and first request.
+
+Every worker boot and every test module that imports the app pays for
+what happens at import time. Each run starts a fresh interpreter and
+times, separately:
+
+- import: ``import app`` (what test collection pays per process)
+- create: building the application object (``create_app()`` where the
+  module has a factory; nothing extra for module-level apps)
+- first request: GET /login through the test client
+
+against a database seeded at bench/query_bench.py's scale, and reports the
+median of ``--runs`` runs.
+
+    python bench/startup_bench.py --runs 10
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from query_bench import HOSPITAL_APP_DIR, HOSPITAL_DIR, SCALE, seed_hospital, seed_hospital_app
+
+CHILD = """
+import json, time
+started = time.perf_counter()
+import app as module
+imported = time.perf_counter()
+application = module.create_app() if hasattr(module, 'create_app') else module.app
+created = time.perf_counter()
+application.test_client().get('/login')
+served = time.perf_counter()
+print(json.dumps({'import_ms': (imported - started) * 1000, 'create_ms': (created - imported) * 1000,
+                  'first_request_ms': (served - created) * 1000}))
+"""
+
+
+def prepare_hospital(workdir):
+    database, _ = seed_hospital(workdir)
+    return HOSPITAL_DIR, {'HOSPITAL_DATABASE_URI': 'sqlite:///' + database,
+                          'HOSPITAL_UPLOAD_FOLDER': os.path.join(workdir, 'uploads')}
+
+
+def prepare_hospital_app(workdir):
+    env = {'HOSPITAL_APP_DATABASE_URI': 'sqlite:///' + os.path.join(workdir, 'hospital_app.db')}
+    os.environ.update(env)
+    sys.path.insert(0, HOSPITAL_APP_DIR)
+    import app as module
+    import models
+    application = module.create_app() if hasattr(module, 'create_app') else module.app
+    with application.app_context():
+        if hasattr(module, 'init_db'):
+            module.init_db()
+        seed_hospital_app(models.db, models, random.Random(SCALE['seed']))
+    return HOSPITAL_APP_DIR, env
+
+
+APPS = {
+    'hospital': prepare_hospital,
+    'hospital_app': prepare_hospital_app,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--app', choices=sorted(APPS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.app:
+        with tempfile.TemporaryDirectory() as workdir:
+            cwd, env = APPS[args.app](workdir)
+            runs = []
+            for _ in range(args.runs):
+                output = subprocess.run([sys.executable, '-c', CHILD], cwd=cwd, env={**os.environ, **env},
+                                        check=True, capture_output=True, text=True).stdout
+                runs.append(json.loads(output.strip().splitlines()[-1]))
+        print(json.dumps({key: round(statistics.median(run[key] for run in runs), 1) for key in runs[0]}))
+        return
+
+    print(f"{'app':14} {'import ms':>10} {'create ms':>10} {'first request ms':>17}")
+    for name in sorted(APPS):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--app', name, '--runs', str(args.runs)],
+                                check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{name:14} {result['import_ms']:>10} {result['create_ms']:>10} {result['first_request_ms']:>17}")
+
+
+if __name__ == '__main__':
+    main()
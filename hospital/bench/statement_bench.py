@@ -0,0 +1,147 @@
+"""CPU saved per request by the prebuilt statements in statements.py.
+
+Runs the query work of appointments(), doctor_availability() and
+patient_detail() two ways against a seeded database: the way the routes used
+to build Model.query chains on every call, and through the statement
+registry. Reports CPU time per call (time.process_time) for each.
+
+    python bench/statement_bench.py --iterations 2000
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+HOSPITAL_DIR = os.path.dirname(BENCH_DIR)
+
+sys.path.insert(0, HOSPITAL_DIR)
+import models as m  # noqa: E402
+from app import create_app  # noqa: E402
+from extensions import db, statements  # noqa: E402
+from projections import AppointmentRow, fetch  # noqa: E402
+
+
+def legacy_appointments(m, params):
+    query = m.Appointment.query.join(m.Patient).join(m.Doctor)
+    query = query.filter(m.Appointment.appointment_date == params['appointment_date'])
+    query = query.filter(m.Appointment.doctor_id == params['doctor_id'])
+    query = query.filter(m.Appointment.status == params['status'])
+    return query.order_by(m.Appointment.appointment_date.desc(), m.Appointment.appointment_time.desc()).all()
+
+
+def cached_appointments(m, params):
+    statement = statements.get('appointment_rows', tuple(sorted(params)))
+    return fetch(db.session.connection(), statement, AppointmentRow, params)
+
+
+def legacy_availability(m, params):
+    booked = m.Appointment.query.filter_by(
+        doctor_id=params['doctor_id'],
+        appointment_date=params['appointment_date']
+    ).filter(m.Appointment.status != 'cancelled').all()
+    return [apt.appointment_time.strftime('%H:%M') for apt in booked]
+
+
+def cached_availability(m, params):
+    booked = db.session.scalars(statements.get('booked_times'), params)
+    return [appointment_time.strftime('%H:%M') for appointment_time in booked]
+
+
+def legacy_patient_detail(m, params):
+    patient_id = params['patient_id']
+    patient = m.Patient.query.get_or_404(patient_id)
+    appointments = m.Appointment.query.filter_by(patient_id=patient_id)\
+                                      .order_by(m.Appointment.appointment_date.desc())\
+                                      .limit(5).all()
+    records = m.MedicalRecord.query.filter_by(patient_id=patient_id)\
+                                   .order_by(m.MedicalRecord.record_date.desc())\
+                                   .limit(5).all()
+    return patient, appointments, records
+
+
+def cached_patient_detail(m, params):
+    patient = db.get_or_404(m.Patient, params['patient_id'])
+    appointments = db.session.scalars(statements.get('recent_patient_appointments'), params).all()
+    records = db.session.scalars(statements.get('recent_patient_records'), params).all()
+    return patient, appointments, records
+
+
+def appointment_params(rng, manifest):
+    return {'appointment_date': random_day(rng, manifest), 'doctor_id': rng.randint(1, manifest['doctors']),
+            'status': 'scheduled'}
+
+
+def availability_params(rng, manifest):
+    return {'doctor_id': rng.randint(1, manifest['doctors']), 'appointment_date': random_day(rng, manifest)}
+
+
+def patient_params(rng, manifest):
+    return {'patient_id': rng.randint(1, manifest['patients'])}
+
+
+def random_day(rng, manifest):
+    first = date.fromisoformat(manifest['first_appointment_day'])
+    last = date.fromisoformat(manifest['last_appointment_day'])
+    return first + timedelta(days=rng.randrange((last - first).days + 1))
+
+
+ROUTES = [
+    ('appointments()', legacy_appointments, cached_appointments, appointment_params),
+    ('doctor_availability()', legacy_availability, cached_availability, availability_params),
+    ('patient_detail()', legacy_patient_detail, cached_patient_detail, patient_params),
+]
+
+
+def cpu_per_call(func, m, params_list):
+    started = time.process_time()
+    for params in params_list:
+        func(m, params)
+        db.session.remove()
+    return (time.process_time() - started) / len(params_list)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=1000)
+    parser.add_argument('--patients', type=int, default=5000)
+    parser.add_argument('--doctors', type=int, default=50)
+    parser.add_argument('--appointments', type=int, default=50000)
+    parser.add_argument('--records', type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database = os.path.join(workdir, 'hospital.db')
+        subprocess.run([sys.executable, os.path.join(BENCH_DIR, 'synthetic_data.py'),
+                        '--database', database, '--uploads', os.path.join(workdir, 'uploads'),
+                        '--patients', str(args.patients), '--doctors', str(args.doctors),
+                        '--appointments', str(args.appointments), '--records', str(args.records),
+                        '--staff-users', '1'], check=True, capture_output=True)
+        with open(os.path.join(workdir, 'hospital.manifest.json')) as handle:
+            manifest = json.load(handle)
+
+        os.environ['HOSPITAL_DATABASE_URI'] = 'sqlite:///' + database
+        os.environ['HOSPITAL_UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+        app = create_app()
+
+        print(f"{'route':24} {'legacy us/call':>15} {'cached us/call':>15} {'saved':>8}")
+        with app.app_context():
+            for label, legacy, cached, make_params in ROUTES:
+                rng = random.Random(label)
+                params_list = [make_params(rng, manifest) for _ in range(args.iterations)]
+                # Warm both paths so one-off compilation is not part of the steady state
+                cpu_per_call(legacy, m, params_list[:20])
+                cpu_per_call(cached, m, params_list[:20])
+                legacy_cpu = cpu_per_call(legacy, m, params_list)
+                cached_cpu = cpu_per_call(cached, m, params_list)
+                saved = (legacy_cpu - cached_cpu) / legacy_cpu * 100
+                print(f"{label:24} {legacy_cpu * 1e6:>15.1f} {cached_cpu * 1e6:>15.1f} {saved:>7.1f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""Reproducible synthetic dataset for the hospital app.
+
+    python bench/synthetic_data.py --database /tmp/bench/hospital.db \\
+        --uploads /tmp/bench/uploads --patients 1000000 --doctors 500 \\
+        --appointments 20000000 --records 5000000
+
+Rows are written with plain sqlite3 in large batches (the ORM would take
+hours at these sizes), and the report rollups are rebuilt from them at the
+end. Every date derives from --today (default a fixed day, not the clock),
+so the same --seed and --today always produce the same data. A
+manifest with the counts, id ranges and staff logins is written next to the
+database for bench/loadtest.py to pick up.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+HOSPITAL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_NAMES = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda',
+               'William', 'Elizabeth', 'David', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica',
+               'Thomas', 'Sarah', 'Charles', 'Karen', 'Amara', 'Tendai', 'Nomvula', 'Sipho',
+               'Chen', 'Priya', 'Mohammed', 'Fatima', 'Lucas', 'Sofia', 'Kofi', 'Ama']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis',
+              'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson',
+              'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin', 'Nkosi', 'Dlamini', 'Mensah',
+              'Okafor', 'Naidoo', 'Patel', 'Wang', 'Kim', 'Haddad', 'Silva', 'Ivanova', 'Sein']
+DIAGNOSES = ['Hypertension', 'Type 2 Diabetes', 'Asthma', 'Migraine', 'Influenza', 'Bronchitis',
+             'Fracture', 'Sprain', 'Dermatitis', 'Anemia', 'Arrhythmia', 'Otitis Media',
+             'Gastroenteritis', 'Back Pain', 'Pneumonia', 'Allergic Rhinitis', 'Concussion',
+             'Osteoarthritis', 'Eczema', 'Common Cold']
+GENDERS = ['Male', 'Female', 'Other']
+STATUSES_PAST = ['completed'] * 8 + ['cancelled', 'scheduled']
+
+SLOTS_PER_DAY = 16  # 09:00 - 17:00 in 30 minute steps, as in doctor_availability()
+SLOT_TIMES = [f"{9 + i // 2:02d}:{30 * (i % 2):02d}:00.000000" for i in range(SLOTS_PER_DAY)]
+
+# (extension, size in bytes) of the shared attachment pool
+ATTACHMENT_KINDS = [('txt', 4 * 1024), ('txt', 64 * 1024), ('pdf', 256 * 1024),
+                    ('png', 512 * 1024), ('jpg', 1024 * 1024), ('docx', 96 * 1024)]
+
+BATCH_SIZE = 50000
+
+
+def timestamp(value):
+    """Formats a datetime the way SQLAlchemy stores it in SQLite."""
+    return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def batched(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def insert(conn, sql, rows, label, total):
+    started = time.perf_counter()
+    done = 0
+    for batch in batched(rows):
+        conn.executemany(sql, batch)
+        conn.commit()
+        done += len(batch)
+        elapsed = time.perf_counter() - started
+        print(f"\r  {label}: {done:,}/{total:,} ({done / elapsed:,.0f} rows/s)", end='', flush=True)
+    print()
+
+
+def create_schema(database, uploads):
+    """Creates the tables, default admin and specializations through the app itself."""
+    os.environ['HOSPITAL_DATABASE_URI'] = 'sqlite:///' + os.path.abspath(database)
+    os.environ['HOSPITAL_UPLOAD_FOLDER'] = os.path.abspath(uploads)
+    sys.path.insert(0, HOSPITAL_DIR)
+    from app import create_app
+    from cli import init_database
+    from extensions import db
+
+    with create_app().app_context():
+        init_database(echo=lambda message: None)
+        db.engine.dispose()  # no pooled connection left open while main() writes through sqlite3
+
+
+def build_rollups():
+    """Fills the report rollups from the rows inserted behind the app's back."""
+    from app import create_app
+    from extensions import db
+    import rollups
+
+    with create_app().app_context():
+        rollups.rebuild(db.session.connection())
+        db.session.commit()
+        db.session.remove()
+        db.engine.dispose()
+
+
+def generate_patients(rng, count, created_from, created_to):
+    span = (created_to - created_from).total_seconds()
+    for patient_id in range(1, count + 1):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        dob = date(1930, 1, 1) + timedelta(days=rng.randrange(365 * 94))
+        created = created_from + timedelta(seconds=span * patient_id / count)
+        yield (patient_id, first, last, dob.isoformat(), rng.choice(GENDERS),
+               f"+27{rng.randrange(10 ** 8, 10 ** 9)}", f"{first.lower()}.{last.lower()}{patient_id}@example.org",
+               f"{rng.randrange(1, 999)} Main Road", rng.choice(FIRST_NAMES) + ' ' + last,
+               f"+27{rng.randrange(10 ** 8, 10 ** 9)}", timestamp(created))
+
+
+def generate_doctors(rng, count, specialization_ids):
+    for doctor_id in range(1, count + 1):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        yield (doctor_id, first, last, f"+27{rng.randrange(10 ** 8, 10 ** 9)}",
+               f"dr.{last.lower()}{doctor_id}@sein-hospital.org",
+               specialization_ids[doctor_id % len(specialization_ids)],
+               f"LIC-{doctor_id:06d}", timestamp(datetime(2020, 1, 1)))
+
+
+def generate_appointments(rng, count, patients, doctors, first_day, today):
+    """Books every doctor forward through the day's slots, leaving random gaps."""
+    next_slot = [0] * (doctors + 1)
+    for _ in range(count):
+        doctor_id = rng.randrange(1, doctors + 1)
+        slot = next_slot[doctor_id] + (1 if rng.random() < 0.3 else 0)
+        next_slot[doctor_id] = slot + 1
+        day = first_day + timedelta(days=slot // SLOTS_PER_DAY)
+        status = rng.choice(STATUSES_PAST) if day < today else 'scheduled'
+        yield (rng.randrange(1, patients + 1), doctor_id, day.isoformat(),
+               SLOT_TIMES[slot % SLOTS_PER_DAY], rng.choice(DIAGNOSES), 'Synthetic appointment',
+               status, timestamp(datetime.combine(day, datetime.min.time()) - timedelta(days=7)))
+
+
+def write_attachment_pool(rng, uploads):
+    """Writes a small pool of attachments that the records point at."""
+    os.makedirs(uploads, exist_ok=True)
+    pool = []
+    for index, (extension, size) in enumerate(ATTACHMENT_KINDS * 4):
+        name = f"synthetic_{index:03d}.{extension}"
+        path = os.path.join(uploads, name)
+        with open(path, 'wb') as handle:
+            if extension == 'txt':
+                line = f"Diagnosis: {rng.choice(DIAGNOSES)}\nObservation: stable, review in two weeks.\n"
+                handle.write((line * (size // len(line) + 1)).encode('utf-8')[:size])
+            else:
+                handle.write(rng.randbytes(size))
+        pool.append((path, name))
+    return pool
+
+
+def generate_records(rng, count, patients, pool, attachment_ratio, today):
+    for _ in range(count):
+        record_date = today - timedelta(days=rng.randrange(365 * 10))
+        file_path, file_name = rng.choice(pool) if rng.random() < attachment_ratio else (None, None)
+        yield (rng.randrange(1, patients + 1), rng.choice(DIAGNOSES),
+               'Synthetic record generated for benchmarking.', file_path, file_name,
+               record_date.isoformat(), timestamp(datetime.combine(record_date, datetime.min.time())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', required=True, help='SQLite file to create')
+    parser.add_argument('--uploads', required=True, help='directory for attachment files')
+    parser.add_argument('--patients', type=int, default=1000000)
+    parser.add_argument('--doctors', type=int, default=500)
+    parser.add_argument('--appointments', type=int, default=20000000)
+    parser.add_argument('--records', type=int, default=5000000)
+    parser.add_argument('--attachment-ratio', type=float, default=0.2)
+    parser.add_argument('--staff-users', type=int, default=50, help='logins created for the load test')
+    parser.add_argument('--staff-password', default='loadtest')
+    parser.add_argument('--seed', type=int, default=2025)
+    parser.add_argument('--today', type=date.fromisoformat, default=date(2025, 6, 2),
+                        help='day the data is generated around (YYYY-MM-DD)')
+    args = parser.parse_args()
+
+    if os.path.exists(args.database):
+        parser.error(f"{args.database} already exists; pick a new path")
+    os.makedirs(os.path.dirname(os.path.abspath(args.database)), exist_ok=True)
+
+    print('Creating schema')
+    create_schema(args.database, args.uploads)
+
+    from werkzeug.security import generate_password_hash
+
+    rng = random.Random(args.seed)
+    conn = sqlite3.connect(args.database)
+    # The app keeps the database in WAL mode (see create_app); unsynced writes are what make this fast
+    conn.execute('PRAGMA synchronous = OFF')
+    specialization_ids = [row[0] for row in conn.execute('SELECT id FROM specialization ORDER BY id')]
+
+    # Spread the bookings so the busiest doctors run about a month into the future
+    slots_per_doctor = args.appointments / max(args.doctors, 1) * 1.3
+    today = args.today
+    now = datetime.combine(today, datetime.min.time())
+    first_day = today + timedelta(days=30) - timedelta(days=int(slots_per_doctor / SLOTS_PER_DAY))
+
+    password_hash = generate_password_hash(args.staff_password)
+    staff = [f"staff{i:03d}" for i in range(1, args.staff_users + 1)]
+    insert(conn, 'INSERT INTO user (username, password_hash, first_name, last_name, role, is_active, created_at) '
+                 'VALUES (?, ?, ?, ?, ?, 1, ?)',
+           ((name, password_hash, 'Load', f'Tester {i}', 'user', timestamp(now))
+            for i, name in enumerate(staff, 1)), 'users', len(staff))
+
+    insert(conn, 'INSERT INTO patient (id, first_name, last_name, date_of_birth, gender, phone, email, '
+                 'address, emergency_contact, emergency_phone, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+           generate_patients(rng, args.patients, now - timedelta(days=365 * 5), now),
+           'patients', args.patients)
+
+    insert(conn, 'INSERT INTO doctor (id, first_name, last_name, phone, email, specialization_id, '
+                 'license_number, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+           generate_doctors(rng, args.doctors, specialization_ids), 'doctors', args.doctors)
+
+    insert(conn, 'INSERT INTO appointment (patient_id, doctor_id, appointment_date, appointment_time, '
+                 'diagnosis, notes, status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+           generate_appointments(rng, args.appointments, args.patients, args.doctors, first_day, today),
+           'appointments', args.appointments)
+
+    pool = write_attachment_pool(rng, args.uploads)
+    insert(conn, 'INSERT INTO medical_record (patient_id, diagnosis, description, file_path, file_name, '
+                 'record_date, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+           generate_records(rng, args.records, args.patients, pool, args.attachment_ratio, today),
+           'medical records', args.records)
+
+    print('Building report rollups')
+    build_rollups()
+
+    conn.execute('ANALYZE')
+    conn.close()
+
+    manifest = {
+        'seed': args.seed,
+        'today': today.isoformat(),
+        'database': os.path.abspath(args.database),
+        'uploads': os.path.abspath(args.uploads),
+        'patients': args.patients,
+        'doctors': args.doctors,
+        'appointments': args.appointments,
+        'records': args.records,
+        'first_appointment_day': first_day.isoformat(),
+        'last_appointment_day': (today + timedelta(days=30)).isoformat(),
+        'staff_users': staff,
+        'staff_password': args.staff_password,
+        'last_names': LAST_NAMES,
+        'diagnoses': DIAGNOSES,
+    }
+    manifest_path = os.path.splitext(args.database)[0] + '.manifest.json'
+    with open(manifest_path, 'w') as handle:
+        json.dump(manifest, handle, indent=2)
+    print(f"Manifest written to {manifest_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+"""Bulk exports of whole tables for BI tools, as CSV, Arrow IPC or Parquet.
+
+``BulkExport.stream(dataset, format, ...)`` returns a generator of byte
+chunks that a view or command writes out as it goes. Rows are read
+``BULK_EXPORT_BATCH_SIZE`` at a time and each batch is encoded and handed
+on before the next one is fetched, so memory stays bounded by one batch
+whatever the size of the table.
+
+Each batch is its own short query on its own connection, keyset-paged on
+the id (``WHERE id > :last ORDER BY id LIMIT :batch``). A single cursor
+would keep one read transaction open for the whole download, and with
+SQLite that blocks every writer for as long as a slow client takes. Between
+batches the database is free. The price is that batches are separate
+snapshots: a row edited while the export runs goes out as its batch read
+it, and one deleted before its batch is left out.
+
+Datasets (``DATASETS``) are flat, denormalized selects: appointments with
+their doctor and specialization, medical record metadata (no description or
+file contents) and patients. Appointments and records include archived rows
+(archive.py); deleted patients (purge.py) are left out. Each can be limited
+to a date range on its date column (appointment date, record date,
+registration date).
+
+Incremental exports: rows are exported in id order, and ``plan()`` fixes the
+highest id the export will include (its watermark) before streaming starts.
+Passing that watermark as ``since`` next time exports only the rows added
+after it. Ids only grow, but an edit does not change a row's id: edits to
+already exported rows are not exported again.
+
+CSV is always available. Arrow IPC (stream format, zstd-compressed batches)
+and Parquet (one row group per batch) need the optional ``pyarrow`` package;
+without it ``formats`` lists CSV only.
+"""
+import csv
+import io
+from datetime import date, datetime, time
+
+from sqlalchemy import case, func, select, union_all
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # columnar formats are optional; CSV needs nothing
+    pa = pq = None
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+def _appointments(model):
+    from models import Doctor, Specialization
+    columns = [
+        (model.id.label('id'), 'int'), (model.patient_id, 'int'), (model.doctor_id, 'int'),
+        ((Doctor.first_name + ' ' + Doctor.last_name).label('doctor_name'), 'str'),
+        (Specialization.id.label('specialization_id'), 'int'), (Specialization.name.label('specialization'), 'str'),
+        (model.appointment_date, 'date'), (model.appointment_time, 'time'),
+        (model.status, 'str'), (model.diagnosis, 'str'), (model.notes, 'str'),
+        (model.created_at, 'datetime'),
+    ]
+    query = (select(*[column for column, _ in columns])
+             .join(Doctor, model.doctor_id == Doctor.id)
+             .join(Specialization, Doctor.specialization_id == Specialization.id))
+    return query, columns, model.id, model.appointment_date
+
+
+def _records(model):
+    columns = [
+        (model.id.label('id'), 'int'), (model.patient_id, 'int'), (model.diagnosis, 'str'),
+        (model.record_date, 'date'), (model.file_name, 'str'),
+        (case((model.file_path.is_(None), False), else_=True).label('has_file'), 'bool'),
+        (model.created_at, 'datetime'),
+    ]
+    query = select(*[column for column, _ in columns])
+    return query, columns, model.id, model.record_date
+
+
+def _patients(model):
+    columns = [
+        (model.id.label('id'), 'int'), (model.first_name, 'str'), (model.last_name, 'str'),
+        (model.date_of_birth, 'date'), (model.gender, 'str'), (model.phone, 'str'),
+        (model.email, 'str'), (model.created_at, 'datetime'),
+    ]
+    # Core select: purge.py's ORM criteria don't apply, so leave out deleted patients here
+    query = select(*[column for column, _ in columns]).where(model.deleted_at.is_(None))
+    return query, columns, model.id, func.date(model.created_at)
+
+
+def _sources(dataset):
+    """[(select, [(column, type)], id column, date column)] per table the dataset reads."""
+    from models import Appointment, ArchivedAppointment, ArchivedMedicalRecord, MedicalRecord, Patient
+    # Exports are history: they include archived rows (see archive.py)
+    models = {
+        'appointments': (Appointment, ArchivedAppointment),
+        'records': (MedicalRecord, ArchivedMedicalRecord),
+        'patients': (Patient,),
+    }[dataset]
+    return [DATASETS[dataset](model) for model in models]
+
+
+# Dataset -> builds (select, [(column, type)], id column, date column) for a model
+DATASETS = {
+    'appointments': _appointments,
+    'records': _records,
+    'patients': _patients,
+}
+
+
+def _arrow_type(kind):
+    return {
+        'int': pa.int64(), 'str': pa.string(), 'bool': pa.bool_(), 'date': pa.date32(),
+        'time': pa.time64('us'), 'datetime': pa.timestamp('us'),
+    }[kind]
+
+
+class _Sink(io.RawIOBase):
+    """A write-only file whose bytes are collected until ``drain()``."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _csv_value(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    return value
+
+
+class BulkExport:
+    """Streams datasets out in batches."""
+
+    def __init__(self, app=None):
+        self.batch_size = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('BULK_EXPORT_BATCH_SIZE', 10000)
+        app.extensions['bulk_export'] = self
+        self.batch_size = app.config['BULK_EXPORT_BATCH_SIZE']
+
+    @property
+    def formats(self):
+        return list(FORMATS) if pa is not None else ['csv']
+
+    def plan(self, connection, dataset, start=None, end=None, since=None):
+        """The export's sources and its watermark (highest id it includes, None when empty).
+
+        A source is ``(select, keys)`` per table: ``keys`` selects the ids the
+        export includes from that table alone.
+        """
+        sources = _sources(dataset)
+        columns = sources[0][1]
+        planned = []
+        watermark = None
+        for query, _, id_column, date_column in sources:
+            keys = select(id_column)
+            if start is not None:
+                keys = keys.where(date_column >= start)
+            if end is not None:
+                keys = keys.where(date_column <= end)
+            if since is not None:
+                keys = keys.where(id_column > since)
+            if query.whereclause is not None:
+                keys = keys.where(query.whereclause)  # e.g. deleted patients
+            highest = connection.scalar(keys.with_only_columns(func.max(id_column)))
+            if highest is not None and (watermark is None or highest > watermark):
+                watermark = highest
+            planned.append((query, keys))
+        if watermark is None:
+            return [], columns, None
+
+        # Rows added while the export runs wait for the next one
+        return [(query, keys.where(keys.selected_columns[0] <= watermark)) for query, keys in planned], columns, watermark
+
+    def batch(self, sources, after=None):
+        """The select for the next batch: up to ``batch_size`` rows with ids above ``after``, in id order."""
+        selects = []
+        for query, keys in sources:
+            id_column = keys.selected_columns[0]
+            if after is not None:
+                keys = keys.where(id_column > after)
+            # The ids come from the table alone, walking its primary key; the joins only fill in each batch
+            selects.append(query.where(id_column.in_(keys.order_by(id_column).limit(self.batch_size))))
+        if len(selects) == 1:
+            return selects[0].order_by(sources[0][1].selected_columns[0])
+        # Archived rows keep their ids, so the tables share one id order
+        combined = union_all(*selects)
+        return combined.order_by(combined.selected_columns[0]).limit(self.batch_size)
+
+    def stream(self, engine, dataset, export_format, start=None, end=None, since=None):
+        """(chunks, watermark): chunks is a generator of bytes in ``export_format``."""
+        with engine.connect() as connection:
+            sources, columns, watermark = self.plan(connection, dataset, start, end, since)
+        encode = {'csv': self._csv, 'arrow': self._arrow, 'parquet': self._parquet}[export_format]
+        return encode(self._batches(engine, sources, since), columns), watermark
+
+    def _batches(self, engine, sources, after):
+        while sources:
+            # A connection per batch: no read transaction stays open while the client downloads
+            with engine.connect() as connection:
+                rows = connection.execute(self.batch(sources, after)).all()
+            if not rows:
+                return
+            yield rows
+            after = rows[-1][0]
+
+    @staticmethod
+    def _csv(batches, columns):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([column.key for column, _ in columns])
+        for rows in batches:
+            writer.writerows([_csv_value(value) for value in row] for row in rows)
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue().encode('utf-8')
+
+    @staticmethod
+    def _record_batches(batches, columns):
+        schema = pa.schema([(column.key, _arrow_type(kind)) for column, kind in columns])
+        def convert(rows):
+            # Column-wise: one pa.array per column from the batch's rows
+            values = list(zip(*rows))
+            return pa.record_batch([pa.array(values[index], type=field.type)
+                                    for index, field in enumerate(schema)], schema=schema)
+        return schema, (convert(rows) for rows in batches)
+
+    def _arrow(self, batches, columns):
+        schema, record_batches = self._record_batches(batches, columns)
+        sink = _Sink()
+        options = pa.ipc.IpcWriteOptions(compression='zstd')
+        with pa.ipc.new_stream(sink, schema, options=options) as writer:
+            yield sink.drain()
+            for batch in record_batches:
+                writer.write_batch(batch)
+                yield sink.drain()
+        yield sink.drain()
+
+    def _parquet(self, batches, columns):
+        schema, record_batches = self._record_batches(batches, columns)
+        sink = _Sink()
+        with pq.ParquetWriter(sink, schema, compression='zstd') as writer:
+            for batch in record_batches:
+                writer.write_batch(batch)  # one row group per batch
+                yield sink.drain()
+        yield sink.drain()
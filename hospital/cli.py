@@ -0,0 +1,175 @@
+"""Command-line tasks: ``flask --app app init-db``.
+
+Schema creation and the default data used to run on every import of the
+app; they now run only when asked for, once per deployment (and again
+after upgrades that add columns, see schema.py).
+"""
+import click
+from datetime import timedelta
+
+import outbox
+from backup import BackupError
+import rollups
+from bulk_export import DATASETS, FORMATS
+from extensions import archiver, assets, backups, bulk_export, db, passwords, purger, session_store
+from models import User, Specialization
+from schema import add_missing_columns, add_missing_indexes
+
+DEFAULT_SPECIALIZATIONS = ['General Medicine', 'Cardiology', 'Neurology', 'Orthopedics', 'Pediatrics', 'Dermatology']
+
+
+def init_database(echo=click.echo):
+    """Creates missing tables and columns and seeds a fresh database with its defaults."""
+    db.create_all()
+    for column in add_missing_columns(db.engine, db.metadata):
+        echo(f"Added column {column}")
+    for index in add_missing_indexes(db.engine, db.metadata):
+        echo(f"Added index {index}")
+    
+    # Backfill the report rollups when they are new to an existing database
+    if rollups.needs_backfill(db.session.connection()):
+        rollups.rebuild(db.session.connection())
+        db.session.commit()
+        echo("Backfilled report rollups")
+    
+    # Only seed an empty database, never overwrite existing data
+    if User.query.first() is not None:
+        echo("Existing database found - preserving data")
+        return
+    
+    admin = User(
+        username='admin',
+        password_hash=passwords.hash('admin123'),
+        first_name='System',
+        last_name='Administrator',
+        role='admin'
+    )
+    db.session.add(admin)
+    echo("Created default admin user")
+    
+    for spec_name in DEFAULT_SPECIALIZATIONS:
+        db.session.add(Specialization(name=spec_name))
+        echo(f"Created specialization: {spec_name}")
+    
+    db.session.commit()
+
+
+def register_commands(app):
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create the database schema and default data."""
+        init_database()
+        click.echo(f"Database ready: {db.engine.url}")
+    
+    @app.cli.command('assets-build')
+    def assets_build_command():
+        """Bundle, fingerprint and precompress the static assets."""
+        manifest = assets.rebuild()
+        click.echo(f"Built {len(manifest)} assets into {assets.dist_folder}")
+    
+    @app.cli.command('sessions-sweep')
+    def sessions_sweep_command():
+        """Delete expired server-side sessions."""
+        click.echo(f"Removed {session_store.sweep()} expired sessions")
+    
+    @app.cli.command('rollups-rebuild')
+    @click.option('--start', type=click.DateTime(['%Y-%m-%d']), help='first day to recompute (default: all)')
+    @click.option('--end', type=click.DateTime(['%Y-%m-%d']), help='last day to recompute (default: all)')
+    def rollups_rebuild_command(start, end):
+        """Recompute the report rollups from the base tables (backfill)."""
+        start = start.date() if start else None
+        end = end.date() if end else None
+        with db.engine.begin() as connection:
+            rollups.rebuild(connection, start, end)
+        click.echo(f"Rebuilt rollups for {start or 'the beginning'} to {end or 'the end'}")
+    
+    @app.cli.command('export')
+    @click.argument('dataset', type=click.Choice(list(DATASETS)))
+    @click.argument('output', type=click.File('wb'))
+    @click.option('--format', 'export_format', type=click.Choice(list(FORMATS)), default='csv')
+    @click.option('--start', type=click.DateTime(['%Y-%m-%d']), help='first day to include (default: all)')
+    @click.option('--end', type=click.DateTime(['%Y-%m-%d']), help='last day to include (default: all)')
+    @click.option('--since', type=int, help='only rows after this watermark (from a previous export)')
+    def export_command(dataset, output, export_format, start, end, since):
+        """Write a dataset to OUTPUT for BI tools, in batches."""
+        if export_format not in bulk_export.formats:
+            raise click.UsageError(f"{export_format} exports need pyarrow, which is not installed")
+        with db.engine.connect() as connection:
+            change_cursor = outbox.latest(connection)  # before the export reads anything
+        chunks, watermark = bulk_export.stream(db.engine, dataset, export_format,
+                                               start.date() if start else None, end.date() if end else None, since)
+        written = 0
+        for chunk in chunks:
+            output.write(chunk)
+            written += len(chunk)
+        click.echo(f"Wrote {written:,} bytes; next incremental export: --since {watermark or since or 0}; "
+                   f"change feed: /api/changes?since={change_cursor}", err=True)
+    
+    @app.cli.command('changes-compact')
+    @click.option('--compact-after', type=float, default=outbox.COMPACT_AFTER.total_seconds() / 3600,
+                  show_default=True, help='hours after which superseded events are dropped')
+    @click.option('--retention', type=float, default=outbox.RETENTION.days,
+                  show_default=True, help='days after which every event is dropped')
+    def changes_compact_command(compact_after, retention):
+        """Drop superseded and expired change feed events."""
+        with db.engine.begin() as connection:
+            superseded, expired = outbox.compact(connection, timedelta(hours=compact_after), timedelta(days=retention))
+        click.echo(f"Removed {superseded} superseded and {expired} expired change events")
+    
+    @app.cli.command('backup')
+    def backup_command():
+        """Back up the database online, then apply the retention."""
+        def progress(done, total):
+            if done == total or done % (50 * app.config['BACKUP_PAGES_PER_STEP']) == 0:
+                click.echo(f"  {done:,}/{total:,} pages", err=True)
+        try:
+            manifest = backups.create(db.engine.url.database, progress)
+        except BackupError as error:
+            raise click.ClickException(str(error))
+        click.echo(f"Backed up {manifest['database_bytes']:,} bytes to {manifest['file']} "
+                   f"({manifest['bytes']:,} bytes, {manifest['seconds']}s, {manifest['restarts']} restarts)")
+        for name in backups.prune():
+            click.echo(f"Removed expired backup {name}")
+    
+    @app.cli.command('backup-list')
+    def backup_list_command():
+        """List the backups, newest first."""
+        for manifest in backups.list():
+            click.echo(f"{manifest['file']}  {manifest['bytes']:>14,} bytes  sha256 {manifest['sha256'][:16]}")
+    
+    @app.cli.command('restore')
+    @click.argument('backup', type=click.Path(exists=True, dir_okay=False))
+    @click.confirmation_option(prompt='This replaces the live database. Continue?')
+    def restore_command(backup):
+        """Replace the database with a verified BACKUP."""
+        try:
+            manifest = backups.restore(backup, db.engine.url.database)
+        except BackupError as error:
+            raise click.ClickException(str(error))
+        click.echo(f"Restored {manifest['file']} from {manifest['created_at']}; restart the workers")
+    
+    @app.cli.command('archive')
+    @click.option('--before', type=click.DateTime(['%Y-%m-%d']),
+                  help='archive rows dated before this day (default: ARCHIVE_AFTER_DAYS ago)')
+    @click.option('--limit', type=int, help='at most this many rows per table')
+    def archive_command(before, limit):
+        """Move old appointments and records into the archive tables."""
+        moved = archiver.run(before.date() if before else None, limit)
+        for table, count in moved.items():
+            click.echo(f"Archived {count:,} rows of {table}")
+        for table, counts in archiver.stats()['tables'].items():
+            click.echo(f"  {table}: {counts['hot']:,} hot, {counts['archived']:,} archived")
+    
+    @app.cli.command('purge')
+    def purge_command():
+        """Finish purging deleted patients now, and show recent purges."""
+        def progress(status):
+            click.echo(f"  patient #{status['patient_id']}: {status['records']:,}/{status['records_total']:,} records, "
+                       f"{status['appointments']:,}/{status['appointments_total']:,} appointments, "
+                       f"{status['files']:,} files", err=True)
+        click.echo(f"Purged {purger.run(progress)} deleted patients")
+        stats = purger.stats()
+        for status in stats['pending'] + stats['recent']:
+            state = f"finished {status['finished_at']}" if status['finished_at'] else f"{status['percent']}% done"
+            error = f" (error: {status['error']})" if status['error'] else ''
+            click.echo(f"  patient #{status['patient_id']}: {state}{error}")
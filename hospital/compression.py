@@ -0,0 +1,174 @@
+"""Negotiated compression of dynamic responses.
+
+HTML listings and the calendar/availability JSON are mostly repeated markup
+and keys, so they shrink by an order of magnitude. ``Compression(app)``
+compresses them with the best encoding both sides support: zstd (with the
+``zstandard`` package), brotli (with the ``brotli`` package) or gzip, which
+is always available.
+
+Responses are left alone when they are smaller than ``COMPRESS_MIN_SIZE``,
+already carry a Content-Encoding (the precompressed files under /assets/),
+are served by ``send_file`` (uploads and exports: often already compressed,
+and their Range/conditional handling works on the raw bytes) or have a
+mimetype outside ``COMPRESS_MIMETYPES``. Streamed responses are compressed
+chunk by chunk, flushing after each one so the client still receives data as
+it is produced.
+"""
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_MIMETYPES = {
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript', 'text/xml',
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+}
+
+
+class GzipEncoder:
+    name = 'gzip'
+
+    def __init__(self, level):
+        # wbits 16 + MAX_WBITS writes the gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    name = 'br'
+
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    name = 'zstd'
+
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def available_encoders():
+    """Encoders usable in this process, in order of preference on equal quality."""
+    encoders = {}
+    if zstandard is not None:
+        encoders['zstd'] = ZstdEncoder
+    if brotli is not None:
+        encoders['br'] = BrotliEncoder
+    encoders['gzip'] = GzipEncoder
+    return encoders
+
+
+class Compression:
+    """Compresses eligible responses with the client's preferred encoding."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.encoders = available_encoders()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_MIN_SIZE', 500)  # bytes
+        app.config.setdefault('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES)
+        app.config.setdefault('COMPRESS_LEVELS', {'gzip': 6, 'br': 4, 'zstd': 3})
+        app.extensions['compression'] = self
+        self.app = app
+
+        if app.config['COMPRESS_ENABLED']:
+            app.after_request(self.compress_response)
+
+    def choose_encoding(self, accept_encodings):
+        """Picks the encoding with the highest q-value, ties broken by preference."""
+        best, best_quality = None, 0
+        for name in self.encoders:
+            quality = accept_encodings[name]
+            if quality > best_quality:
+                best, best_quality = name, quality
+        return best
+
+    def compress_response(self, response):
+        config = self.app.config
+        if response.mimetype not in config['COMPRESS_MIMETYPES']:
+            return response
+        # The body depends on Accept-Encoding from here on, even when it stays plain
+        response.vary.add('Accept-Encoding')
+
+        if (response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or request.method == 'HEAD'):
+            return response
+        if not response.is_streamed and response.content_length is not None \
+                and response.content_length < config['COMPRESS_MIN_SIZE']:
+            return response
+
+        encoding = self.choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        encoder = self.encoders[encoding](config['COMPRESS_LEVELS'][encoding])
+
+        if response.is_streamed:
+            response.response = self._stream(response.response, encoder)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            response.set_data(encoder.compress(data) + encoder.finish())
+
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # The encoded bytes differ from the identity representation
+            response.set_etag(etag, weak=True)
+        return response
+
+    @staticmethod
+    def _stream(chunks, encoder):
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                data = encoder.compress(chunk) + encoder.flush()
+                if data:
+                    yield data
+            yield encoder.finish()
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
@@ -0,0 +1,254 @@
+"""Live updates: data changes pushed to browsers as Server-Sent Events.
+
+Write views call ``event_bus.publish(channel, op, id, **fields)`` after their
+commit. The event is appended to a small SQLite file shared by every worker
+on the host (``EVENT_BUS_STORE``, in the instance folder by default) and
+handed straight to this process's subscribers. One poller thread per process
+(started on first use, so it survives a pre-fork server) reads
+the other workers' events every ``EVENT_BUS_POLL_INTERVAL`` seconds and fans
+them out, so a write in one worker reaches browsers connected to any worker.
+
+``/events`` (views/live.py) streams them. Each subscriber has a queue of
+``EVENT_BUS_QUEUE_SIZE`` events; a client that falls that far behind is
+disconnected instead of buffering without bound. Browsers reconnect on their
+own and send Last-Event-ID, and what they missed is replayed from the file,
+which keeps the last ``EVENT_BUS_RETENTION`` seconds of events.
+
+A stream ends after ``EVENT_STREAM_TIMEOUT`` seconds (the browser reconnects
+at once), because gunicorn kills a sync worker that stays in one request for
+longer than its timeout. Every open stream occupies a sync worker or a
+gthread thread, so streams per process are capped (the ``stream`` class in
+rate_limit.py). A client turned away polls ``/api/events/poll``
+(``poll()``), which reads the same file and returns at once; serve many
+streaming subscribers with serve.py's gevent profile.
+
+Publishing is best effort: if the store fails the error is logged and the
+write that triggered it is unaffected.
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS event (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    origin TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS event_created ON event (created);
+"""
+
+CHANNELS = ('appointment', 'patient', 'record', 'access_request')
+
+RECONNECT_MS = 1000  # how long browsers wait before reconnecting
+
+
+class Subscriber:
+    """One open stream: the channels it wants and its queue of pending events."""
+
+    __slots__ = ('channels', 'queue', 'overflowed', 'replayed')
+
+    def __init__(self, channels, size):
+        self.channels = frozenset(channels)
+        self.queue = queue.Queue(size)
+        self.overflowed = False
+        self.replayed = set()
+
+
+class EventBus:
+    """Publishes events through a shared SQLite file and fans them out to subscribers."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.path = None
+        self.poll_interval = 0
+        self.retention = 0
+        self.queue_size = 0
+        self.stream_timeout = 0
+        self.heartbeat = 0
+        self.published = 0
+        self.delivered = 0
+        self.disconnected = 0
+        self.peak_subscribers = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._origin = None
+        self._pid = None
+        self._last_id = 0
+        self._last_prune = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('EVENT_BUS_STORE', os.path.join(app.instance_path, 'events.db'))
+        app.config.setdefault('EVENT_BUS_POLL_INTERVAL', 1.0)
+        app.config.setdefault('EVENT_BUS_RETENTION', 600)
+        app.config.setdefault('EVENT_BUS_QUEUE_SIZE', 256)
+        app.config.setdefault('EVENT_STREAM_TIMEOUT', 45)
+        app.config.setdefault('EVENT_STREAM_HEARTBEAT', 15)
+        app.extensions['event_bus'] = self
+        self.app = app
+        self.path = app.config['EVENT_BUS_STORE']
+        self.poll_interval = app.config['EVENT_BUS_POLL_INTERVAL']
+        self.retention = app.config['EVENT_BUS_RETENTION']
+        self.queue_size = app.config['EVENT_BUS_QUEUE_SIZE']
+        self.stream_timeout = app.config['EVENT_STREAM_TIMEOUT']
+        self.heartbeat = app.config['EVENT_STREAM_HEARTBEAT']
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+    def publish(self, channel, op, entity_id, **fields):
+        """Sends a delta to every subscriber of channel; returns its event id."""
+        payload = json.dumps({'op': op, 'id': entity_id, **fields}, default=str)
+        self._ensure_poller()
+        try:
+            with self._connection() as connection:
+                event_id = connection.execute(
+                    'INSERT INTO event (origin, channel, payload, created) VALUES (?, ?, ?, ?)',
+                    (self._origin, channel, payload, time.time())).lastrowid
+        except sqlite3.Error:
+            self.app.logger.exception('Could not publish %s event', channel)
+            return None
+        self.published += 1
+        self._deliver([(event_id, channel, payload)])
+        return event_id
+
+    def subscribe(self, channels, last_event_id=None):
+        """Registers a subscriber, first queueing the events it missed since last_event_id."""
+        self._ensure_poller()
+        subscriber = Subscriber(channels, self.queue_size)
+        missed = self._since(last_event_id, subscriber.channels) if last_event_id else []
+        with self._lock:
+            for row in missed[-self.queue_size:]:
+                subscriber.queue.put_nowait(row)
+                subscriber.replayed.add(row[0])  # don't deliver these twice
+            self._subscribers.add(subscriber)
+            self.peak_subscribers = max(self.peak_subscribers, len(self._subscribers))
+        return subscriber
+
+    def poll(self, channels, last_event_id=None):
+        """(events on channels after last_event_id, id to poll from next), for clients that can't stream."""
+        try:
+            if last_event_id is None:
+                return [], self._max_id()
+            rows = self._connection().execute('SELECT id, channel, payload FROM event WHERE id > ? ORDER BY id',
+                                              (last_event_id,)).fetchall()
+        except sqlite3.Error:
+            return [], last_event_id
+        return [row for row in rows if row[1] in channels], rows[-1][0] if rows else last_event_id
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def stream(self, subscriber):
+        """Yields the subscriber's events in SSE format until the stream times out."""
+        deadline = time.monotonic() + self.stream_timeout
+        try:
+            yield f'retry: {RECONNECT_MS}\n\n'
+            while not subscriber.overflowed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event_id, channel, payload = subscriber.queue.get(timeout=min(self.heartbeat, remaining))
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f'id: {event_id}\nevent: {channel}\ndata: {payload}\n\n'
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        return {'subscribers': len(self._subscribers), 'peak_subscribers': self.peak_subscribers,
+                'published': self.published, 'delivered': self.delivered,
+                'disconnected': self.disconnected, 'last_id': self._last_id}
+
+    # Fan-out
+
+    def _deliver(self, rows):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for row in rows:
+            for subscriber in subscribers:
+                if row[1] not in subscriber.channels or subscriber.overflowed:
+                    continue
+                if row[0] in subscriber.replayed:
+                    subscriber.replayed.discard(row[0])
+                    continue
+                try:
+                    subscriber.queue.put_nowait(row)
+                    self.delivered += 1
+                except queue.Full:
+                    # Too slow: drop it; the browser reconnects and replays from Last-Event-ID
+                    subscriber.overflowed = True
+                    self.disconnected += 1
+                    self.unsubscribe(subscriber)
+
+    def _ensure_poller(self):
+        # Threads don't survive fork, so a pre-forked worker starts its own poller
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._origin = uuid.uuid4().hex
+                    self._subscribers = set()
+                    try:
+                        self._last_id = self._max_id()
+                    except sqlite3.Error:
+                        self._last_id = 0
+                    threading.Thread(target=self._poll_loop, name='event-bus', daemon=True).start()
+                    self._pid = os.getpid()
+
+    def _poll_loop(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self._poll()
+            except sqlite3.Error:
+                self.app.logger.exception('Event bus store unavailable')
+
+    def _poll(self):
+        connection = self._connection()
+        if not self._subscribers:
+            self._last_id = self._max_id()
+        else:
+            rows = connection.execute('SELECT id, channel, payload FROM event WHERE id > ? AND origin != ? '
+                                      'ORDER BY id', (self._last_id, self._origin)).fetchall()
+            if rows:
+                self._last_id = rows[-1][0]
+                self._deliver(rows)
+        if time.monotonic() - self._last_prune >= 60:
+            self._last_prune = time.monotonic()
+            with connection:
+                connection.execute('DELETE FROM event WHERE created < ?', (time.time() - self.retention,))
+
+    # Storage
+
+    def _since(self, last_event_id, channels):
+        try:
+            rows = self._connection().execute('SELECT id, channel, payload FROM event WHERE id > ? ORDER BY id',
+                                              (int(last_event_id),)).fetchall()
+        except (ValueError, sqlite3.Error):
+            return []
+        return [row for row in rows if row[1] in channels]
+
+    def _max_id(self):
+        return self._connection().execute('SELECT coalesce(max(id), 0) FROM event').fetchone()[0]
+
+    def _connection(self):
+        # One connection per thread and process (sqlite3 connections can't cross either)
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = OFF')
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
@@ -0,0 +1,44 @@
+"""Extension objects shared by the application factory and the blueprints.
+
+They are created unbound here and attached to an app in ``create_app()``
+(see app.py), so importing a view or model module never needs an
+application or a database.
+"""
+from flask_sqlalchemy import SQLAlchemy
+
+from analytics import Analytics
+from archive import Archiver
+from assets import Assets
+from audit import AuditLog
+from backup import Backups
+from bulk_export import BulkExport
+from compression import Compression
+from event_bus import EventBus
+from fragment_cache import FragmentCache
+from memory_budget import MemoryBudget
+from passwords import PasswordHasher
+from principal import PrincipalCache
+from purge import PatientPurger
+from rate_limit import RateLimiter
+from session_store import ServerSessionStore
+from statements import StatementRegistry
+
+db = SQLAlchemy()
+memory_budget = MemoryBudget()
+assets = Assets()
+compression = Compression()
+fragment_cache = FragmentCache()
+principal_cache = PrincipalCache()
+passwords = PasswordHasher()
+rate_limiter = RateLimiter()
+session_store = ServerSessionStore(db)
+audit = AuditLog(db)
+event_bus = EventBus()
+analytics = Analytics()
+archiver = Archiver(db)
+bulk_export = BulkExport()
+backups = Backups()
+purger = PatientPurger(db)
+
+# Prebuilt statements for the hot routes (built once per process, see statements.py and queries.py)
+statements = StatementRegistry()
@@ -0,0 +1,180 @@
+"""Caching of rendered template fragments.
+
+The list pages render one card per row, and each card is the same HTML on
+every request until its row changes. Wrapping a card in the ``cache`` tag
+renders it once and reuses the markup:
+
+    {% cache 'patient', patient.id, patient.version, patient.age, visits %}
+        ...card markup...
+    {% endcache %}
+
+The first two arguments name the entity the fragment belongs to (used by
+``invalidate``); every argument, together with the template name and line,
+forms the cache key. Pass everything the markup depends on: the row version
+(bumped by SQLAlchemy on every UPDATE) and any value computed from other
+rows or from the current date. Then a stale fragment can only be found under
+an old key, so cached entries never need to be shared or expired across
+worker processes to stay correct.
+
+Entries live in a per-process LRU bounded by ``FRAGMENT_CACHE_MAX_BYTES``
+and, when ``FRAGMENT_CACHE_DIR`` is set, in files under that directory
+shared by every worker on the host. ``invalidate(kind, id)`` drops an
+entity's fragments from both, so edited rows don't sit in memory until
+they're evicted.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+
+class FragmentCacheExtension(Extension):
+    """Adds the ``{% cache kind, id, *version %}...{% endcache %}`` tag."""
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [nodes.Const(parser.name), nodes.Const(lineno), parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', [nodes.Tuple(key, 'load')]),
+                               [], [], body).set_lineno(lineno)
+
+    def _render(self, key, caller):
+        cache = self.environment.fragment_cache
+        if cache is None or not cache.enabled:
+            return caller()
+        html = cache.get(key)
+        if html is None:
+            html = str(caller())
+            cache.set(key, html)
+        return Markup(html)
+
+
+class FragmentCache:
+    """Bounded in-process LRU of rendered fragments with an optional disk tier."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.max_bytes = 0
+        self.directory = None
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FRAGMENT_CACHE_ENABLED', True)
+        app.config.setdefault('FRAGMENT_CACHE_MAX_BYTES', 16 * 1024 * 1024)
+        app.config.setdefault('FRAGMENT_CACHE_DIR', None)
+        app.extensions['fragment_cache'] = self
+        self.app = app
+        self.enabled = app.config['FRAGMENT_CACHE_ENABLED']
+        self.max_bytes = app.config['FRAGMENT_CACHE_MAX_BYTES']
+        self.directory = app.config['FRAGMENT_CACHE_DIR']
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        app.jinja_env.fragment_cache = self
+
+    def get(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return html
+        html = self._read(key)
+        if html is not None:
+            self._remember(key, html)
+            self.hits += 1
+            return html
+        self.misses += 1
+        return None
+
+    def set(self, key, html):
+        self._remember(key, html)
+        self._write(key, html)
+
+    def invalidate(self, kind, entity_id):
+        """Drops every cached fragment of one entity, e.g. ('patient', 42)."""
+        with self._lock:
+            for key in [key for key in self._entries if key[2:4] == (kind, entity_id)]:
+                self.size -= len(self._entries.pop(key))
+        if self.directory:
+            shutil.rmtree(self._entity_dir(kind, entity_id), ignore_errors=True)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+        if self.directory:
+            for name in os.listdir(self.directory):
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def stats(self):
+        return {'entries': len(self._entries), 'bytes': self.size, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses}
+
+    def _remember(self, key, html):
+        # Sizes are counted in characters, which is close enough for a bound
+        if len(html) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = html
+            self.size += len(html)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    # Disk tier: <directory>/<kind>/<id>/<sha256 of the key>.html
+
+    def _entity_dir(self, kind, entity_id):
+        return os.path.join(self.directory, str(kind), str(entity_id))
+
+    def _path(self, key):
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()
+        return os.path.join(self._entity_dir(key[2], key[3]), digest + '.html')
+
+    def _read(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), encoding='utf-8') as handle:
+                return handle.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, key, html):
+        if not self.directory:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so concurrent readers never see a partial file
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+                handle.write(html)
+            os.replace(temp_path, path)
+        except OSError:
+            # A concurrent invalidate removed the directory; the memory copy still serves
+            pass
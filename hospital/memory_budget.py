@@ -0,0 +1,146 @@
+"""Opt-in per-request memory instrumentation built on tracemalloc.
+
+Enable it with ``MEMORY_PROFILING = True``. Every request then records its
+peak allocation, and requests that go over their budget are logged together
+with their largest allocation sites. Those are taken when the request
+crosses its budget, not when it ends (by then the peak's allocations are
+usually freed): a watcher thread samples the traced memory every
+``MEMORY_SAMPLE_INTERVAL`` seconds and snapshots it on the first sample over
+budget. A peak shorter than the interval is still counted, but its sites
+fall back to what the request held when it finished.
+
+tracemalloc traces the whole process, so the numbers are only exact when a
+worker handles one request at a time (sync workers).
+"""
+import os
+import threading
+import time
+import tracemalloc
+
+from flask import request
+from werkzeug.wsgi import ClosingIterator
+
+ENDPOINT_KEY = 'memory_budget.endpoint'
+
+# Frames that belong to the tracer itself rather than to the request
+IGNORED_FRAMES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+class MemoryBudget:
+    """Tracks peak allocation per endpoint and logs requests over budget."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._active = None  # the request being measured: environ, baseline, snapshot
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MEMORY_PROFILING', False)
+        app.config.setdefault('MEMORY_BUDGET', 64 * 1024 * 1024)  # bytes per request
+        app.config.setdefault('MEMORY_BUDGETS', {})  # endpoint -> bytes
+        app.config.setdefault('MEMORY_TRACE_FRAMES', 10)
+        app.config.setdefault('MEMORY_TOP_SITES', 10)
+        app.config.setdefault('MEMORY_SAMPLE_INTERVAL', 0.01)  # seconds
+        app.extensions['memory_budget'] = self
+        self.app = app
+
+        if not app.config['MEMORY_PROFILING']:
+            return
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(app.config['MEMORY_TRACE_FRAMES'])
+
+        @app.before_request
+        def remember_endpoint():
+            request.environ[ENDPOINT_KEY] = request.endpoint
+
+        # Wrap the WSGI callable so streamed response bodies are measured too
+        wsgi_app = app.wsgi_app
+
+        def measured_app(environ, start_response):
+            self._ensure_watcher()
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            self._active = {'environ': environ, 'baseline': baseline, 'snapshot': None}
+            app_iter = wsgi_app(environ, start_response)
+            return ClosingIterator(app_iter, lambda: self._finish(environ, baseline))
+
+        app.wsgi_app = measured_app
+
+    def budget_for(self, endpoint):
+        """Returns the allowed peak allocation in bytes for an endpoint."""
+        config = self.app.config
+        return config['MEMORY_BUDGETS'].get(endpoint, config['MEMORY_BUDGET'])
+
+    def _finish(self, environ, baseline):
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        active, self._active = self._active, None
+        snapshot = active['snapshot'] if active is not None and active['environ'] is environ else None
+        endpoint = environ.get(ENDPOINT_KEY) or environ.get('PATH_INFO')
+        budget = self.budget_for(endpoint)
+        over_budget = peak > budget
+
+        with self._lock:
+            entry = self.stats.setdefault(endpoint, {
+                'requests': 0,
+                'peak': 0,
+                'last_peak': 0,
+                'over_budget': 0,
+            })
+            entry['requests'] += 1
+            entry['last_peak'] = peak
+            entry['peak'] = max(entry['peak'], peak)
+            if over_budget:
+                entry['over_budget'] += 1
+
+        if over_budget:
+            self.app.logger.warning(
+                'Request %s %s (%s) peaked at %.1f MiB, over its %.1f MiB budget. '
+                'Top allocation sites %s:\n%s',
+                environ.get('REQUEST_METHOD'), environ.get('PATH_INFO'), endpoint,
+                peak / 1048576, budget / 1048576,
+                'when it crossed the budget' if snapshot is not None else 'still held at the end (peak between samples)',
+                self.top_sites(snapshot=snapshot))
+
+    def top_sites(self, limit=None, snapshot=None):
+        """Formats the largest allocation sites of ``snapshot`` (default: held in memory now)."""
+        limit = limit or self.app.config['MEMORY_TOP_SITES']
+        snapshot = (snapshot or tracemalloc.take_snapshot()).filter_traces(IGNORED_FRAMES)
+        lines = []
+        for stat in snapshot.statistics('lineno')[:limit]:
+            frame = stat.traceback[0]
+            lines.append(f"  {frame.filename}:{frame.lineno}: {stat.size / 1024:.1f} KiB in {stat.count} blocks")
+        return '\n'.join(lines)
+
+    def _ensure_watcher(self):
+        # Threads don't survive fork, so a pre-forked worker starts its own watcher
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    threading.Thread(target=self._watch_loop, name='memory-budget', daemon=True).start()
+                    self._pid = os.getpid()
+
+    def _watch_loop(self):
+        interval = self.app.config['MEMORY_SAMPLE_INTERVAL']
+        while True:
+            time.sleep(interval)
+            active = self._active
+            if active is None or active['snapshot'] is not None:
+                continue
+            endpoint = active['environ'].get(ENDPOINT_KEY)
+            if tracemalloc.get_traced_memory()[0] - active['baseline'] > self.budget_for(endpoint):
+                active['snapshot'] = tracemalloc.take_snapshot()
+
+    def report(self):
+        """Returns a copy of the per-endpoint statistics."""
+        with self._lock:
+            return {endpoint: dict(entry) for endpoint, entry in self.stats.items()}
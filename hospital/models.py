@@ -0,0 +1,197 @@
+import operator
+from datetime import datetime, date
+
+from sqlalchemy import Integer, and_, case, cast, func, not_
+from sqlalchemy.ext.hybrid import Comparator, hybrid_property
+from sqlalchemy.sql import operators
+
+from extensions import db
+from projections import age_on
+
+# Age brackets of the dashboard and the patient filters: (label, youngest, oldest or None)
+AGE_BRACKETS = [('0-17', 0, 17), ('18-39', 18, 39), ('40-64', 40, 64), ('65+', 65, None)]
+
+
+def years_before(day, years):
+    """The same day ``years`` earlier; 29 February becomes the 28th in other years."""
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+
+class AgeComparator(Comparator):
+    """SQL side of Patient.age.
+
+    Comparisons and ordering become conditions on date_of_birth itself
+    (``age >= 65`` is ``date_of_birth <= 65 years ago``), so they use its
+    index; anything else gets the computed age.
+    """
+
+    def __init__(self, date_of_birth):
+        super().__init__(date_of_birth)
+        self.date_of_birth = date_of_birth
+
+    def __clause_element__(self):
+        today = date.today()
+        return today.year - cast(func.strftime('%Y', self.date_of_birth), Integer) \
+            - cast(func.strftime('%m-%d', self.date_of_birth) > today.strftime('%m-%d'), Integer)
+
+    def _at_least(self, age):
+        # Turned `age` by today: born on or before this day `age` years ago
+        return self.date_of_birth <= years_before(date.today(), age)
+
+    def operate(self, op, *other, **kwargs):
+        if op is operator.ge:
+            return self._at_least(other[0])
+        if op is operator.gt:
+            return self._at_least(other[0] + 1)
+        if op is operator.le:
+            return not_(self._at_least(other[0] + 1))
+        if op is operator.lt:
+            return not_(self._at_least(other[0]))
+        if op is operator.eq:
+            return and_(self._at_least(other[0]), not_(self._at_least(other[0] + 1)))
+        if op is operator.ne:
+            return not_(self.operate(operator.eq, *other))
+        if op is operators.between_op:
+            return and_(self.operate(operator.ge, other[0]), self.operate(operator.le, other[1]))
+        if op is operators.asc_op:
+            return self.date_of_birth.desc()  # youngest first
+        if op is operators.desc_op:
+            return self.date_of_birth.asc()
+        return op(self.__clause_element__(), *other, **kwargs)
+
+# Database Models (3NF Normalized)
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(50), unique=True, nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
+    first_name = db.Column(db.String(50), nullable=False)
+    last_name = db.Column(db.String(50), nullable=False)
+    role = db.Column(db.String(20), default='user')  # admin, user
+    is_active = db.Column(db.Boolean, default=True)
+    session_epoch = db.Column(db.Integer, nullable=False, server_default='0')  # bumped to sign out every session
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class AccessRequest(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    first_name = db.Column(db.String(50), nullable=False)
+    last_name = db.Column(db.String(50), nullable=False)
+    reason = db.Column(db.Text, nullable=False)
+    is_temporary = db.Column(db.Boolean, default=False)
+    status = db.Column(db.String(20), default='pending')  # pending, approved, rejected
+    requested_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Specialization(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+    doctors = db.relationship('Doctor', backref='specialization_ref', lazy=True)
+
+class Doctor(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    first_name = db.Column(db.String(50), nullable=False)
+    last_name = db.Column(db.String(50), nullable=False)
+    phone = db.Column(db.String(20))
+    email = db.Column(db.String(100))
+    specialization_id = db.Column(db.Integer, db.ForeignKey('specialization.id'), nullable=False)
+    license_number = db.Column(db.String(50), unique=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, server_default='1')  # bumped on every UPDATE
+    appointments = db.relationship('Appointment', backref='doctor_ref', lazy=True)
+
+    __mapper_args__ = {'version_id_col': version}
+
+class Patient(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    first_name = db.Column(db.String(50), nullable=False)
+    last_name = db.Column(db.String(50), nullable=False)
+    date_of_birth = db.Column(db.Date, nullable=False)
+    gender = db.Column(db.String(10), nullable=False)
+    phone = db.Column(db.String(20))
+    email = db.Column(db.String(100))
+    address = db.Column(db.Text)
+    emergency_contact = db.Column(db.String(100))
+    emergency_phone = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, server_default='1')  # bumped on every UPDATE
+    deleted_at = db.Column(db.DateTime)  # set on delete; purge.py removes the row and what it owns
+    # Age filters, sorts and brackets (see AgeComparator); deleted_at makes the counts index-only
+    __table_args__ = (db.Index('ix_patient_date_of_birth', 'date_of_birth', 'deleted_at'),)
+    # The purge deletes children in batches; deleting the patient must not load them
+    appointments = db.relationship('Appointment', backref='patient_ref', lazy=True, passive_deletes=True)
+    medical_records = db.relationship('MedicalRecord', backref='patient_ref', lazy=True, passive_deletes=True)
+
+    __mapper_args__ = {'version_id_col': version}
+
+    @hybrid_property
+    def age(self):
+        return age_on(self.date_of_birth)
+
+    @age.comparator
+    def age(cls):
+        return AgeComparator(cls.date_of_birth)
+
+    @classmethod
+    def age_bracket(cls):
+        """SQL expression for the patient's AGE_BRACKETS label."""
+        *younger, (oldest_label, _, _) = AGE_BRACKETS
+        return case(*[(cls.age <= oldest, label) for label, _, oldest in younger], else_=oldest_label)
+
+    @property
+    def admission_count(self):
+        return len(self.appointments)
+
+class Appointment(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False, index=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctor.id'), nullable=False)
+    appointment_date = db.Column(db.Date, nullable=False)
+    appointment_time = db.Column(db.Time, nullable=False)
+    diagnosis = db.Column(db.Text)
+    notes = db.Column(db.Text)
+    status = db.Column(db.String(20), default='scheduled')  # scheduled, completed, cancelled
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, server_default='1')  # bumped on every UPDATE
+
+    # A doctor's day (booked times, conflicts, the filtered listing); doctor_id alone for their counts
+    __table_args__ = (db.Index('ix_appointment_doctor_date', 'doctor_id', 'appointment_date'),)
+    __mapper_args__ = {'version_id_col': version}
+
+class MedicalRecord(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False, index=True)
+    diagnosis = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    file_path = db.Column(db.String(255))
+    file_name = db.Column(db.String(255))
+    record_date = db.Column(db.Date, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Rows moved out of the hot tables by archive.py: same columns, read-only
+class ArchivedAppointment(db.Model):
+    __tablename__ = 'appointment_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # keeps its appointment id
+    patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False, index=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctor.id'), nullable=False, index=True)
+    appointment_date = db.Column(db.Date, nullable=False, index=True)
+    appointment_time = db.Column(db.Time, nullable=False)
+    diagnosis = db.Column(db.Text)
+    notes = db.Column(db.Text)
+    status = db.Column(db.String(20), default='scheduled')
+    created_at = db.Column(db.DateTime)
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+    archived_at = db.Column(db.DateTime, nullable=False)
+    doctor_ref = db.relationship('Doctor')
+
+class ArchivedMedicalRecord(db.Model):
+    __tablename__ = 'medical_record_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # keeps its record id
+    patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False, index=True)
+    diagnosis = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    file_path = db.Column(db.String(255))
+    file_name = db.Column(db.String(255))
+    record_date = db.Column(db.Date, nullable=False, index=True)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,222 @@
+"""Transactional outbox: a change feed of patients, appointments and records.
+
+Downstream systems (billing, pharmacy, the data warehouse) follow changes
+without polling the tables. Importing this module hooks the ORM session:
+every flush that inserts, updates or deletes a patient, appointment or
+medical record also inserts one ``change_event`` row per change, in the same
+transaction, so a change is in the feed if and only if it was committed.
+Bulk ``Query.delete()`` calls are recorded too. Like the rollups
+(rollups.py), writes that bypass the ORM are not seen.
+
+Events carry the row as it is after the change (``data``, null for
+deletes). Their ids are the feed's cursor: ``AUTOINCREMENT`` keeps them
+increasing and never reused, and ``changes(since, limit)`` reads
+``id > since`` straight off the primary key. Readers may name themselves
+(``consumer``); their position is kept in ``change_consumer`` and ``stats()``
+reports how far each one lags behind, in events and in seconds.
+
+``compact()`` (``flask --app app changes-compact``, run it from cron) keeps
+the table small:
+
+- events older than ``--compact-after`` (an hour) that a later event for the
+  same row supersedes are deleted, so a reader catching up still ends with
+  the latest state of every row (readers should apply inserts and updates
+  alike, as upserts: the insert may have been compacted away);
+- every event older than ``--retention`` (a week) is deleted. The highest id
+  removed this way is kept as the horizon: a reader whose cursor is behind
+  it has missed deletes and must start over from a bulk export
+  (bulk_export.py), which ``changes()`` signals with ``CursorExpired``.
+
+Starting over (a new reader, or one past the horizon): take ``latest()``
+first, then the bulk export, then follow the feed from that cursor. Events
+between the two are replayed onto the export, which upserts make harmless.
+``/admin/export/<dataset>`` returns it as ``X-Change-Cursor``, and the 410
+for an expired cursor carries it too.
+"""
+import json
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text, and_, delete, event, func, insert, inspect, \
+    select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, aliased
+
+from extensions import db
+from models import Appointment, ArchivedAppointment, ArchivedMedicalRecord, MedicalRecord, Patient
+
+change_event = db.Table(
+    'change_event',
+    Column('id', Integer, primary_key=True),
+    Column('entity', String(20), nullable=False),
+    Column('entity_id', Integer, nullable=False),
+    Column('op', String(10), nullable=False),  # insert, update, delete
+    Column('changed_at', DateTime, nullable=False),
+    Column('data', Text),
+    Index('ix_change_event_entity', 'entity', 'entity_id', 'id'),
+    Index('ix_change_event_changed_at', 'changed_at'),
+    sqlite_autoincrement=True,  # ids are cursors: never hand out a compacted id again
+)
+
+change_consumer = db.Table(
+    'change_consumer',
+    Column('name', String(50), primary_key=True),
+    Column('cursor', Integer, nullable=False),
+    Column('seen_at', DateTime, nullable=False),
+)
+
+# Single row: the highest id removed by retention
+change_horizon = db.Table(
+    'change_horizon',
+    Column('id', Integer, primary_key=True),
+    Column('purged_through', Integer, nullable=False),
+)
+
+# Defaults for compact()
+COMPACT_AFTER = timedelta(hours=1)
+RETENTION = timedelta(days=7)
+
+# Archived rows (archive.py) leave the feed as the appointments and records they were
+ENTITIES = {Patient: 'patient', Appointment: 'appointment', MedicalRecord: 'record',
+            ArchivedAppointment: 'appointment', ArchivedMedicalRecord: 'record'}
+
+
+class CursorExpired(Exception):
+    """The cursor is behind the retention horizon: the events after it are gone."""
+
+
+def _value(value, column_type):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    if isinstance(column_type, Integer) and value is not None:
+        return int(value)  # views assign ids straight from the form
+    return value
+
+
+def _data(obj):
+    return json.dumps({attribute.key: _value(getattr(obj, attribute.key), attribute.columns[0].type)
+                       for attribute in inspect(obj).mapper.column_attrs})
+
+
+def _event(entity, entity_id, op, changed_at, data=None):
+    return {'entity': entity, 'entity_id': entity_id, 'op': op, 'changed_at': changed_at, 'data': data}
+
+
+# Capture
+
+@event.listens_for(Session, 'after_flush')
+def _capture(session, flush_context):
+    # The new/dirty/deleted collections still hold what this flush wrote
+    now = datetime.utcnow()
+    events = []
+    for obj in session.new:
+        if type(obj) in ENTITIES:
+            events.append(_event(ENTITIES[type(obj)], obj.id, 'insert', now, _data(obj)))
+    for obj in session.dirty:
+        if type(obj) in ENTITIES and session.is_modified(obj):
+            events.append(_event(ENTITIES[type(obj)], obj.id, 'update', now, _data(obj)))
+    for obj in session.deleted:
+        if type(obj) in ENTITIES:
+            events.append(_event(ENTITIES[type(obj)], inspect(obj).identity[0], 'delete', now))
+    if events:
+        session.connection().execute(insert(change_event), events)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _capture_bulk_delete(orm_execute_state):
+    # Query.delete() skips the flush: record the ids it is about to remove
+    if not orm_execute_state.is_delete or orm_execute_state.bind_mapper is None:
+        return
+    entity = orm_execute_state.bind_mapper.class_
+    if entity not in ENTITIES:
+        return
+    session = orm_execute_state.session
+    query = select(entity.id)
+    if orm_execute_state.statement.whereclause is not None:
+        query = query.where(orm_execute_state.statement.whereclause)
+    ids = session.scalars(query).all()
+    if ids:
+        now = datetime.utcnow()
+        session.connection().execute(insert(change_event),
+                                     [_event(ENTITIES[entity], entity_id, 'delete', now) for entity_id in ids])
+
+
+# Reading
+
+def _horizon(connection):
+    return connection.scalar(select(change_horizon.c.purged_through)) or 0
+
+
+def latest(connection):
+    """The newest event's cursor (the horizon when none are kept): where a reader starting now resumes."""
+    return connection.scalar(select(func.max(change_event.c.id))) or _horizon(connection)
+
+
+def changes(connection, since, limit, consumer=None):
+    """Up to ``limit`` events after cursor ``since``; ``consumer`` records the position."""
+    if since < _horizon(connection):
+        raise CursorExpired(since)
+    if consumer:
+        # Asking for what follows `since` acknowledges everything up to it
+        upsert = sqlite_insert(change_consumer).values(name=consumer, cursor=since, seen_at=datetime.utcnow())
+        connection.execute(upsert.on_conflict_do_update(
+            index_elements=['name'],
+            set_={'cursor': func.max(change_consumer.c.cursor, upsert.excluded.cursor),
+                  'seen_at': upsert.excluded.seen_at}))
+    rows = connection.execute(
+        select(change_event).where(change_event.c.id > since).order_by(change_event.c.id).limit(limit + 1)).all()
+    return [{
+        'cursor': row.id,
+        'entity': row.entity,
+        'id': row.entity_id,
+        'op': row.op,
+        'changed_at': row.changed_at.isoformat(),
+        'data': json.loads(row.data) if row.data is not None else None,
+    } for row in rows[:limit]], len(rows) > limit
+
+
+def stats(connection):
+    """Feed size and position, and each consumer's lag in events and seconds."""
+    latest, oldest, events = connection.execute(
+        select(func.max(change_event.c.id), func.min(change_event.c.id), func.count())).one()
+    now = datetime.utcnow()
+    consumers = []
+    for consumer in connection.execute(select(change_consumer).order_by(change_consumer.c.name)):
+        behind = connection.execute(
+            select(func.count(), func.min(change_event.c.changed_at)).where(change_event.c.id > consumer.cursor)).one()
+        consumers.append({
+            'name': consumer.name,
+            'cursor': consumer.cursor,
+            'lag_events': behind[0],
+            # Age of the oldest event it has not acknowledged
+            'lag_seconds': round((now - behind[1]).total_seconds(), 1) if behind[1] else 0,
+            'expired': consumer.cursor < _horizon(connection),
+            'seen_at': consumer.seen_at.isoformat(),
+        })
+    return {'latest': latest or _horizon(connection), 'oldest': oldest, 'events': events,
+            'horizon': _horizon(connection), 'consumers': consumers}
+
+
+# Compaction
+
+def compact(connection, compact_after=COMPACT_AFTER, retention=RETENTION):
+    """Drops superseded and expired events; returns (superseded, expired) counts."""
+    now = datetime.utcnow()
+    compact_before = now - compact_after
+    expire_before = now - retention
+
+    later = aliased(change_event)
+    superseded = connection.execute(delete(change_event).where(
+        change_event.c.changed_at < compact_before,
+        select(later.c.id).where(and_(later.c.entity == change_event.c.entity,
+                                      later.c.entity_id == change_event.c.entity_id,
+                                      later.c.id > change_event.c.id)).exists(),
+    )).rowcount
+
+    purged_through = connection.scalar(select(func.max(change_event.c.id)).where(
+        change_event.c.changed_at < expire_before))
+    expired = 0
+    if purged_through is not None:
+        expired = connection.execute(delete(change_event).where(change_event.c.id <= purged_through)).rowcount
+        if connection.execute(update(change_horizon).values(purged_through=purged_through)).rowcount == 0:
+            connection.execute(insert(change_horizon).values(id=1, purged_through=purged_through))
+    return superseded, expired
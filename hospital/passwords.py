@@ -0,0 +1,152 @@
+"""Password hashing with a configurable cost and a bounded worker pool.
+
+Password hashes are deliberately slow (tens of milliseconds of CPU each).
+When a shift changes and hundreds of people sign in at once, hashing inline
+in every request thread oversubscribes the CPU: all logins slow down
+together and none finishes in time. ``PasswordHasher`` runs every hash and
+verification on a pool of ``PASSWORD_HASH_WORKERS`` threads (the hash
+functions release the GIL), so at most that many run at a time and the
+rest wait in line. If more than ``PASSWORD_HASH_QUEUE_LIMIT`` are already
+waiting, or a new one could expect to wait more than
+``PASSWORD_HASH_MAX_WAIT`` seconds (judged from the recent hash times),
+``PasswordHasherBusy`` is raised at once. The login page turns that into a
+503 with Retry-After rather than letting the queue grow without bound. The
+wait limit keeps the logins that are let in within a latency budget
+whatever the cost and the CPU count: a fixed queue limit that fits 16
+cores lets a 1-core host queue for seconds.
+
+``PASSWORD_HASH_METHOD`` takes Werkzeug's method strings, e.g. ``scrypt``,
+``scrypt:16384:8:1`` or ``pbkdf2:sha256:600000``. Changing it takes effect
+gradually: ``needs_rehash`` reports hashes made with other parameters, and
+login re-hashes the password it has just verified.
+
+``stats()`` reports queue depth, wait and hash times for monitoring.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+# Parameters Werkzeug fills in when a method string leaves them out
+METHOD_DEFAULTS = {
+    'scrypt': [str(2 ** 15), '8', '1'],
+    'pbkdf2': ['sha256', str(DEFAULT_PBKDF2_ITERATIONS)],
+}
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hashes are already waiting for a worker."""
+
+
+def canonical_method(method):
+    """Spells out the defaults, so 'scrypt' and 'scrypt:32768:8:1' compare equal."""
+    name, *params = method.split(':')
+    defaults = METHOD_DEFAULTS.get(name, [])
+    return ':'.join([name] + params + defaults[len(params):])
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords on a bounded pool of worker threads."""
+
+    def __init__(self, app=None):
+        self.method = 'scrypt'
+        self.canonical = canonical_method(self.method)
+        self.workers = 1
+        self.queue_limit = 0
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pid = None
+        self.queued = 0
+        self.running = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.hash_seconds = 0.0
+        self.max_wait = 0.0
+        self.recent_hash_seconds = None  # moving average, for the expected wait
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt')
+        app.config.setdefault('PASSWORD_HASH_WORKERS', os.cpu_count() or 1)
+        app.config.setdefault('PASSWORD_HASH_QUEUE_LIMIT', 64)
+        app.config.setdefault('PASSWORD_HASH_MAX_WAIT', 0.1)  # seconds; 0 waits as long as the queue allows
+        app.extensions['passwords'] = self
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.canonical = canonical_method(self.method)
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.queue_limit = app.config['PASSWORD_HASH_QUEUE_LIMIT']
+        self.max_wait = app.config['PASSWORD_HASH_MAX_WAIT']
+        self.recent_hash_seconds = None  # another method, another cost
+        self._pid = None  # (re)build the pool with this worker count on first use
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True when password_hash was made with a different method or cost."""
+        return canonical_method(password_hash.split('$', 1)[0]) != self.canonical
+
+    def stats(self):
+        completed = self.completed or 1
+        return {'workers': self.workers, 'queued': self.queued, 'running': self.running,
+                'max_queued': self.max_queued, 'queue_limit': self.queue_limit,
+                'completed': self.completed, 'rejected': self.rejected,
+                'avg_wait_ms': round(self.wait_seconds / completed * 1000, 2),
+                'avg_hash_ms': round(self.hash_seconds / completed * 1000, 2),
+                'max_wait_ms': round(self.max_wait * 1000, 2),
+                'expected_wait_ms': round(self._expected_wait() * 1000, 2)}
+
+    def _run(self, function, *args):
+        with self._lock:
+            if self.queued >= self.queue_limit:
+                self.rejected += 1
+                raise PasswordHasherBusy(f"{self.queued} password hashes already waiting")
+            expected_wait = self._expected_wait()
+            if self.max_wait and expected_wait > self.max_wait:
+                self.rejected += 1
+                raise PasswordHasherBusy(f"A password hash would wait about {expected_wait * 1000:.0f} ms")
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+        submitted = time.perf_counter()
+        return self._pool().submit(self._timed, function, args, submitted).result()
+
+    def _timed(self, function, args, submitted):
+        started = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.wait_seconds += started - submitted
+        try:
+            return function(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.hash_seconds += elapsed
+                recent = self.recent_hash_seconds
+                self.recent_hash_seconds = elapsed if recent is None else 0.8 * recent + 0.2 * elapsed
+
+    def _expected_wait(self):
+        # Seconds a hash submitted now would wait for a worker
+        ahead = self.queued + self.running - self.workers + 1
+        if ahead <= 0 or self.recent_hash_seconds is None:
+            return 0.0
+        return ahead / self.workers * self.recent_hash_seconds
+
+    def _pool(self):
+        # Threads don't survive fork, so a pre-forked worker starts its own pool
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hash')
+                    self._pid = os.getpid()
+        return self._executor
@@ -0,0 +1,120 @@
+"""The signed-in user ("principal") and the view decorators that check it.
+
+The session cookie only says who logged in. Whether that user may still
+act (active, role, not logged out by a password reset) lives in the user
+table, and checking it on every request would cost a query per request.
+``PrincipalCache`` keeps ``id -> (is_active, role, session_epoch)`` per
+process for ``PRINCIPAL_CACHE_TTL`` seconds:
+
+- views that change a user call ``principal_cache.invalidate(user.id)``, so
+  the change applies at once in the worker that made it and within the
+  TTL everywhere else;
+- a password reset bumps ``User.session_epoch``; sessions store the epoch
+  they were issued with and stop matching, so every session logged in with
+  the old password is signed out.
+
+Views use ``@login_required`` or ``@admin_required`` instead of looking at
+the session themselves.
+"""
+import threading
+import time
+from collections import namedtuple
+from functools import wraps
+
+from flask import flash, g, jsonify, redirect, request, session, url_for
+from sqlalchemy import select
+
+Principal = namedtuple('Principal', 'id is_active role session_epoch')
+
+
+class PrincipalCache:
+    """Per-process cache of the user columns access checks depend on."""
+
+    def __init__(self, app=None):
+        self.ttl = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PRINCIPAL_CACHE_TTL', 30)
+        app.extensions['principal_cache'] = self
+        self.ttl = app.config['PRINCIPAL_CACHE_TTL']
+
+    def get(self, user_id):
+        """The principal for user_id, or None if the user doesn't exist."""
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        principal = self._load(user_id)
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, principal)
+        return principal
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'ttl': self.ttl}
+
+    def _load(self, user_id):
+        from extensions import db
+        from models import User
+
+        row = db.session.execute(
+            select(User.id, User.is_active, User.role, User.session_epoch).where(User.id == user_id)
+        ).first()
+        return Principal(*row) if row is not None else None
+
+
+def current_principal():
+    """The signed-in, still-valid principal, or None (and the session is cleared)."""
+    if 'principal' in g:
+        return g.principal
+    principal = None
+    if 'user_id' in session:
+        from extensions import principal_cache
+
+        principal = principal_cache.get(session['user_id'])
+        if (principal is None or not principal.is_active
+                or principal.session_epoch != session.get('session_epoch', 0)):
+            session.clear()
+            principal = None
+        elif session.get('role') != principal.role:
+            session['role'] = principal.role
+    g.principal = principal
+    return principal
+
+
+def login_required(view):
+    """Redirects to the login page (401 JSON under /api/) unless signed in."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if current_principal() is None:
+            if request.path.startswith('/api/'):
+                return jsonify({'error': 'Unauthorized'}), 401
+            return redirect(url_for('auth.login'))
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def admin_required(view):
+    """Like login_required, but also requires the admin role."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        principal = current_principal()
+        if principal is None or principal.role != 'admin':
+            flash('Access denied. Admin privileges required.', 'error')
+            return redirect(url_for('main.dashboard'))
+        return view(*args, **kwargs)
+    return wrapped
@@ -0,0 +1,53 @@
+"""Read-only projections for large listings.
+
+List pages display a handful of columns per row, but loading ORM entities
+hydrates every column, registers each object in the session's identity map
+and lazy-loads related rows one at a time. A projection is a Core SELECT of
+just the displayed columns, with the related display fields joined in, whose
+rows are wrapped in compact immutable tuples (``__slots__ = ()``).
+
+    rows = fetch(db.session.connection(), statement, AppointmentRow, params)
+
+Rows are plain values: there is nothing to lazy-load and nothing to save, so
+use the ORM models for anything that writes.
+"""
+from collections import namedtuple
+from datetime import date
+
+
+def age_on(date_of_birth, today=None):
+    """Age in whole years, the same rule as Patient.age."""
+    if date_of_birth is None:
+        return None
+    today = today or date.today()
+    return today.year - date_of_birth.year - ((today.month, today.day) < (date_of_birth.month, date_of_birth.day))
+
+
+class AppointmentRow(namedtuple('AppointmentRow', [
+    'id', 'version', 'appointment_date', 'appointment_time', 'status',
+    'patient_id', 'patient_first_name', 'patient_last_name', 'patient_date_of_birth', 'patient_gender',
+    'patient_version', 'doctor_id', 'doctor_first_name', 'doctor_last_name', 'doctor_version',
+    'specialization_name',
+])):
+    """One card of the appointments listing."""
+    __slots__ = ()
+
+    @property
+    def patient_age(self):
+        return age_on(self.patient_date_of_birth)
+
+
+class PersonOption(namedtuple('PersonOption', ['id', 'first_name', 'last_name'])):
+    """A patient or doctor in a filter dropdown."""
+    __slots__ = ()
+
+
+def projection_columns(row_type, columns):
+    """Labels ``columns`` (field name -> column) in the order of ``row_type``'s fields."""
+    return [columns[field].label(field) for field in row_type._fields]
+
+
+def fetch(connection, statement, row_type, params=None):
+    """Executes a Core statement and wraps each row in ``row_type``."""
+    make = row_type._make
+    return [make(row) for row in connection.execute(statement, params or {})]
@@ -0,0 +1,331 @@
+"""Deleting patients: a tombstone now, the purge in the background.
+
+Deleting a patient used to delete every appointment and record they own in
+the request, in one transaction: a patient with years of history held the
+database's write lock, and the request, for as long as that took, and the
+files they had uploaded stayed on disk. ``delete_patient`` now only calls
+``PatientPurger.mark()``, which sets ``Patient.deleted_at`` and queues a
+purge, and returns. A worker thread (started lazily, once per process, like
+the audit writer) then removes, ``PURGE_BATCH_SIZE`` rows per transaction
+with ``PURGE_BATCH_PAUSE`` between transactions so requests can write:
+
+- the patient's medical records, hot and archived, and their uploaded files;
+- their appointments, hot and archived;
+- last, the patient row.
+
+The batches are ORM bulk deletes, so the report rollups (rollups.py) and the
+change feed (outbox.py) follow them. A file is removed in the transaction
+that deletes its record, before the commit: a failed batch is retried and
+finds the file already gone, but no committed delete leaves a file behind.
+
+A deleted patient disappears at once. Importing this module adds
+``deleted_at IS NULL`` to every ORM query for patients (relationship loads
+excepted; pass the execution option ``include_deleted=True`` to see them),
+and the Core statements in queries.py filter on it themselves. There is no
+separate search index: patient search reads the patient table, so it stops
+finding them too. ORM queries for appointments and records don't go through
+the patient, so the criteria miss those: views that show or count them join
+the patient or filter on ``PatientPurger.live()``. Their appointments
+still block their doctors' slots until the purge reaches them, seconds later.
+
+Progress is kept in ``patient_purge``, one row per deleted patient: rows
+and files removed so far against the totals, when it started and finished,
+and the last error. ``GET /api/patients/purges`` and
+``flask --app app purge`` show it. A purge interrupted by a restart or an
+error (SQLite's lock timeout, while a long read holds the database) is not
+lost: every process's worker looks for unfinished purges every
+``PURGE_POLL_INTERVAL`` seconds, and ``flask --app app purge`` finishes
+them in the foreground.
+
+Only one of them works on a patient at a time: it claims the purge with a
+conditional UPDATE (``claimed_by``, ``claimed_until``) and skips it when the
+UPDATE matches no row, because another process's lease has not run out.
+Every batch renews the lease as its first statement, which also takes the
+write lock, so the rows it then deletes, and the files it counts, are only
+ever its own. A purge whose lease lapsed (``PURGE_LEASE`` seconds without a
+batch) is abandoned to whoever claimed it since; one that failed is retried
+once its lease runs out.
+"""
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from flask import g
+from sqlalchemy import Column, DateTime, Integer, String, delete, event, func, insert, null, or_, select, update
+from sqlalchemy.orm import Session, with_loader_criteria
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _hide_deleted(orm_execute_state):
+    if (orm_execute_state.is_select and not orm_execute_state.is_column_load
+            and not orm_execute_state.is_relationship_load
+            and not orm_execute_state.execution_options.get('include_deleted', False)):
+        from models import Patient
+        orm_execute_state.statement = orm_execute_state.statement.options(
+            with_loader_criteria(Patient, Patient.deleted_at.is_(None), include_aliases=True))
+
+
+def owned():
+    """What a patient owns, in purge order: (model, progress column)."""
+    from models import Appointment, ArchivedAppointment, ArchivedMedicalRecord, MedicalRecord
+    return [(MedicalRecord, 'records'), (ArchivedMedicalRecord, 'records'),
+            (Appointment, 'appointments'), (ArchivedAppointment, 'appointments')]
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class PatientPurger:
+    """Tombstones deleted patients and purges them from a background thread."""
+
+    def __init__(self, db, app=None):
+        self.db = db
+        self.table = db.Table(
+            'patient_purge',
+            Column('patient_id', Integer, primary_key=True),
+            Column('requested_at', DateTime, nullable=False),
+            Column('started_at', DateTime),
+            Column('finished_at', DateTime, index=True),
+            Column('records_total', Integer, nullable=False),  # hot and archived
+            Column('appointments_total', Integer, nullable=False),
+            Column('records', Integer, nullable=False, default=0),  # removed so far
+            Column('appointments', Integer, nullable=False, default=0),
+            Column('files', Integer, nullable=False, default=0),
+            Column('error', String(255)),
+            Column('claimed_by', String(32)),  # the purging process's lease (see purge())
+            Column('claimed_until', DateTime),
+        )
+        self.app = None
+        self.batch_size = 0
+        self.batch_pause = 0
+        self.poll_interval = 0
+        self.lease = timedelta(0)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._requested = False
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PURGE_BATCH_SIZE', 500)
+        app.config.setdefault('PURGE_BATCH_PAUSE', 0.05)  # seconds between batches
+        app.config.setdefault('PURGE_POLL_INTERVAL', 10)  # seconds between looks for unfinished purges
+        app.config.setdefault('PURGE_LEASE', 60)  # seconds a claimed purge may go without a batch
+        app.extensions['purger'] = self
+        self.app = app
+        self.batch_size = app.config['PURGE_BATCH_SIZE']
+        self.batch_pause = app.config['PURGE_BATCH_PAUSE']
+        self.poll_interval = app.config['PURGE_POLL_INTERVAL']
+        self.lease = timedelta(seconds=app.config['PURGE_LEASE'])
+        # Each serving process resumes unfinished purges without waiting for a new delete
+        app.before_request(self._ensure_worker)
+
+    def mark(self, patient):
+        """Tombstones ``patient`` and queues its purge in the caller's transaction; returns the rows it owns.
+
+        Call ``wake()`` after the commit.
+        """
+        session = self.db.session
+        counts = {model.__tablename__: session.scalar(select(func.count()).where(model.patient_id == patient.id))
+                  for model, _ in owned()}
+        now = datetime.utcnow()
+        patient.deleted_at = now
+        # SQLite hands a purged patient's id out again when it was the newest: drop the old purge's row
+        session.execute(delete(self.table).where(self.table.c.patient_id == patient.id))
+        session.execute(insert(self.table).values(
+            patient_id=patient.id, requested_at=now,
+            records_total=counts['medical_record'] + counts['medical_record_archive'],
+            appointments_total=counts['appointment'] + counts['appointment_archive']))
+        return counts
+
+    def pending(self):
+        """Ids of the deleted patients whose purge has not finished."""
+        purge = self.table.c
+        return select(purge.patient_id).where(purge.finished_at.is_(None))
+
+    def live(self, model):
+        """Criteria leaving out the rows of ``model`` (appointments, records) that deleted patients own.
+
+        The unfinished purges are looked up once per request. There are usually none, and then
+        there are no criteria at all (a WHERE clause alone makes SQLite count row by row), where
+        joining the patient would cost a lookup per row.
+        """
+        if 'purging_patients' not in g:
+            g.purging_patients = self.db.session.scalars(self.pending()).all()
+        return [model.patient_id.not_in(g.purging_patients)] if g.purging_patients else []
+
+    def wake(self):
+        """Starts this process's worker if needed and has it purge now."""
+        self._ensure_worker()
+        with self._lock:
+            self._requested = True
+            self._wakeup.notify()
+
+    def run(self, progress=None):
+        """Purges every deleted patient; returns how many were finished."""
+        purge = self.table.c
+        with self.app.app_context():
+            with self.db.engine.connect() as connection:
+                patient_ids = connection.scalars(select(purge.patient_id).where(purge.finished_at.is_(None))
+                                                 .order_by(purge.requested_at)).all()
+            finished = 0
+            for patient_id in patient_ids:
+                try:
+                    finished += self.purge(patient_id, progress)
+                except Exception as error:
+                    self.db.session.rollback()
+                    self.app.logger.exception('Could not purge patient #%d; will retry', patient_id)
+                    self._update(patient_id, error=str(error)[:255])
+            return finished
+
+    def purge(self, patient_id, progress=None):
+        """Deletes what patient ``patient_id`` owns in batches, then the patient.
+
+        Returns False, having done nothing more, when another process holds the purge.
+        """
+        from models import Patient
+        session = self.db.session
+        purge = self.table.c
+        claim = self._claim(patient_id)
+        if claim is None:
+            return False
+        for model, column in owned():
+            while True:
+                batch = self._purge_batch(model, column, patient_id, claim)
+                if batch is None:
+                    return False
+                if not batch:
+                    break
+                if progress is not None:
+                    progress(self.status(patient_id))
+                time.sleep(self.batch_pause)  # let requests write between batches
+        if not self._renew(patient_id, claim):
+            return False
+        patient = session.get(Patient, patient_id, execution_options={'include_deleted': True})
+        if patient is not None:
+            session.delete(patient)
+        session.execute(update(self.table).where(purge.patient_id == patient_id)
+                        .values(finished_at=datetime.utcnow(), error=None, claimed_by=None, claimed_until=None))
+        session.commit()
+        if progress is not None:
+            progress(self.status(patient_id))
+        return True
+
+    def _claim(self, patient_id):
+        """Takes the purge of ``patient_id`` unless another lease on it is current; returns the claim or None."""
+        session = self.db.session
+        purge = self.table.c
+        claim, now = uuid.uuid4().hex, datetime.utcnow()
+        claimed = session.execute(
+            update(self.table)
+            .where(purge.patient_id == patient_id, purge.finished_at.is_(None),
+                   or_(purge.claimed_until.is_(None), purge.claimed_until < now))
+            .values(claimed_by=claim, claimed_until=now + self.lease, started_at=func.coalesce(purge.started_at, now))
+        ).rowcount
+        session.commit()
+        return claim if claimed else None
+
+    def _renew(self, patient_id, claim):
+        """Extends the lease in the current transaction, taking the write lock; False (rolled back) if it was lost."""
+        session = self.db.session
+        purge = self.table.c
+        renewed = session.execute(update(self.table).where(purge.patient_id == patient_id, purge.claimed_by == claim)
+                                  .values(claimed_until=datetime.utcnow() + self.lease)).rowcount
+        if not renewed:
+            session.rollback()
+            self.app.logger.warning('Lost the purge of patient #%d to another process', patient_id)
+        return bool(renewed)
+
+    def _purge_batch(self, model, column, patient_id, claim):
+        """Purges one batch; returns False when there is none left, None when the lease was lost."""
+        if not self._renew(patient_id, claim):
+            return None
+        session = self.db.session
+        with_files = hasattr(model, 'file_path')
+        rows = session.execute(
+            select(model.id, model.file_path if with_files else null()).where(model.patient_id == patient_id)
+            .order_by(model.id).limit(self.batch_size)).all()
+        if not rows:
+            session.commit()
+            return False
+        deleted = session.query(model).filter(model.id.in_([row[0] for row in rows])) \
+                                      .delete(synchronize_session=False)
+        if deleted != len(rows):
+            # Cannot happen while we hold the write lock; start the batch over rather than miscount
+            session.rollback()
+            return True
+        # A retried batch finds some files already gone: they count as removed all the same
+        files = [path for _, path in rows if with_files and path]
+        for path in files:
+            _remove(path)
+        purge = self.table.c
+        session.execute(update(self.table).where(purge.patient_id == patient_id)
+                        .values({column: purge[column] + deleted, 'files': purge.files + len(files)}))
+        session.commit()
+        return True
+
+    def _update(self, patient_id, **values):
+        try:
+            with self.db.engine.begin() as connection:
+                connection.execute(update(self.table).where(self.table.c.patient_id == patient_id).values(**values))
+        except Exception:
+            self.app.logger.exception('Could not record the purge state of patient #%d', patient_id)
+
+    def status(self, patient_id):
+        """Progress of one patient's purge, or None."""
+        with self.db.engine.connect() as connection:
+            row = connection.execute(select(self.table).where(self.table.c.patient_id == patient_id)).first()
+        return self._status(row) if row is not None else None
+
+    def stats(self, limit=20):
+        """Unfinished purges and the most recent ``limit`` ones."""
+        purge = self.table.c
+        with self.db.engine.connect() as connection:
+            pending = connection.execute(select(self.table).where(purge.finished_at.is_(None))
+                                         .order_by(purge.requested_at)).all()
+            recent = connection.execute(select(self.table).where(purge.finished_at.is_not(None))
+                                        .order_by(purge.finished_at.desc()).limit(limit)).all()
+        return {'pending': [self._status(row) for row in pending], 'recent': [self._status(row) for row in recent]}
+
+    @staticmethod
+    def _status(row):
+        def iso(value):
+            return value.isoformat() if value is not None else None
+        done, total = row.records + row.appointments, row.records_total + row.appointments_total
+        return {
+            'patient_id': row.patient_id,
+            'requested_at': iso(row.requested_at),
+            'started_at': iso(row.started_at),
+            'finished_at': iso(row.finished_at),
+            'records': row.records, 'records_total': row.records_total,
+            'appointments': row.appointments, 'appointments_total': row.appointments_total,
+            'files': row.files,
+            'percent': 100 if row.finished_at else round(100 * min(done, total) / total, 1) if total else 0,
+            'error': row.error,
+        }
+
+    def _ensure_worker(self):
+        # Threads don't survive fork, so a pre-forked worker starts its own
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    threading.Thread(target=self._work_loop, name='patient-purge', daemon=True).start()
+                    self._pid = os.getpid()
+
+    def _work_loop(self):
+        while True:
+            try:
+                self.run()
+            except Exception:
+                self.app.logger.exception('Patient purge failed; will retry')
+            with self._lock:
+                if not self._requested:
+                    self._wakeup.wait(self.poll_interval)
+                self._requested = False
@@ -0,0 +1,104 @@
+"""Prebuilt statements for the hot routes, registered on ``extensions.statements``.
+
+Each is built once per process on first use (see statements.py). Importing
+this module registers them; ``create_app()`` does so before serving.
+"""
+from sqlalchemy import select, bindparam, func
+
+from extensions import statements
+from models import Appointment, ArchivedAppointment, ArchivedMedicalRecord, Doctor, MedicalRecord, Patient, Specialization
+from projections import AppointmentRow, projection_columns
+
+@statements.register('appointment_rows')
+def appointment_rows_statement(filters):
+    # Core projection for the appointments listing (see projections.py), one
+    # variant per combination of optional filters, e.g. ('doctor_id', 'status')
+    appointment = Appointment.__table__
+    patient = Patient.__table__
+    doctor = Doctor.__table__
+    specialization = Specialization.__table__
+    query = select(*projection_columns(AppointmentRow, {
+        'id': appointment.c.id,
+        'version': appointment.c.version,
+        'appointment_date': appointment.c.appointment_date,
+        'appointment_time': appointment.c.appointment_time,
+        'status': appointment.c.status,
+        'patient_id': patient.c.id,
+        'patient_first_name': patient.c.first_name,
+        'patient_last_name': patient.c.last_name,
+        'patient_date_of_birth': patient.c.date_of_birth,
+        'patient_gender': patient.c.gender,
+        'patient_version': patient.c.version,
+        'doctor_id': doctor.c.id,
+        'doctor_first_name': doctor.c.first_name,
+        'doctor_last_name': doctor.c.last_name,
+        'doctor_version': doctor.c.version,
+        'specialization_name': specialization.c.name,
+    })).select_from(
+        appointment.join(patient, appointment.c.patient_id == patient.c.id)
+                   .join(doctor, appointment.c.doctor_id == doctor.c.id)
+                   .join(specialization, doctor.c.specialization_id == specialization.c.id)
+    ).where(patient.c.deleted_at.is_(None))  # purge.py hides deleted patients from ORM queries only
+    for column in filters:
+        query = query.where(appointment.c[column] == bindparam(column))
+    return query.order_by(appointment.c.appointment_date.desc(), appointment.c.appointment_time.desc())
+
+@statements.register('doctor_options')
+def doctor_options_statement():
+    doctor = Doctor.__table__
+    return select(doctor.c.id, doctor.c.first_name, doctor.c.last_name)
+
+@statements.register('patient_options')
+def patient_options_statement():
+    patient = Patient.__table__
+    return select(patient.c.id, patient.c.first_name, patient.c.last_name).where(patient.c.deleted_at.is_(None))
+
+@statements.register('appointment_counts')
+def appointment_counts_statement(column):
+    # Appointments per patient or doctor for one page of cards, variant 'patient_id' or 'doctor_id'
+    owner = Appointment.__table__.c[column]
+    return select(owner, func.count()).where(owner.in_(bindparam('ids', expanding=True))).group_by(owner)
+
+@statements.register('booked_times')
+def booked_times_statement():
+    return select(Appointment.appointment_time).where(
+        Appointment.doctor_id == bindparam('doctor_id'),
+        Appointment.appointment_date == bindparam('appointment_date'),
+        Appointment.status != 'cancelled'
+    )
+
+@statements.register('appointment_conflict')
+def appointment_conflict_statement():
+    return select(Appointment.id).where(
+        Appointment.doctor_id == bindparam('doctor_id'),
+        Appointment.appointment_date == bindparam('appointment_date'),
+        Appointment.appointment_time == bindparam('appointment_time')
+    ).limit(1)
+
+@statements.register('appointment_conflict_excluding')
+def appointment_conflict_excluding_statement():
+    return appointment_conflict_statement().where(Appointment.id != bindparam('appointment_id'))
+
+@statements.register('recent_patient_appointments')
+def recent_patient_appointments_statement():
+    return select(Appointment).where(Appointment.patient_id == bindparam('patient_id'))\
+                              .order_by(Appointment.appointment_date.desc())\
+                              .limit(5)
+
+@statements.register('recent_patient_records')
+def recent_patient_records_statement():
+    return select(MedicalRecord).where(MedicalRecord.patient_id == bindparam('patient_id'))\
+                                .order_by(MedicalRecord.record_date.desc())\
+                                .limit(5)
+
+@statements.register('recent_patient_archived_appointments')
+def recent_patient_archived_appointments_statement():
+    return select(ArchivedAppointment).where(ArchivedAppointment.patient_id == bindparam('patient_id'))\
+                                      .order_by(ArchivedAppointment.appointment_date.desc())\
+                                      .limit(5)
+
+@statements.register('recent_patient_archived_records')
+def recent_patient_archived_records_statement():
+    return select(ArchivedMedicalRecord).where(ArchivedMedicalRecord.patient_id == bindparam('patient_id'))\
+                                        .order_by(ArchivedMedicalRecord.record_date.desc())\
+                                        .limit(5)
@@ -0,0 +1,258 @@
+"""Admission control: per-user token buckets and concurrency caps per route class.
+
+A runaway script or a stuck browser tab can call an endpoint in a tight
+loop, and every call competes with real users for SQLite's single writer.
+``RateLimiter`` sorts endpoints into classes (``RATE_LIMIT_ROUTES``) and
+gives each class (``RATE_LIMITS``):
+
+- ``rate``/``burst``: a token bucket per user (per submitted username for
+  login). A request spends a token; tokens refill at ``rate`` per second up
+  to ``burst``. An empty bucket gets 429 with Retry-After set to when the
+  next token arrives.
+- ``concurrency``: at most that many requests of the class in flight on
+  the host, across all workers. Extra requests get 503 with Retry-After at
+  once rather than queueing until they time out. A slot is held until the
+  response body has been sent, so streamed downloads count too.
+- ``process_concurrency``: at most that many in flight in this worker
+  process. For long-lived responses whose cost is a worker thread rather
+  than shared capacity: a live event stream holds a gthread thread until it
+  times out, so a few open tabs would take every thread of a worker. Extra
+  requests get 503 with the class's ``retry_after`` (the live-update client
+  polls instead). ``RATE_LIMIT_STREAMS`` overrides the cap of the
+  ``stream`` class; serve.py's gevent profile raises it.
+- ``methods``: only these methods are limited (e.g. uploads are POSTs; the
+  GET that shows the form is free).
+
+Endpoints without a class are not limited. Buckets and slots live in a small
+SQLite file of their own (``RATE_LIMIT_STORE``, in the instance folder by
+default), so every worker on the host shares them without touching the main
+database. Each check is one UPSERT. The file holds only short-lived state,
+so it is written without fsync. If the store fails, requests are let through
+and the error is logged: the limiter must never take the app down.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from flask import jsonify, make_response, request, session
+from werkzeug.wsgi import ClosingIterator
+
+SLOT_KEY = 'rate_limit.slot'
+PROCESS_SLOT_KEY = 'rate_limit.process_slot'
+
+# Endpoint -> route class
+DEFAULT_ROUTES = {
+    'auth.login': 'login',
+    'appointments.doctor_availability': 'api',
+    'appointments.calendar_appointments': 'api',
+    'changes.change_feed': 'api',
+    'live.events': 'stream',
+    'live.poll_events': 'api',
+    'exports.export_patient_records': 'export',
+    'exports.bulk_export': 'bulk_export',
+    'patients.purge_status': 'api',
+    'records.add_medical_record': 'upload',
+    'records.edit_medical_record': 'upload',
+    'records.download_file': 'download',
+}
+
+# Route class -> limits; rates are per second per user
+DEFAULT_LIMITS = {
+    'login': {'rate': 0.2, 'burst': 10, 'methods': ('POST',)},
+    'api': {'rate': 5, 'burst': 30},
+    'export': {'rate': 0.2, 'burst': 5, 'concurrency': 2},
+    'bulk_export': {'rate': 0.05, 'burst': 5, 'concurrency': 1},
+    'upload': {'rate': 0.5, 'burst': 10, 'concurrency': 4, 'methods': ('POST',)},
+    'download': {'rate': 2, 'burst': 20, 'concurrency': 8},
+    # Two of the threaded profile's four threads per worker; the rest keep serving pages
+    'stream': {'process_concurrency': 2, 'retry_after': 30},
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS slot (id TEXT PRIMARY KEY, route_class TEXT NOT NULL, acquired REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS slot_class ON slot (route_class, acquired);
+"""
+
+# Spend one token if at least one has accumulated; changes no row otherwise
+TAKE_TOKEN = """
+INSERT INTO bucket (key, tokens, updated) VALUES (:key, :burst - 1, :now)
+ON CONFLICT (key) DO UPDATE SET tokens = min(:burst, tokens + (:now - updated) * :rate) - 1, updated = :now
+WHERE min(:burst, tokens + (:now - updated) * :rate) >= 1
+"""
+
+
+class RateLimiter:
+    """Token buckets and concurrency slots shared through a SQLite file."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.routes = {}
+        self.limits = {}
+        self.path = None
+        self.slot_timeout = 0
+        self.limited = 0
+        self.rejected_busy = 0
+        self._local = threading.local()
+        self._in_process = {}  # route class -> requests in flight in this process
+        self._process_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATE_LIMIT_ENABLED', True)
+        app.config.setdefault('RATE_LIMIT_ROUTES', dict(DEFAULT_ROUTES))
+        app.config.setdefault('RATE_LIMITS', {name: dict(limits) for name, limits in DEFAULT_LIMITS.items()})
+        app.config.setdefault('RATE_LIMIT_STORE', os.path.join(app.instance_path, 'rate_limits.db'))
+        app.config.setdefault('RATE_LIMIT_SLOT_TIMEOUT', 600)  # seconds before a crashed worker's slot is reclaimed
+        app.config.setdefault('RATE_LIMIT_STREAMS', None)  # live event streams per process, None: the stream class's
+        app.extensions['rate_limiter'] = self
+        self.app = app
+        self.enabled = app.config['RATE_LIMIT_ENABLED']
+        self.routes = app.config['RATE_LIMIT_ROUTES']
+        self.limits = app.config['RATE_LIMITS']
+        self.path = app.config['RATE_LIMIT_STORE']
+        self.slot_timeout = app.config['RATE_LIMIT_SLOT_TIMEOUT']
+        if app.config['RATE_LIMIT_STREAMS'] is not None and 'stream' in self.limits:
+            self.limits['stream']['process_concurrency'] = app.config['RATE_LIMIT_STREAMS']
+        if not self.enabled:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        app.before_request(self._admit)
+
+        # Release slots when the server closes the body, after streamed files have been sent
+        wsgi_app = app.wsgi_app
+
+        def admitted_app(environ, start_response):
+            app_iter = wsgi_app(environ, start_response)
+            return ClosingIterator(app_iter, lambda: self._release(environ))
+
+        app.wsgi_app = admitted_app
+
+    def take_token(self, route_class, who):
+        """Spends a token; returns 0 when allowed, else seconds until one is available."""
+        limits = self.limits[route_class]
+        key = f'{route_class}:{who}'
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            taken = connection.execute(TAKE_TOKEN, {'key': key, 'burst': limits['burst'],
+                                                    'rate': limits['rate'], 'now': now}).rowcount
+            if taken:
+                return 0
+            tokens, updated = connection.execute('SELECT tokens, updated FROM bucket WHERE key = ?',
+                                                 (key,)).fetchone()
+        available = min(limits['burst'], tokens + (now - updated) * limits['rate'])
+        return (1 - available) / limits['rate']
+
+    def acquire_slot(self, route_class):
+        """Takes a concurrency slot; returns its id, or None when the class is full."""
+        now = time.time()
+        slot_id = uuid.uuid4().hex
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute('DELETE FROM slot WHERE acquired < ?', (now - self.slot_timeout,))
+            in_flight = connection.execute('SELECT count(*) FROM slot WHERE route_class = ?',
+                                           (route_class,)).fetchone()[0]
+            if in_flight >= self.limits[route_class]['concurrency']:
+                return None
+            connection.execute('INSERT INTO slot (id, route_class, acquired) VALUES (?, ?, ?)',
+                               (slot_id, route_class, now))
+        return slot_id
+
+    def enter_process(self, route_class):
+        """Counts a request of route_class in this process; False when the class is full here."""
+        with self._process_lock:
+            in_flight = self._in_process.get(route_class, 0)
+            if in_flight >= self.limits[route_class]['process_concurrency']:
+                return False
+            self._in_process[route_class] = in_flight + 1
+            return True
+
+    def leave_process(self, route_class):
+        with self._process_lock:
+            self._in_process[route_class] -= 1
+
+    def release_slot(self, slot_id):
+        try:
+            with self._connection() as connection:
+                connection.execute('DELETE FROM slot WHERE id = ?', (slot_id,))
+        except sqlite3.Error:
+            self.app.logger.exception('Could not release rate limit slot %s', slot_id)
+
+    def stats(self):
+        return {'limited': self.limited, 'rejected_busy': self.rejected_busy, 'in_process': dict(self._in_process)}
+
+    # Request hooks
+
+    def _admit(self):
+        route_class = self.routes.get(request.endpoint)
+        if route_class is None:
+            return None
+        limits = self.limits[route_class]
+        if 'methods' in limits and request.method not in limits['methods']:
+            return None
+        if 'process_concurrency' in limits:
+            if not self.enter_process(route_class):
+                self.rejected_busy += 1
+                return self._refuse(503, 'Server busy', limits.get('retry_after', 2))
+            request.environ[PROCESS_SLOT_KEY] = route_class
+        try:
+            if 'rate' in limits:
+                wait = self.take_token(route_class, self._who(route_class))
+                if wait:
+                    self.limited += 1
+                    return self._refuse(429, 'Too many requests', wait)
+            if 'concurrency' in limits:
+                slot_id = self.acquire_slot(route_class)
+                if slot_id is None:
+                    self.rejected_busy += 1
+                    return self._refuse(503, 'Server busy', limits.get('retry_after', 2))
+                request.environ[SLOT_KEY] = slot_id
+        except sqlite3.Error:
+            # Fail open: a broken limiter store must not lock everyone out
+            self.app.logger.exception('Rate limit store unavailable')
+        return None
+
+    def _release(self, environ):
+        route_class = environ.pop(PROCESS_SLOT_KEY, None)
+        if route_class is not None:
+            self.leave_process(route_class)
+        slot_id = environ.pop(SLOT_KEY, None)
+        if slot_id is not None:
+            self.release_slot(slot_id)
+
+    def _who(self, route_class):
+        if route_class == 'login':
+            return 'name:' + request.form.get('username', '')
+        if 'user_id' in session:
+            return f"user:{session['user_id']}"
+        return 'addr:' + (request.remote_addr or '')
+
+    def _refuse(self, status, message, retry_after):
+        retry_after = max(1, math.ceil(retry_after))
+        if request.path.startswith('/api/'):
+            response = jsonify({'error': message, 'retry_after': retry_after})
+        else:
+            response = make_response(f'{message}. Please try again in {retry_after} seconds.')
+            response.mimetype = 'text/plain'
+        response.status_code = status
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+
+    def _connection(self):
+        # One connection per thread and process (sqlite3 connections can't cross either)
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = OFF')
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
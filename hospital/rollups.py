@@ -0,0 +1,258 @@
+"""Daily rollup tables for the reports, kept current on every write.
+
+Reports such as "appointments per doctor per week by status" would scan the
+whole ``appointment`` table. Instead they read small tables with one row per
+day and key, so their cost follows the length of the report range:
+
+- ``appointment_daily``: appointments per day, doctor and status, with the
+  doctor's specialization;
+- ``patient_daily``: patients registered per day (UTC, like created_at);
+- ``record_daily``: medical records per record date.
+
+Importing this module hooks the ORM session. Each flush that inserts,
+updates or deletes appointments, patients or records adds the matching
++1/-1 to the rollups in the same transaction, and so do bulk
+``Query.delete()`` calls on appointments and records. A change to a doctor's
+specialization moves that doctor's rows with it. Writes that bypass the ORM
+(Core statements, the synthetic data loaders) are not seen. After those, run
+``flask --app app rollups-rebuild`` (optionally with --start/--end), which
+also backfills an existing database. Archived appointments and records
+(archive.py) keep counting: the rebuild reads the archive tables as well.
+"""
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import Column, Date, Index, Integer, String, bindparam, delete, event, func, inspect, select, text, union_all
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Appointment, ArchivedAppointment, ArchivedMedicalRecord, Doctor, MedicalRecord, Patient
+
+appointment_daily = db.Table(
+    'appointment_daily',
+    Column('day', Date, primary_key=True),
+    Column('doctor_id', Integer, primary_key=True),
+    Column('status', String(20), primary_key=True),
+    Column('specialization_id', Integer),  # follows the doctor, so not part of the key
+    Column('appointments', Integer, nullable=False),
+    Index('ix_appointment_daily_specialization', 'specialization_id', 'day'),
+)
+
+patient_daily = db.Table(
+    'patient_daily',
+    Column('day', Date, primary_key=True),
+    Column('registrations', Integer, nullable=False),
+)
+
+record_daily = db.Table(
+    'record_daily',
+    Column('day', Date, primary_key=True),
+    Column('records', Integer, nullable=False),
+)
+
+ADD_APPOINTMENTS = text("""
+INSERT INTO appointment_daily (day, doctor_id, status, specialization_id, appointments)
+SELECT :day, :doctor_id, :status, specialization_id, :delta FROM doctor WHERE id = :doctor_id
+ON CONFLICT (day, doctor_id, status) DO UPDATE SET appointments = appointments + excluded.appointments
+""").bindparams(bindparam('day', type_=Date))
+
+ADD_REGISTRATIONS = text("""
+INSERT INTO patient_daily (day, registrations) VALUES (:day, :delta)
+ON CONFLICT (day) DO UPDATE SET registrations = registrations + excluded.registrations
+""").bindparams(bindparam('day', type_=Date))
+
+ADD_RECORDS = text("""
+INSERT INTO record_daily (day, records) VALUES (:day, :delta)
+ON CONFLICT (day) DO UPDATE SET records = records + excluded.records
+""").bindparams(bindparam('day', type_=Date))
+
+MOVE_DOCTOR = text('UPDATE appointment_daily SET specialization_id = :specialization_id WHERE doctor_id = :doctor_id')
+
+PENDING_KEY = 'rollup_deltas'
+
+
+# Incremental maintenance
+
+def _before(obj, attribute):
+    """The attribute's value as last loaded from the database."""
+    history = inspect(obj).attrs[attribute].history
+    return history.deleted[0] if history.deleted else getattr(obj, attribute)
+
+
+def _appointment_key(appointment_date, doctor_id, status):
+    return appointment_date, int(doctor_id), status or 'scheduled'
+
+
+def _no_deltas():
+    return {'appointment': Counter(), 'patient': Counter(), 'record': Counter(), 'doctor': {}}
+
+
+def _deltas(session):
+    return session.info.setdefault(PENDING_KEY, _no_deltas())
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_changes(session, flush_context, instances):
+    # Old values must be read before the flush; new rows get their defaults during it (see _apply)
+    deltas = _deltas(session)
+    for obj in session.deleted:
+        if isinstance(obj, Appointment):
+            deltas['appointment'][_appointment_key(_before(obj, 'appointment_date'), _before(obj, 'doctor_id'),
+                                                   _before(obj, 'status'))] -= 1
+        elif isinstance(obj, Patient) and _before(obj, 'created_at') is not None:
+            deltas['patient'][_before(obj, 'created_at').date()] -= 1
+        elif isinstance(obj, MedicalRecord):
+            deltas['record'][_before(obj, 'record_date')] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, Appointment) and session.is_modified(obj):
+            deltas['appointment'][_appointment_key(_before(obj, 'appointment_date'), _before(obj, 'doctor_id'),
+                                                   _before(obj, 'status'))] -= 1
+            deltas['appointment'][_appointment_key(obj.appointment_date, obj.doctor_id, obj.status)] += 1
+        elif isinstance(obj, MedicalRecord) and session.is_modified(obj):
+            deltas['record'][_before(obj, 'record_date')] -= 1
+            deltas['record'][obj.record_date] += 1
+        elif isinstance(obj, Doctor) and inspect(obj).attrs.specialization_id.history.has_changes():
+            deltas['doctor'][obj.id] = int(obj.specialization_id)
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply(session, flush_context):
+    deltas = _deltas(session)
+    for obj in session.new:
+        if isinstance(obj, Appointment):
+            deltas['appointment'][_appointment_key(obj.appointment_date, obj.doctor_id, obj.status)] += 1
+        elif isinstance(obj, Patient):
+            deltas['patient'][obj.created_at.date()] += 1
+        elif isinstance(obj, MedicalRecord):
+            deltas['record'][obj.record_date] += 1
+    session.info.pop(PENDING_KEY)
+    _write(session.connection(), deltas)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bulk_delete(orm_execute_state):
+    # Query.delete() skips the flush, so count what it is about to remove
+    if not orm_execute_state.is_delete or orm_execute_state.bind_mapper is None:
+        return
+    # Archived rows still count in the rollups (see archive.py), so deleting them counts too
+    entity = orm_execute_state.bind_mapper.class_
+    where = orm_execute_state.statement.whereclause
+    deltas = _no_deltas()
+    if entity in (Appointment, ArchivedAppointment):
+        key = (entity.appointment_date, entity.doctor_id, entity.status)
+        counts = orm_execute_state.session.execute(select(*key, func.count()).where(where).group_by(*key))
+        for appointment_date, doctor_id, status, count in counts:
+            deltas['appointment'][_appointment_key(appointment_date, doctor_id, status)] -= count
+    elif entity in (MedicalRecord, ArchivedMedicalRecord):
+        counts = orm_execute_state.session.execute(
+            select(entity.record_date, func.count()).where(where).group_by(entity.record_date))
+        for record_date, count in counts:
+            deltas['record'][record_date] -= count
+    else:
+        return
+    _write(orm_execute_state.session.connection(), deltas)
+
+
+def _write(connection, deltas):
+    appointments = [{'day': key[0], 'doctor_id': key[1], 'status': key[2], 'delta': delta}
+                    for key, delta in deltas['appointment'].items() if delta]
+    if appointments:
+        connection.execute(ADD_APPOINTMENTS, appointments)
+    registrations = [{'day': day, 'delta': delta} for day, delta in deltas['patient'].items() if delta]
+    if registrations:
+        connection.execute(ADD_REGISTRATIONS, registrations)
+    records = [{'day': day, 'delta': delta} for day, delta in deltas['record'].items() if delta]
+    if records:
+        connection.execute(ADD_RECORDS, records)
+    for doctor_id, specialization_id in deltas['doctor'].items():
+        connection.execute(MOVE_DOCTOR, {'doctor_id': doctor_id, 'specialization_id': specialization_id})
+
+
+# Backfill
+
+def _between(column, start, end):
+    return ([column >= start] if start is not None else []) + ([column <= end] if end is not None else [])
+
+
+def needs_backfill(connection):
+    """True when the rollups are empty but there is data to roll up."""
+    empty = all(connection.execute(select(rollup).limit(1)).first() is None
+                for rollup in (appointment_daily, patient_daily, record_daily))
+    return empty and any(connection.execute(select(model.id).limit(1)).first() is not None
+                         for model in (Appointment, Patient, MedicalRecord, ArchivedAppointment, ArchivedMedicalRecord))
+
+
+def rebuild(connection, start=None, end=None):
+    """Recomputes the rollups for days start..end (default: all) from the base and archive tables."""
+    doctor, patient = Doctor.__table__, Patient.__table__
+    appointment = union_all(*[
+        select(model.appointment_date, model.doctor_id, model.status).where(*_between(model.appointment_date, start, end))
+        for model in (Appointment, ArchivedAppointment)]).subquery('appointment')
+    record = union_all(*[
+        select(model.record_date).where(*_between(model.record_date, start, end))
+        for model in (MedicalRecord, ArchivedMedicalRecord)]).subquery('record')
+
+    for rollup in (appointment_daily, patient_daily, record_daily):
+        connection.execute(delete(rollup).where(*_between(rollup.c.day, start, end)))
+
+    # created_at is a timestamp: registrations on day D are those in [D 00:00, D+1 00:00)
+    registered = []
+    if start is not None:
+        registered.append(patient.c.created_at >= datetime.combine(start, time.min))
+    if end is not None:
+        registered.append(patient.c.created_at < datetime.combine(end + timedelta(days=1), time.min))
+
+    status = func.coalesce(appointment.c.status, 'scheduled')
+    connection.execute(appointment_daily.insert().from_select(
+        ['day', 'doctor_id', 'status', 'specialization_id', 'appointments'],
+        select(appointment.c.appointment_date, appointment.c.doctor_id, status, doctor.c.specialization_id,
+               func.count())
+        .select_from(appointment.join(doctor, appointment.c.doctor_id == doctor.c.id))
+        .group_by(appointment.c.appointment_date, appointment.c.doctor_id, status, doctor.c.specialization_id)))
+    registration_day = func.date(patient.c.created_at)
+    connection.execute(patient_daily.insert().from_select(
+        ['day', 'registrations'],
+        select(registration_day, func.count())
+        .where(patient.c.created_at.is_not(None), *registered).group_by(registration_day)))
+    connection.execute(record_daily.insert().from_select(
+        ['day', 'records'],
+        select(record.c.record_date, func.count()).group_by(record.c.record_date)))
+
+
+# Reports
+
+PERIODS = {
+    'day': lambda day: func.date(day),
+    'week': lambda day: func.date(day, '-6 days', 'weekday 1'),  # the Monday starting the week
+    'month': lambda day: func.strftime('%Y-%m-01', day),
+}
+
+APPOINTMENT_GROUPS = ('doctor', 'specialization', 'status')
+
+
+def appointment_report(connection, start, end, period='day', group_by=APPOINTMENT_GROUPS):
+    """Appointments per period (and doctor, specialization and/or status) between start and end."""
+    bucket = PERIODS[period](appointment_daily.c.day).label('period')
+    columns = {'doctor': appointment_daily.c.doctor_id, 'specialization': appointment_daily.c.specialization_id,
+               'status': appointment_daily.c.status}
+    keys = [columns[name].label(f'{name}_id' if name != 'status' else name) for name in group_by]
+    query = (select(bucket, *keys, func.sum(appointment_daily.c.appointments).label('appointments'))
+             .where(appointment_daily.c.day >= start, appointment_daily.c.day <= end)
+             .group_by(bucket, *keys).having(func.sum(appointment_daily.c.appointments) != 0)
+             .order_by(bucket, *keys))
+    return [dict(row._mapping) for row in connection.execute(query)]
+
+
+def daily_count_report(connection, rollup, start, end, period='day'):
+    """Registrations (patient_daily) or records (record_daily) per period between start and end."""
+    measure = rollup.c.registrations if rollup is patient_daily else rollup.c.records
+    bucket = PERIODS[period](rollup.c.day).label('period')
+    query = (select(bucket, func.sum(measure).label(measure.name))
+             .where(rollup.c.day >= start, rollup.c.day <= end)
+             .group_by(bucket).order_by(bucket))
+    return [dict(row._mapping) for row in connection.execute(query)]
@@ -0,0 +1,47 @@
+"""Additive schema upgrades for existing databases.
+
+``db.create_all()`` creates missing tables but never touches tables that
+already exist, so a column added to a model would be missing from every
+database created before it. ``add_missing_columns`` issues ``ALTER TABLE ...
+ADD COLUMN`` for those. New columns must therefore be nullable or carry a
+``server_default`` (SQLite cannot add a NOT NULL column without a default).
+``add_missing_indexes`` likewise creates the model indexes an existing table
+lacks. Anything beyond adding columns and indexes still needs a hand-written
+migration.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+
+
+def add_missing_columns(engine, metadata):
+    """Adds model columns the database predates; returns their 'table.column' names."""
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {ddl}'))
+                added.append(f'{table.name}.{column.name}')
+    return added
+
+
+def add_missing_indexes(engine, metadata):
+    """Creates model indexes the database predates; returns their names."""
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(connection)
+                    added.append(index.name)
+    return added
@@ -0,0 +1,124 @@
+"""Production launcher (gunicorn) with worker tuning profiles.
+
+    python serve.py --profile threaded --bind 0.0.0.0:8000
+    python serve.py --profile sync --chdir ../hospital_app --app app:app
+
+Profiles (worker counts follow the CPU count unless overridden):
+
+- sync: 2 * CPUs + 1 processes, one request each. Most isolation and the
+  most memory; a slow client ties up a whole worker.
+- threaded: CPUs + 1 processes with 4 threads each. SQLite, file I/O and
+  socket writes release the GIL, so threads overlap well for these apps.
+- gevent: CPUs + 1 cooperative workers with up to 200 connections each.
+  Best for many slow or idle clients (e.g. SSE, ward Wi-Fi); CPU-bound
+  rendering and SQLite calls still run one at a time per worker.
+
+Every open live-update stream (/api/events) holds a thread until it times
+out, so the threaded profile allows two per worker (``RATE_LIMIT_STREAMS``,
+see rate_limit.py) and further tabs poll instead. A greenlet costs next to
+nothing, so the gevent profile lets half of a worker's connections stream.
+
+The app is imported once in the master before forking (``preload_app``),
+so workers share its code and templates copy-on-write. Connections must not
+cross a fork, so every worker disposes the inherited SQLAlchemy pools
+before serving. Workers are recycled after ``max_requests`` to bound
+memory growth. Needs ``gunicorn`` (and ``gevent`` for that profile).
+"""
+import argparse
+import os
+import sys
+
+try:
+    from gunicorn.app.base import BaseApplication
+    from gunicorn.util import import_app
+except ImportError:  # gunicorn is only needed to serve, not to import the app
+    BaseApplication = None
+
+# Profile name -> gunicorn settings for a given CPU count
+PROFILES = {
+    'sync': lambda cpus: {'worker_class': 'sync', 'workers': 2 * cpus + 1},
+    'threaded': lambda cpus: {'worker_class': 'gthread', 'workers': cpus + 1, 'threads': 4},
+    'gevent': lambda cpus: {'worker_class': 'gevent', 'workers': cpus + 1, 'worker_connections': 200},
+}
+
+COMMON_SETTINGS = {
+    'preload_app': True,
+    'max_requests': 5000,
+    'max_requests_jitter': 500,  # spread recycling so workers don't restart together
+    'timeout': 60,
+    'graceful_timeout': 30,
+    'keepalive': 5,
+}
+
+
+def profile_settings(profile, cpus=None, workers=None, threads=None):
+    """Gunicorn settings for a profile, with optional worker/thread overrides."""
+    settings = dict(COMMON_SETTINGS)
+    settings.update(PROFILES[profile](cpus or os.cpu_count() or 1))
+    if workers:
+        settings['workers'] = workers
+    if threads:
+        settings['threads'] = threads
+    return settings
+
+
+def dispose_engines(app):
+    """Drops the connection pools a forked worker inherited from the master."""
+    extension = app.extensions.get('sqlalchemy')
+    if extension is None:
+        return
+    with app.app_context():
+        for engine in extension.engines.values():
+            # close=False: leave the master's connections alone, just forget them
+            engine.dispose(close=False)
+
+
+class Server(BaseApplication or object):
+    """Runs a WSGI app spec such as 'app:create_app()' under gunicorn."""
+
+    def __init__(self, app_spec, settings):
+        self.app_spec = app_spec
+        self.settings = settings
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.settings.items():
+            self.cfg.set(key, value)
+        self.cfg.set('post_fork', self.post_fork)
+
+    def load(self):
+        return import_app(self.app_spec)
+
+    def post_fork(self, server, worker):
+        dispose_engines(self.wsgi())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='threaded')
+    parser.add_argument('--bind', default='0.0.0.0:8000')
+    parser.add_argument('--workers', type=int, help='override the CPU-based worker count')
+    parser.add_argument('--threads', type=int, help='override the threads per worker (threaded profile)')
+    parser.add_argument('--app', default='app:create_app()', help='WSGI app spec, module:callable')
+    parser.add_argument('--chdir', help='directory to import the app from (e.g. ../hospital_app)')
+    args = parser.parse_args()
+
+    if BaseApplication is None:
+        sys.exit('serve.py needs gunicorn: pip install gunicorn (and gevent for the gevent profile)')
+    settings = profile_settings(args.profile, workers=args.workers, threads=args.threads)
+    if args.profile == 'gevent':
+        # Patch before the preloaded app imports socket/threading
+        from gevent import monkey
+        monkey.patch_all()
+        os.environ.setdefault('HOSPITAL_LIVE_STREAMS', str(settings['worker_connections'] // 2))
+
+    if args.chdir:
+        os.chdir(args.chdir)
+    sys.path.insert(0, os.getcwd())
+
+    settings['bind'] = args.bind
+    Server(args.app, settings).run()
+
+
+if __name__ == '__main__':
+    main()
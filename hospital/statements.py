@@ -0,0 +1,56 @@
+"""Prebuilt SQL statements for the hottest queries.
+
+Building a ``Model.query.filter_by(...)`` chain on every request costs
+Python time before SQLAlchemy can even look up its compiled-SQL cache. The
+registry builds each statement once per process, with ``bindparam()``
+placeholders for the values that change between requests, so a request only
+binds parameters and executes.
+
+    statements = StatementRegistry()
+
+    @statements.register('appointment_times')
+    def appointment_times():
+        return select(Appointment.appointment_time).where(
+            Appointment.doctor_id == bindparam('doctor_id'))
+
+    db.session.scalars(statements.get('appointment_times'), {'doctor_id': 3})
+
+Builders may take a ``variant`` argument for statements whose shape depends
+on the request (for example which optional filters are present); each
+variant is built once and cached separately.
+"""
+import threading
+
+
+class StatementRegistry:
+    """Builds each registered statement once and hands out the cached instance."""
+
+    def __init__(self):
+        self._builders = {}
+        self._statements = {}
+        self._lock = threading.Lock()
+
+    def register(self, name):
+        def decorator(builder):
+            if name in self._builders:
+                raise ValueError(f"Statement {name!r} is already registered")
+            self._builders[name] = builder
+            return builder
+        return decorator
+
+    def get(self, name, variant=None):
+        """Returns the statement for ``name`` (and ``variant``), building it on first use."""
+        key = (name, variant)
+        statement = self._statements.get(key)
+        if statement is None:
+            builder = self._builders[name]
+            with self._lock:
+                statement = self._statements.get(key)
+                if statement is None:
+                    statement = builder() if variant is None else builder(variant)
+                    self._statements[key] = statement
+        return statement
+
+    def built(self):
+        """Names and variants that have been built so far in this process."""
+        return sorted(self._statements, key=repr)
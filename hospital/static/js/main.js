@@ -70,8 +70,126 @@ document.addEventListener("DOMContentLoaded", () => {
       }
     })
   })
+
+  // Partial list updates: filter/search forms marked with data-fragment-target
+  // and the pagination links inside a list region reload just that region
+  document.querySelectorAll("form[data-fragment-target]").forEach((form) => {
+    const region = document.getElementById(form.dataset.fragmentTarget)
+    if (!region) return
+
+    const submit = () => loadFragment(region, formUrl(form), true)
+    let searchTimer = null
+
+    form.addEventListener("submit", (e) => {
+      e.preventDefault()
+      submit()
+    })
+    form.addEventListener("change", (e) => {
+      if (!e.target.matches("[data-live-search]")) submit()
+    })
+    form.querySelectorAll("[data-live-search]").forEach((input) => {
+      input.addEventListener("input", () => {
+        clearTimeout(searchTimer)
+        searchTimer = setTimeout(submit, 300)
+      })
+    })
+  })
+
+  document.querySelectorAll("[data-fragment-region]").forEach((region) => {
+    region.addEventListener("click", (e) => {
+      const link = e.target.closest("a[data-fragment-link]")
+      if (!link || e.ctrlKey || e.metaKey || e.shiftKey) return
+      e.preventDefault()
+      loadFragment(region, link.href, true)
+    })
+    history.replaceState({ fragmentRegion: region.id }, "", window.location.href)
+  })
+
+  window.addEventListener("popstate", (e) => {
+    const region = e.state && document.getElementById(e.state.fragmentRegion)
+    if (region) loadFragment(region, window.location.href, false)
+  })
 })
 
+function formUrl(form) {
+  const url = new URL(form.action || window.location.href, window.location.href)
+  url.search = new URLSearchParams(new FormData(form)).toString()
+  return url.toString()
+}
+
+// Replaces a list region with the server's fragment rendering of url
+function loadFragment(region, url, push) {
+  if (region.pendingRequest) region.pendingRequest.abort()
+  const controller = new AbortController()
+  region.pendingRequest = controller
+  region.setAttribute("aria-busy", "true")
+
+  return fetch(url, { headers: { "X-Fragment": "list" }, credentials: "same-origin", signal: controller.signal })
+    .then((response) => {
+      // A redirect (e.g. to the login page) or an error needs the full page
+      if (!response.ok || response.redirected) {
+        window.location.href = url
+        return
+      }
+      return response.text().then((html) => {
+        region.innerHTML = html
+        if (push) history.pushState({ fragmentRegion: region.id }, "", url)
+      })
+    })
+    .catch((error) => {
+      if (error.name !== "AbortError") window.location.href = url
+    })
+    .finally(() => {
+      if (region.pendingRequest === controller) {
+        region.pendingRequest = null
+        region.removeAttribute("aria-busy")
+      }
+    })
+}
+
+// Live updates (see event_bus.py): calls handlers[channel](delta) for every change pushed by the server.
+// EventSource reconnects on its own and resumes after the last event it received. When the server
+// turns the stream away (503: its worker has enough open streams) the page polls instead.
+const LIVE_POLL_MS = 10000
+
+function subscribeLive(handlers) {
+  const channels = Object.keys(handlers)
+  let lastEventId = null
+  if (!window.EventSource) {
+    pollLive(handlers, channels, lastEventId)
+    return null
+  }
+  const source = new EventSource("/api/events?channels=" + channels.join(","))
+  channels.forEach((channel) => {
+    source.addEventListener(channel, (event) => {
+      lastEventId = event.lastEventId
+      handlers[channel](JSON.parse(event.data))
+    })
+  })
+  source.addEventListener("error", () => {
+    // CONNECTING: a stream ended and the browser reconnects. CLOSED: refused, it won't retry.
+    if (source.readyState === EventSource.CLOSED) pollLive(handlers, channels, lastEventId)
+  })
+  return source
+}
+
+function pollLive(handlers, channels, lastEventId) {
+  let url = "/api/events/poll?channels=" + channels.join(",")
+  if (lastEventId) url += "&last_event_id=" + lastEventId
+  fetch(url, { headers: { Accept: "application/json" } })
+    .then((response) => {
+      if (response.status === 401) return null // signed out: stop
+      if (!response.ok) return { events: [], last_event_id: lastEventId }
+      return response.json()
+    })
+    .catch(() => ({ events: [], last_event_id: lastEventId }))
+    .then((result) => {
+      if (!result) return
+      result.events.forEach((event) => handlers[event.channel](event.data))
+      setTimeout(() => pollLive(handlers, channels, result.last_event_id), LIVE_POLL_MS)
+    })
+}
+
 // Utility functions
 function showLoading(button) {
   button.disabled = true
@@ -0,0 +1 @@
+"""Blueprints, one per area of the app; registered in create_app() (app.py)."""
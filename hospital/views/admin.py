@@ -0,0 +1,157 @@
+"""Administration: users, access requests and the admin dashboard."""
+from flask import Blueprint, flash, redirect, render_template, url_for
+
+from audit import activity
+from extensions import audit, db, event_bus, passwords, principal_cache, purger, session_store
+from models import User, AccessRequest, Specialization, Doctor, Patient, Appointment, MedicalRecord
+from principal import admin_required
+from views.helpers import age_bracket_counts
+
+bp = Blueprint('admin', __name__)
+
+# Admin routes for managing access requests
+@bp.route('/admin/access_requests')
+@admin_required
+def admin_access_requests():
+    pending_requests = AccessRequest.query.filter_by(status='pending').all()
+    approved_requests = AccessRequest.query.filter_by(status='approved').all()
+    rejected_requests = AccessRequest.query.filter_by(status='rejected').all()
+    
+    return render_template('admin/access_requests.html', 
+                         pending_requests=pending_requests,
+                         approved_requests=approved_requests,
+                         rejected_requests=rejected_requests)
+
+@bp.route('/admin/approve_request/<int:request_id>')
+@admin_required
+def approve_request(request_id):
+    access_request = AccessRequest.query.get_or_404(request_id)
+    
+    # Check if user already exists
+    username = access_request.last_name[0].lower() + access_request.first_name.lower()
+    existing_user = User.query.filter_by(username=username).first()
+    
+    if existing_user:
+        # User exists, just reset password
+        existing_user.password_hash = passwords.hash('password@2025')
+        existing_user.is_active = True
+        existing_user.session_epoch += 1
+        flash(f'Password reset for user {username}. New password: password@2025', 'success')
+    else:
+        # Create new user
+        new_user = User(
+            username=username,
+            password_hash=passwords.hash('password@2025'),
+            first_name=access_request.first_name,
+            last_name=access_request.last_name,
+            role='user'
+        )
+        db.session.add(new_user)
+        flash(f'New user created: {username} with password: password@2025', 'success')
+    
+    # Update request status
+    previous_status = access_request.status
+    access_request.status = 'approved'
+    db.session.commit()
+    event_bus.publish('access_request', 'update', request_id, status='approved', previous=previous_status)
+    if existing_user:
+        principal_cache.invalidate(existing_user.id)
+        session_store.end_user_sessions(existing_user.id)
+    
+    return redirect(url_for('admin.admin_access_requests'))
+
+@bp.route('/admin/reject_request/<int:request_id>')
+@admin_required
+def reject_request(request_id):
+    access_request = AccessRequest.query.get_or_404(request_id)
+    previous_status = access_request.status
+    access_request.status = 'rejected'
+    db.session.commit()
+    event_bus.publish('access_request', 'update', request_id, status='rejected', previous=previous_status)
+    
+    flash('Access request rejected', 'success')
+    return redirect(url_for('admin.admin_access_requests'))
+
+@bp.route('/admin/reset_password/<int:user_id>')
+@admin_required
+def reset_password(user_id):
+    user = User.query.get_or_404(user_id)
+    user.password_hash = passwords.hash('password@2025')
+    user.session_epoch += 1  # signs out every session logged in with the old password
+    db.session.commit()
+    principal_cache.invalidate(user.id)
+    session_store.end_user_sessions(user.id)
+    
+    flash(f'Password reset for {user.username}. New password: password@2025', 'success')
+    return redirect(url_for('admin.admin_users'))
+
+@bp.route('/admin/users')
+@admin_required
+def admin_users():
+    users = User.query.all()
+    return render_template('admin/users.html', users=users)
+
+@bp.route('/admin/toggle_user/<int:user_id>')
+@admin_required
+def toggle_user(user_id):
+    user = User.query.get_or_404(user_id)
+    user.is_active = not user.is_active
+    if not user.is_active:
+        user.session_epoch += 1  # sessions stay signed out if the user is activated again
+    db.session.commit()
+    principal_cache.invalidate(user.id)
+    if not user.is_active:
+        session_store.end_user_sessions(user.id)
+    
+    status = 'activated' if user.is_active else 'deactivated'
+    flash(f'User {user.username} has been {status}', 'success')
+    return redirect(url_for('admin.admin_users'))
+
+@bp.route('/admin/dashboard')
+@admin_required
+def admin_dashboard():
+    # Calculate comprehensive statistics
+    total_users = User.query.count()
+    active_users = User.query.filter_by(is_active=True).count()
+    total_patients = Patient.query.count()
+    total_doctors = Doctor.query.count()
+    # Deleted patients' appointments and records are gone from here before the purge removes them
+    total_appointments = Appointment.query.filter(*purger.live(Appointment)).count()
+    pending_requests = AccessRequest.query.filter_by(status='pending').count()
+    total_records = MedicalRecord.query.filter(*purger.live(MedicalRecord)).count()
+    specializations_count = Specialization.query.count()
+    
+    # Recent statistics (last 30 days)
+    from datetime import datetime, timedelta
+    thirty_days_ago = datetime.now() - timedelta(days=30)
+    recent_patients = Patient.query.filter(Patient.created_at >= thirty_days_ago).count()
+    age_brackets = age_bracket_counts()
+    
+    # Today's appointments
+    today = datetime.now().date()
+    today_appointments = Appointment.query.filter(
+        db.func.date(Appointment.appointment_date) == today, *purger.live(Appointment)
+    ).count()
+    
+    # Recent records (last 7 days)
+    seven_days_ago = datetime.now() - timedelta(days=7)
+    recent_records = MedicalRecord.query.filter(MedicalRecord.created_at >= seven_days_ago,
+                                                *purger.live(MedicalRecord)).count()
+    
+    # Recent activity, served from the audit log's in-memory ring
+    recent_activities = [activity(audit_event) for audit_event in audit.recent(10)]
+    
+    return render_template('admin/dashboard.html',
+                         total_users=total_users,
+                         active_users=active_users,
+                         total_patients=total_patients,
+                         recent_patients=recent_patients,
+                         age_brackets=age_brackets,
+                         total_doctors=total_doctors,
+                         specializations_count=specializations_count,
+                         total_appointments=total_appointments,
+                         today_appointments=today_appointments,
+                         pending_requests=pending_requests,
+                         total_records=total_records,
+                         recent_records=recent_records,
+                         recent_activities=recent_activities)
@@ -0,0 +1,278 @@
+"""Appointment management and the availability/calendar JSON APIs."""
+from flask import Blueprint, flash, jsonify, redirect, render_template, request, url_for
+from datetime import datetime, date, time, timedelta
+
+from sqlalchemy.orm import contains_eager
+
+from extensions import db, audit, event_bus, statements, fragment_cache
+from models import Doctor, Patient, Appointment
+from principal import login_required
+from projections import AppointmentRow, PersonOption, fetch
+from views.helpers import render_list, wants_fragment
+
+bp = Blueprint('appointments', __name__)
+
+@bp.route('/appointments')
+@login_required
+def appointments():
+    view = request.args.get('view', 'list')  # list or calendar
+    date_filter = request.args.get('date', '')
+    doctor_filter = request.args.get('doctor', '')
+    patient_filter = request.args.get('patient', '')
+    status_filter = request.args.get('status', '')
+    
+    filters = {}
+    
+    if date_filter:
+        try:
+            filters['appointment_date'] = datetime.strptime(date_filter, '%Y-%m-%d').date()
+        except ValueError:
+            pass
+    
+    if doctor_filter:
+        filters['doctor_id'] = doctor_filter
+    
+    if patient_filter:
+        filters['patient_id'] = patient_filter
+    
+    if status_filter:
+        filters['status'] = status_filter
+    
+    # Read-only listing: compact rows instead of ORM entities (see projections.py)
+    connection = db.session.connection()
+    appointments = fetch(connection, statements.get('appointment_rows', tuple(sorted(filters))),
+                         AppointmentRow, filters)
+    
+    if wants_fragment():
+        # The filter dropdowns live outside the list region
+        doctors = patients = []
+    else:
+        doctors = fetch(connection, statements.get('doctor_options'), PersonOption)
+        patients = fetch(connection, statements.get('patient_options'), PersonOption)
+    
+    return render_list('appointments/list.html', 'appointments/_list.html',
+                         appointments=appointments,
+                         doctors=doctors,
+                         patients=patients,
+                         view=view,
+                         date_filter=date_filter,
+                         doctor_filter=doctor_filter,
+                         patient_filter=patient_filter,
+                         status_filter=status_filter)
+
+@bp.route('/appointments/add', methods=['GET', 'POST'])
+@login_required
+def add_appointment():
+    if request.method == 'POST':
+        try:
+            appointment_date = datetime.strptime(request.form['appointment_date'], '%Y-%m-%d').date()
+            appointment_time = datetime.strptime(request.form['appointment_time'], '%H:%M').time()
+            
+            # Check for conflicts
+            existing = db.session.scalar(statements.get('appointment_conflict'), {
+                'doctor_id': request.form['doctor_id'],
+                'appointment_date': appointment_date,
+                'appointment_time': appointment_time
+            })
+            
+            if existing:
+                flash('This time slot is already booked for the selected doctor.', 'error')
+                doctors = Doctor.query.all()
+                patients = Patient.query.all()
+                min_date = (date.today() + timedelta(days=1)).strftime('%Y-%m-%d')
+                return render_template('appointments/add.html', doctors=doctors, patients=patients, min_date=min_date)
+            
+            appointment = Appointment(
+                patient_id=request.form['patient_id'],
+                doctor_id=request.form['doctor_id'],
+                appointment_date=appointment_date,
+                appointment_time=appointment_time,
+                diagnosis=request.form.get('diagnosis', ''),
+                notes=request.form.get('notes', ''),
+                status='scheduled'
+            )
+            
+            db.session.add(appointment)
+            db.session.commit()
+            audit.record('create', 'appointment', appointment.id,
+                         f'Appointment #{appointment.id} booked for {appointment_date:%b %d} at {appointment_time:%H:%M}')
+            event_bus.publish('appointment', 'create', appointment.id, date=appointment_date,
+                              time=appointment_time, status='scheduled')
+            
+            flash('Appointment scheduled successfully!', 'success')
+            return redirect(url_for('appointments.appointments'))
+            
+        except ValueError as e:
+            flash('Invalid date or time format.', 'error')
+        except Exception as e:
+            flash('Error scheduling appointment. Please try again.', 'error')
+            db.session.rollback()
+    
+    doctors = Doctor.query.all()
+    patients = Patient.query.all()
+    min_date = (date.today() + timedelta(days=1)).strftime('%Y-%m-%d')
+    return render_template('appointments/add.html', doctors=doctors, patients=patients, min_date=min_date)
+
+@bp.route('/appointments/<int:appointment_id>')
+@login_required
+def appointment_detail(appointment_id):
+    appointment = Appointment.query.get_or_404(appointment_id)
+    return render_template('appointments/detail.html', appointment=appointment)
+
+@bp.route('/appointments/<int:appointment_id>/edit', methods=['GET', 'POST'])
+@login_required
+def edit_appointment(appointment_id):
+    appointment = Appointment.query.get_or_404(appointment_id)
+    
+    if request.method == 'POST':
+        try:
+            appointment_date = datetime.strptime(request.form['appointment_date'], '%Y-%m-%d').date()
+            appointment_time = datetime.strptime(request.form['appointment_time'], '%H:%M').time()
+            
+            # Check for conflicts (excluding current appointment)
+            existing = db.session.scalar(statements.get('appointment_conflict_excluding'), {
+                'appointment_id': appointment_id,
+                'doctor_id': request.form['doctor_id'],
+                'appointment_date': appointment_date,
+                'appointment_time': appointment_time
+            })
+            
+            if existing:
+                flash('This time slot is already booked for the selected doctor.', 'error')
+                doctors = Doctor.query.all()
+                patients = Patient.query.all()
+                return render_template('appointments/edit.html', 
+                                     appointment=appointment, 
+                                     doctors=doctors, 
+                                     patients=patients)
+            
+            previous_date = appointment.appointment_date
+            appointment.patient_id = request.form['patient_id']
+            appointment.doctor_id = request.form['doctor_id']
+            appointment.appointment_date = appointment_date
+            appointment.appointment_time = appointment_time
+            appointment.diagnosis = request.form.get('diagnosis', '')
+            appointment.notes = request.form.get('notes', '')
+            appointment.status = request.form['status']
+            
+            db.session.commit()
+            fragment_cache.invalidate('appointment', appointment.id)
+            audit.record('update', 'appointment', appointment.id,
+                         f'Appointment #{appointment.id} updated ({appointment.status})')
+            event_bus.publish('appointment', 'update', appointment.id, date=appointment_date,
+                              time=appointment_time, status=appointment.status, previous_date=previous_date)
+            
+            flash('Appointment updated successfully!', 'success')
+            return redirect(url_for('appointments.appointment_detail', appointment_id=appointment.id))
+            
+        except ValueError as e:
+            flash('Invalid date or time format.', 'error')
+        except Exception as e:
+            flash('Error updating appointment. Please try again.', 'error')
+            db.session.rollback()
+    
+    doctors = Doctor.query.all()
+    patients = Patient.query.all()
+    return render_template('appointments/edit.html', 
+                         appointment=appointment, 
+                         doctors=doctors, 
+                         patients=patients)
+
+@bp.route('/appointments/<int:appointment_id>/delete', methods=['POST'])
+@login_required
+def delete_appointment(appointment_id):
+    appointment = Appointment.query.get_or_404(appointment_id)
+    appointment_date = appointment.appointment_date
+    
+    try:
+        db.session.delete(appointment)
+        db.session.commit()
+        fragment_cache.invalidate('appointment', appointment_id)
+        audit.record('delete', 'appointment', appointment_id, f'Appointment #{appointment_id} was deleted')
+        event_bus.publish('appointment', 'delete', appointment_id, date=appointment_date)
+        flash('Appointment deleted successfully!', 'success')
+    except Exception as e:
+        flash('Error deleting appointment. Please try again.', 'error')
+        db.session.rollback()
+    
+    return redirect(url_for('appointments.appointments'))
+
+# API endpoint for checking doctor availability
+@bp.route('/api/doctor-availability/<int:doctor_id>')
+@login_required
+def doctor_availability(doctor_id):
+    date_str = request.args.get('date')
+    if not date_str:
+        return jsonify({'error': 'Date parameter required'}), 400
+    
+    try:
+        check_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+    
+    # Get all booked times for this doctor on this date
+    booked = db.session.scalars(statements.get('booked_times'), {
+        'doctor_id': doctor_id,
+        'appointment_date': check_date
+    })
+    
+    booked_times = [appointment_time.strftime('%H:%M') for appointment_time in booked]
+    
+    # Generate available time slots (9 AM to 5 PM, 30-minute intervals)
+    available_times = []
+    current_time = time(9, 0)  # 9:00 AM
+    end_time = time(17, 0)     # 5:00 PM
+    
+    while current_time < end_time:
+        time_str = current_time.strftime('%H:%M')
+        if time_str not in booked_times:
+            available_times.append({
+                'time': time_str,
+                'display': current_time.strftime('%I:%M %p')
+            })
+        
+        # Add 30 minutes
+        current_datetime = datetime.combine(date.today(), current_time)
+        current_datetime += timedelta(minutes=30)
+        current_time = current_datetime.time()
+    
+    return jsonify({
+        'available_times': available_times,
+        'booked_times': booked_times
+    })
+
+# Calendar view API
+@bp.route('/api/calendar-appointments')
+@login_required
+def calendar_appointments():
+    start_date = request.args.get('start')
+    end_date = request.args.get('end')
+    
+    if not start_date or not end_date:
+        return jsonify({'error': 'Start and end dates required'}), 400
+    
+    try:
+        start = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end = datetime.strptime(end_date, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+    
+    # Joined for the titles: deleted patients (see purge.py) drop out, and no lazy load per event
+    appointments = Appointment.query.join(Appointment.patient_ref).filter(
+        Patient.deleted_at.is_(None),
+        Appointment.appointment_date >= start,
+        Appointment.appointment_date <= end
+    ).options(contains_eager(Appointment.patient_ref)).all()
+    
+    events = []
+    for apt in appointments:
+        events.append({
+            'id': apt.id,
+            'title': f"{apt.patient_ref.first_name} {apt.patient_ref.last_name} - Dr. {apt.doctor_ref.first_name} {apt.doctor_ref.last_name}",
+            'start': f"{apt.appointment_date}T{apt.appointment_time}",
+            'backgroundColor': '#50a69e' if apt.status == 'scheduled' else '#27ae60' if apt.status == 'completed' else '#e74c3c',
+            'borderColor': '#073649',
+            'textColor': '#ffffff'
+        })
+    
+    return jsonify(events)
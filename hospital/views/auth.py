@@ -0,0 +1,83 @@
+"""Login, logout and access requests."""
+from flask import Blueprint, flash, make_response, redirect, render_template, request, session, url_for
+
+from extensions import db, event_bus, passwords, principal_cache, session_store
+from models import User, AccessRequest
+from passwords import PasswordHasherBusy
+from principal import login_required
+
+bp = Blueprint('auth', __name__)
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+        
+        user = User.query.filter_by(username=username, is_active=True).first()
+        # Give the connection back to the pool while the hash waits for a worker
+        db.session.close()
+        try:
+            valid = user is not None and passwords.verify(user.password_hash, password)
+        except PasswordHasherBusy:
+            flash('Too many sign-ins right now. Please try again in a few seconds.', 'error')
+            response = make_response(render_template('login.html'), 503)
+            response.headers['Retry-After'] = '5'
+            return response
+        
+        if valid:
+            session['user_id'] = user.id
+            session['username'] = user.username
+            session['role'] = user.role
+            session['session_epoch'] = user.session_epoch
+            session['first_name'] = user.first_name
+            session['last_name'] = user.last_name
+            if passwords.needs_rehash(user.password_hash):
+                # Hash parameters changed since this password was set: upgrade it now
+                try:
+                    password_hash = passwords.hash(password)
+                except PasswordHasherBusy:
+                    password_hash = None  # next login will try again
+                if password_hash:
+                    db.session.add(user)
+                    user.password_hash = password_hash
+                    db.session.commit()
+            return redirect(url_for('main.dashboard'))
+        else:
+            flash('Invalid username or password', 'error')
+    
+    return render_template('login.html')
+
+@bp.route('/request_access', methods=['GET', 'POST'])
+def request_access():
+    if request.method == 'POST':
+        access_request = AccessRequest(
+            first_name=request.form['first_name'],
+            last_name=request.form['last_name'],
+            reason=request.form['reason'],
+            is_temporary=bool(request.form.get('is_temporary'))
+        )
+        db.session.add(access_request)
+        db.session.commit()
+        event_bus.publish('access_request', 'create', access_request.id, status='pending')
+        flash('Access request submitted successfully', 'success')
+        return redirect(url_for('auth.login'))
+    
+    return render_template('request_access.html')
+
+@bp.route('/logout')
+def logout():
+    session.clear()
+    return redirect(url_for('auth.login'))
+
+@bp.route('/logout_everywhere')
+@login_required
+def logout_everywhere():
+    user = db.session.get(User, session['user_id'])
+    user.session_epoch += 1  # also signs out copies other workers still have cached
+    db.session.commit()
+    count = session_store.end_user_sessions(session['user_id'])
+    principal_cache.invalidate(session['user_id'])
+    session.clear()
+    flash(f'Signed out of {count} session(s)', 'success')
+    return redirect(url_for('auth.login'))
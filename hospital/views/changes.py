@@ -0,0 +1,40 @@
+"""The change feed for downstream systems (see outbox.py)."""
+from flask import Blueprint, jsonify, request
+
+import outbox
+from extensions import db
+from principal import admin_required
+
+bp = Blueprint('changes', __name__)
+
+MAX_LIMIT = 1000
+
+@bp.route('/api/changes')
+@admin_required
+def change_feed():
+    try:
+        since = int(request.args.get('since', 0))
+        limit = min(int(request.args.get('limit', 100)), MAX_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'since and limit must be integers'}), 400
+    if since < 0 or limit < 1:
+        return jsonify({'error': 'since must be >= 0 and limit >= 1'}), 400
+    consumer = request.args.get('consumer', '')[:50]
+    
+    try:
+        changes, more = outbox.changes(db.session.connection(), since, limit, consumer)
+    except outbox.CursorExpired:
+        db.session.rollback()
+        return jsonify({'error': 'The events after this cursor have been compacted away; take a bulk export '
+                                 '(/admin/export/<dataset>), then resume from cursor (or the export\'s '
+                                 'X-Change-Cursor header)',
+                        'cursor': outbox.latest(db.session.connection())}), 410
+    db.session.commit()  # the consumer's position
+    
+    # Keep polling with since=next; more=true means the next page is already waiting
+    return jsonify({'changes': changes, 'next': changes[-1]['cursor'] if changes else since, 'more': more})
+
+@bp.route('/api/changes/stats')
+@admin_required
+def change_feed_stats():
+    return jsonify(outbox.stats(db.session.connection()))
@@ -0,0 +1,143 @@
+"""Doctor management."""
+from flask import Blueprint, flash, redirect, render_template, request, url_for
+
+from extensions import db, fragment_cache, purger
+from models import Specialization, Doctor, Appointment, ArchivedAppointment
+from principal import login_required
+from views.helpers import appointment_counts, render_list, wants_fragment
+
+bp = Blueprint('doctors', __name__)
+
+@bp.route('/doctors')
+@login_required
+def doctors():
+    search = request.args.get('search', '')
+    specialization_filter = request.args.get('specialization', '')
+    page = request.args.get('page', 1, type=int)
+    per_page = 10
+    
+    query = Doctor.query.join(Specialization)
+    if search:
+        query = query.filter(
+            (Doctor.first_name.contains(search)) |
+            (Doctor.last_name.contains(search)) |
+            (Doctor.phone.contains(search)) |
+            (Doctor.email.contains(search)) |
+            (Doctor.license_number.contains(search))
+        )
+    
+    if specialization_filter:
+        query = query.filter(Doctor.specialization_id == specialization_filter)
+    
+    doctors = query.paginate(
+        page=page, per_page=per_page, error_out=False
+    )
+    appointment_totals = appointment_counts('doctor_id', [doctor.id for doctor in doctors.items])
+    
+    specializations = [] if wants_fragment() else Specialization.query.all()
+    
+    return render_list('doctors/list.html', 'doctors/_list.html',
+                         doctors=doctors, 
+                         appointment_totals=appointment_totals, 
+                         search=search,
+                         specialization_filter=specialization_filter,
+                         specializations=specializations)
+
+@bp.route('/doctors/add', methods=['GET', 'POST'])
+@login_required
+def add_doctor():
+    if request.method == 'POST':
+        try:
+            doctor = Doctor(
+                first_name=request.form['first_name'],
+                last_name=request.form['last_name'],
+                phone=request.form.get('phone', ''),
+                email=request.form.get('email', ''),
+                specialization_id=request.form['specialization_id'],
+                license_number=request.form.get('license_number', '')
+            )
+            
+            db.session.add(doctor)
+            db.session.commit()
+            
+            flash('Doctor registered successfully!', 'success')
+            return redirect(url_for('doctors.doctors'))
+            
+        except Exception as e:
+            flash('Error registering doctor. Please check if license number is unique.', 'error')
+            db.session.rollback()
+    
+    specializations = Specialization.query.all()
+    return render_template('doctors/add.html', specializations=specializations)
+
+@bp.route('/doctors/<int:doctor_id>')
+@login_required
+def doctor_detail(doctor_id):
+    doctor = Doctor.query.get_or_404(doctor_id)
+    # Leaves out deleted patients' appointments (see purge.py)
+    appointments = Appointment.query.filter_by(doctor_id=doctor_id).filter(*purger.live(Appointment))
+    recent_appointments = appointments.order_by(Appointment.appointment_date.desc()).limit(10).all()
+    
+    # Get appointment statistics
+    total_appointments = appointments.count()
+    completed_appointments = appointments.filter_by(status='completed').count()
+    scheduled_appointments = appointments.filter_by(status='scheduled').count()
+    
+    return render_template('doctors/detail.html', 
+                         doctor=doctor, 
+                         recent_appointments=recent_appointments,
+                         total_appointments=total_appointments,
+                         completed_appointments=completed_appointments,
+                         scheduled_appointments=scheduled_appointments)
+
+@bp.route('/doctors/<int:doctor_id>/edit', methods=['GET', 'POST'])
+@login_required
+def edit_doctor(doctor_id):
+    doctor = Doctor.query.get_or_404(doctor_id)
+    
+    if request.method == 'POST':
+        try:
+            doctor.first_name = request.form['first_name']
+            doctor.last_name = request.form['last_name']
+            doctor.phone = request.form.get('phone', '')
+            doctor.email = request.form.get('email', '')
+            doctor.specialization_id = request.form['specialization_id']
+            doctor.license_number = request.form.get('license_number', '')
+            
+            db.session.commit()
+            fragment_cache.invalidate('doctor', doctor.id)
+            
+            flash('Doctor information updated successfully!', 'success')
+            return redirect(url_for('doctors.doctor_detail', doctor_id=doctor.id))
+            
+        except Exception as e:
+            flash('Error updating doctor information. Please check if license number is unique.', 'error')
+            db.session.rollback()
+    
+    specializations = Specialization.query.all()
+    return render_template('doctors/edit.html', doctor=doctor, specializations=specializations)
+
+@bp.route('/doctors/<int:doctor_id>/delete', methods=['POST'])
+@login_required
+def delete_doctor(doctor_id):
+    doctor = Doctor.query.get_or_404(doctor_id)
+    
+    try:
+        # Check if doctor has appointments (archived ones still show the doctor in patient histories)
+        appointment_count = Appointment.query.filter_by(doctor_id=doctor_id).count() \
+            + ArchivedAppointment.query.filter_by(doctor_id=doctor_id).count()
+        if appointment_count > 0:
+            flash('Cannot delete doctor with existing appointments. Please reassign or cancel appointments first.', 'error')
+            return redirect(url_for('doctors.doctor_detail', doctor_id=doctor_id))
+        
+        # Delete doctor
+        db.session.delete(doctor)
+        db.session.commit()
+        fragment_cache.invalidate('doctor', doctor_id)
+        
+        flash('Doctor deleted successfully!', 'success')
+    except Exception as e:
+        flash('Error deleting doctor. Please try again.', 'error')
+        db.session.rollback()
+    
+    return redirect(url_for('doctors.doctors'))
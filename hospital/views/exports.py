@@ -0,0 +1,212 @@
+"""Patient record exports (plain text and Word) and bulk exports for BI (see bulk_export.py)."""
+from flask import Blueprint, Response, jsonify, request, send_file, stream_with_context
+from datetime import datetime
+import io
+
+from bulk_export import DATASETS, FORMATS
+from extensions import audit, bulk_export as bulk_exporter, db
+import outbox
+from models import Patient, MedicalRecord, ArchivedMedicalRecord
+from principal import admin_required, login_required
+
+bp = Blueprint('exports', __name__)
+
+@bp.route('/patients/<int:patient_id>/export')
+@login_required
+def export_patient_records(patient_id):
+    patient = Patient.query.get_or_404(patient_id)
+    export_format = request.args.get('format', 'txt')  # txt or docx
+    diagnosis_filter = request.args.get('diagnosis', '')
+    date_from = request.args.get('date_from', '')
+    date_to = request.args.get('date_to', '')
+    
+    # Build query: current and archived records (see archive.py)
+    records = []
+    for model in (MedicalRecord, ArchivedMedicalRecord):
+        query = model.query.filter_by(patient_id=patient_id)
+        
+        if diagnosis_filter:
+            query = query.filter(model.diagnosis.contains(diagnosis_filter))
+        
+        if date_from:
+            try:
+                from_date = datetime.strptime(date_from, '%Y-%m-%d').date()
+                query = query.filter(model.record_date >= from_date)
+            except ValueError:
+                pass
+        
+        if date_to:
+            try:
+                to_date = datetime.strptime(date_to, '%Y-%m-%d').date()
+                query = query.filter(model.record_date <= to_date)
+            except ValueError:
+                pass
+        
+        records.extend(query.order_by(model.record_date.desc()).all())
+    records.sort(key=lambda record: record.record_date, reverse=True)
+    audit.record('export', 'patient', patient.id,
+                 f'{len(records)} records of {patient.first_name} {patient.last_name} as {export_format}')
+    
+    if export_format == 'docx':
+        return export_to_word(patient, records)
+    else:
+        return export_to_text(patient, records)
+
+def export_to_text(patient, records):
+    """Export patient records to text file"""
+    output = io.StringIO()
+    
+    # Header information
+    output.write("SEIN HOSPITAL MANAGEMENT SYSTEM\n")
+    output.write("=" * 50 + "\n\n")
+    output.write("PATIENT MEDICAL RECORDS EXPORT\n\n")
+    
+    # Patient information
+    output.write(f"Patient Name: {patient.first_name} {patient.last_name}\n")
+    output.write(f"Date of Birth: {patient.date_of_birth.strftime('%B %d, %Y')}\n")
+    output.write(f"Age: {patient.age} years\n")
+    output.write(f"Gender: {patient.gender}\n")
+    if patient.phone:
+        output.write(f"Phone: {patient.phone}\n")
+    if patient.email:
+        output.write(f"Email: {patient.email}\n")
+    
+    output.write(f"\nExport Date: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}\n")
+    output.write(f"Total Records: {len(records)}\n")
+    output.write("\n" + "=" * 50 + "\n\n")
+    
+    # Medical records
+    if records:
+        for i, record in enumerate(records, 1):
+            output.write(f"RECORD #{i}\n")
+            output.write("-" * 20 + "\n")
+            output.write(f"Date: {record.record_date.strftime('%B %d, %Y')}\n")
+            output.write(f"Diagnosis: {record.diagnosis}\n")
+            if record.description:
+                output.write(f"Description: {record.description}\n")
+            if record.file_name:
+                output.write(f"Attached File: {record.file_name}\n")
+            output.write(f"Record Created: {record.created_at.strftime('%B %d, %Y at %I:%M %p')}\n")
+            output.write("\n")
+    else:
+        output.write("No medical records found for the specified criteria.\n")
+    
+    # Create response
+    output.seek(0)
+    filename = f"{patient.first_name}_{patient.last_name}_medical_records_{datetime.now().strftime('%Y%m%d')}.txt"
+    
+    return send_file(
+        io.BytesIO(output.getvalue().encode('utf-8')),
+        mimetype='text/plain',
+        as_attachment=True,
+        download_name=filename
+    )
+
+def export_to_word(patient, records):
+    """Export patient records to Word document"""
+    # Imported here: python-docx is slow to import and only this export needs it
+    from docx import Document
+    
+    doc = Document()
+    
+    # Header
+    header = doc.add_heading('SEIN HOSPITAL MANAGEMENT SYSTEM', 0)
+    header.alignment = 1  # Center alignment
+    
+    doc.add_heading('Patient Medical Records Export', level=1)
+    
+    # Patient information table
+    patient_table = doc.add_table(rows=6, cols=2)
+    patient_table.style = 'Table Grid'
+    
+    patient_info = [
+        ('Patient Name', f"{patient.first_name} {patient.last_name}"),
+        ('Date of Birth', patient.date_of_birth.strftime('%B %d, %Y')),
+        ('Age', f"{patient.age} years"),
+        ('Gender', patient.gender),
+        ('Phone', patient.phone or 'Not provided'),
+        ('Email', patient.email or 'Not provided')
+    ]
+    
+    for i, (label, value) in enumerate(patient_info):
+        patient_table.cell(i, 0).text = label
+        patient_table.cell(i, 1).text = value
+    
+    doc.add_paragraph()
+    doc.add_paragraph(f"Export Date: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}")
+    doc.add_paragraph(f"Total Records: {len(records)}")
+    
+    # Medical records
+    if records:
+        doc.add_heading('Medical Records', level=2)
+        
+        for i, record in enumerate(records, 1):
+            doc.add_heading(f'Record #{i}', level=3)
+            
+            record_table = doc.add_table(rows=4 + (1 if record.file_name else 0), cols=2)
+            record_table.style = 'Table Grid'
+            
+            record_info = [
+                ('Date', record.record_date.strftime('%B %d, %Y')),
+                ('Diagnosis', record.diagnosis),
+                ('Description', record.description or 'Not provided'),
+                ('Record Created', record.created_at.strftime('%B %d, %Y at %I:%M %p'))
+            ]
+            
+            if record.file_name:
+                record_info.append(('Attached File', record.file_name))
+            
+            for j, (label, value) in enumerate(record_info):
+                record_table.cell(j, 0).text = label
+                record_table.cell(j, 1).text = value
+            
+            doc.add_paragraph()
+    else:
+        doc.add_paragraph("No medical records found for the specified criteria.")
+    
+    # Save to BytesIO
+    doc_io = io.BytesIO()
+    doc.save(doc_io)
+    doc_io.seek(0)
+    
+    filename = f"{patient.first_name}_{patient.last_name}_medical_records_{datetime.now().strftime('%Y%m%d')}.docx"
+    
+    return send_file(
+        doc_io,
+        mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        as_attachment=True,
+        download_name=filename
+    )
+
+@bp.route('/admin/export/<dataset>')
+@admin_required
+def bulk_export(dataset):
+    if dataset not in DATASETS:
+        return jsonify({'error': f"dataset must be one of {', '.join(DATASETS)}"}), 404
+    export_format = request.args.get('format', 'csv')
+    if export_format not in bulk_exporter.formats:
+        return jsonify({'error': f"format must be one of {', '.join(bulk_exporter.formats)}"}), 400
+    try:
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else None
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else None
+        since = int(request.args['since']) if request.args.get('since') else None
+    except ValueError:
+        return jsonify({'error': 'start/end must be YYYY-MM-DD and since an id'}), 400
+    
+    # Taken before the export reads anything: a change feed reader resumes from here (see outbox.py)
+    with db.engine.connect() as connection:
+        change_cursor = outbox.latest(connection)
+    chunks, watermark = bulk_exporter.stream(db.engine, dataset, export_format, start, end, since)
+    audit.record('export', 'bulk_export', None,
+                 f"{dataset} as {export_format}"
+                 f" ({start or 'all'} to {end or 'all'}, since id {since or 0}, up to id {watermark or since or 0})")
+    
+    mimetype, extension = FORMATS[export_format]
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = (
+        f"attachment; filename={dataset}_{datetime.now().strftime('%Y%m%d%H%M%S')}.{extension}")
+    # Pass back as ?since= for the next incremental export
+    response.headers['X-Export-Watermark'] = str(watermark or since or 0)
+    # Pass as ?since= to /api/changes to follow the changes made after this export
+    response.headers['X-Change-Cursor'] = str(change_cursor)
+    return response
@@ -0,0 +1,35 @@
+"""Helpers shared by several blueprints."""
+from flask import make_response, render_template, request
+from sqlalchemy import func, select
+
+from extensions import db, statements
+from models import AGE_BRACKETS, Patient
+
+# Allowed file extensions
+ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx', 'xls', 'xlsx'}
+
+def allowed_file(filename):
+    return '.' in filename and \
+           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def wants_fragment():
+    """True when the page script asked for just the list region (X-Fragment: list)."""
+    return request.headers.get('X-Fragment') == 'list'
+
+def render_list(template, fragment_template, **context):
+    """Renders a list page, or only its list region for fragment requests."""
+    response = make_response(render_template(fragment_template if wants_fragment() else template, **context))
+    response.vary.add('X-Fragment')
+    return response
+
+def appointment_counts(column, ids):
+    """Maps each patient or doctor id in ids to its number of appointments."""
+    if not ids:
+        return {}
+    return dict(db.session.execute(statements.get('appointment_counts', column), {'ids': ids}).all())
+
+def age_bracket_counts(*criteria):
+    """[(bracket, patients)] in AGE_BRACKETS order, from one grouped query over the date_of_birth index."""
+    bracket = Patient.age_bracket()
+    counts = dict(db.session.execute(select(bracket, func.count()).where(*criteria).group_by(bracket)).all())
+    return [(label, counts.get(label, 0)) for label, _, _ in AGE_BRACKETS]
@@ -0,0 +1,52 @@
+"""Live updates over Server-Sent Events (see event_bus.py)."""
+import json
+
+from flask import Blueprint, Response, jsonify, request
+
+from event_bus import CHANNELS
+from extensions import event_bus
+from principal import admin_required, current_principal, login_required
+
+bp = Blueprint('live', __name__)
+
+# Channels only admins may follow
+ADMIN_CHANNELS = {'access_request'}
+
+def requested_channels():
+    """The channels asked for in ?channels= that the principal may follow (default: all)."""
+    requested = request.args.get('channels', '')
+    channels = {name for name in requested.split(',') if name in CHANNELS} or set(CHANNELS)
+    if current_principal().role != 'admin':
+        channels -= ADMIN_CHANNELS
+    return channels
+
+@bp.route('/api/events')
+@login_required
+def events():
+    channels = requested_channels()
+    
+    # Sent by browsers when they reconnect: replay what was missed since then
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    subscriber = event_bus.subscribe(channels, last_event_id)
+    
+    response = Response(event_bus.stream(subscriber), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # don't let a proxy hold events back
+    return response
+
+# The fallback for clients turned away from /api/events (too many open streams): returns at once
+@bp.route('/api/events/poll')
+@login_required
+def poll_events():
+    events, last_event_id = event_bus.poll(requested_channels(), request.args.get('last_event_id', type=int))
+    return jsonify({
+        'events': [{'id': event_id, 'channel': channel, 'data': json.loads(payload)}
+                   for event_id, channel, payload in events],
+        'last_event_id': last_event_id,
+    })
+
+@bp.route('/api/events/stats')
+@admin_required
+def event_stats():
+    # Per worker: each process has its own subscribers
+    return jsonify(event_bus.stats())
@@ -0,0 +1,28 @@
+"""Landing page and staff dashboard."""
+from flask import Blueprint, redirect, render_template, url_for
+
+from extensions import purger
+from models import AccessRequest, Doctor, Patient, Appointment
+from principal import login_required
+
+bp = Blueprint('main', __name__)
+
+@bp.route('/')
+@login_required
+def index():
+    return redirect(url_for('main.dashboard'))
+
+@bp.route('/dashboard')
+@login_required
+def dashboard():
+    # Get dashboard statistics
+    total_patients = Patient.query.count()
+    total_doctors = Doctor.query.count()
+    total_appointments = Appointment.query.filter(*purger.live(Appointment)).count()
+    pending_requests = AccessRequest.query.filter_by(status='pending').count()
+    
+    return render_template('dashboard.html', 
+                         total_patients=total_patients,
+                         total_doctors=total_doctors,
+                         total_appointments=total_appointments,
+                         pending_requests=pending_requests)
@@ -0,0 +1,182 @@
+"""Patient management."""
+from flask import Blueprint, flash, jsonify, redirect, render_template, request, url_for
+from datetime import datetime
+
+from extensions import db, audit, event_bus, statements, fragment_cache, purger
+from models import AGE_BRACKETS, Patient
+from principal import admin_required, login_required
+from views.helpers import age_bracket_counts, appointment_counts, render_list
+
+bp = Blueprint('patients', __name__)
+
+MAX_AGE = 150
+
+@bp.route('/patients')
+@login_required
+def patients():
+    search = request.args.get('search', '')
+    page = request.args.get('page', 1, type=int)
+    per_page = 10
+    # Age filters and sorts run on the date_of_birth index (see AgeComparator)
+    min_age = request.args.get('min_age', type=int)
+    max_age = request.args.get('max_age', type=int)
+    sort = request.args.get('sort', '')
+    for label, youngest, oldest in AGE_BRACKETS:
+        if request.args.get('bracket') == label:
+            min_age, max_age = youngest, oldest
+    
+    criteria = []
+    if search:
+        criteria.append(
+            (Patient.first_name.contains(search)) |
+            (Patient.last_name.contains(search)) |
+            (Patient.phone.contains(search)) |
+            (Patient.email.contains(search))
+        )
+    # The bracket counts cover the search, not the age filter, so every bracket stays reachable
+    bracket_counts = age_bracket_counts(*criteria)
+    if min_age is not None:
+        criteria.append(Patient.age >= min(max(min_age, 0), MAX_AGE))
+    if max_age is not None:
+        criteria.append(Patient.age <= min(max(max_age, 0), MAX_AGE))
+    
+    query = Patient.query.filter(*criteria)
+    if sort in ('age', '-age'):
+        query = query.order_by(Patient.age.asc() if sort == 'age' else Patient.age.desc(), Patient.id)
+    
+    patients = query.paginate(
+        page=page, per_page=per_page, error_out=False
+    )
+    visit_counts = appointment_counts('patient_id', [patient.id for patient in patients.items])
+    
+    # Carried by the pagination and bracket links
+    filters = {name: value for name, value in
+               (('search', search), ('min_age', min_age), ('max_age', max_age), ('sort', sort))
+               if value not in (None, '')}
+    
+    return render_list('patients/list.html', 'patients/_list.html',
+                       patients=patients, search=search, visit_counts=visit_counts,
+                       min_age=min_age, max_age=max_age, sort=sort, filters=filters,
+                       bracket_counts=bracket_counts, age_brackets=AGE_BRACKETS)
+
+@bp.route('/patients/add', methods=['GET', 'POST'])
+@login_required
+def add_patient():
+    if request.method == 'POST':
+        try:
+            # Parse date of birth
+            dob_str = request.form['date_of_birth']
+            dob = datetime.strptime(dob_str, '%Y-%m-%d').date()
+            
+            patient = Patient(
+                first_name=request.form['first_name'],
+                last_name=request.form['last_name'],
+                date_of_birth=dob,
+                gender=request.form['gender'],
+                phone=request.form.get('phone', ''),
+                email=request.form.get('email', ''),
+                address=request.form.get('address', ''),
+                emergency_contact=request.form.get('emergency_contact', ''),
+                emergency_phone=request.form.get('emergency_phone', '')
+            )
+            
+            db.session.add(patient)
+            db.session.commit()
+            audit.record('create', 'patient', patient.id, f'{patient.first_name} {patient.last_name} was registered')
+            event_bus.publish('patient', 'create', patient.id)
+            
+            flash('Patient registered successfully!', 'success')
+            return redirect(url_for('patients.patients'))
+            
+        except ValueError as e:
+            flash('Invalid date format. Please use YYYY-MM-DD format.', 'error')
+        except Exception as e:
+            flash('Error registering patient. Please try again.', 'error')
+            db.session.rollback()
+    
+    return render_template('patients/add.html')
+
+@bp.route('/patients/<int:patient_id>')
+@login_required
+def patient_detail(patient_id):
+    patient = db.get_or_404(Patient, patient_id)
+    params = {'patient_id': patient_id}
+    # History includes archived rows (see archive.py)
+    recent_appointments = sorted(
+        db.session.scalars(statements.get('recent_patient_appointments'), params).all()
+        + db.session.scalars(statements.get('recent_patient_archived_appointments'), params).all(),
+        key=lambda appointment: appointment.appointment_date, reverse=True)[:5]
+    recent_records = sorted(
+        db.session.scalars(statements.get('recent_patient_records'), params).all()
+        + db.session.scalars(statements.get('recent_patient_archived_records'), params).all(),
+        key=lambda record: record.record_date, reverse=True)[:5]
+    
+    return render_template('patients/detail.html', 
+                         patient=patient, 
+                         recent_appointments=recent_appointments,
+                         recent_records=recent_records)
+
+@bp.route('/patients/<int:patient_id>/edit', methods=['GET', 'POST'])
+@login_required
+def edit_patient(patient_id):
+    patient = Patient.query.get_or_404(patient_id)
+    
+    if request.method == 'POST':
+        try:
+            # Parse date of birth
+            dob_str = request.form['date_of_birth']
+            dob = datetime.strptime(dob_str, '%Y-%m-%d').date()
+            
+            patient.first_name = request.form['first_name']
+            patient.last_name = request.form['last_name']
+            patient.date_of_birth = dob
+            patient.gender = request.form['gender']
+            patient.phone = request.form.get('phone', '')
+            patient.email = request.form.get('email', '')
+            patient.address = request.form.get('address', '')
+            patient.emergency_contact = request.form.get('emergency_contact', '')
+            patient.emergency_phone = request.form.get('emergency_phone', '')
+            
+            db.session.commit()
+            fragment_cache.invalidate('patient', patient.id)
+            audit.record('update', 'patient', patient.id, f'{patient.first_name} {patient.last_name} was updated')
+            event_bus.publish('patient', 'update', patient.id)
+            
+            flash('Patient information updated successfully!', 'success')
+            return redirect(url_for('patients.patient_detail', patient_id=patient.id))
+            
+        except ValueError as e:
+            flash('Invalid date format. Please use YYYY-MM-DD format.', 'error')
+        except Exception as e:
+            flash('Error updating patient information. Please try again.', 'error')
+            db.session.rollback()
+    
+    return render_template('patients/edit.html', patient=patient)
+
+@bp.route('/patients/<int:patient_id>/delete', methods=['POST'])
+@login_required
+def delete_patient(patient_id):
+    patient = Patient.query.get_or_404(patient_id)
+    name = f'{patient.first_name} {patient.last_name}'
+    
+    try:
+        # Tombstone only; the purge worker deletes what they own in the background (see purge.py)
+        counts = purger.mark(patient)
+        db.session.commit()
+        purger.wake()
+        fragment_cache.invalidate('patient', patient_id)
+        audit.record('delete', 'patient', patient_id, f'{name} was deleted')
+        event_bus.publish('patient', 'delete', patient_id,
+                          records=counts['medical_record'], appointments=counts['appointment'])
+        
+        flash('Patient deleted successfully!', 'success')
+    except Exception as e:
+        flash('Error deleting patient. Please try again.', 'error')
+        db.session.rollback()
+    
+    return redirect(url_for('patients.patients'))
+
+@bp.route('/api/patients/purges')
+@admin_required
+def purge_status():
+    return jsonify(purger.stats())
@@ -0,0 +1,196 @@
+"""Medical records and their file attachments."""
+from flask import Blueprint, current_app, flash, redirect, render_template, request, send_file, url_for
+from werkzeug.utils import secure_filename
+from datetime import datetime, date, timedelta
+import os
+
+from extensions import audit, db, event_bus
+from models import Patient, MedicalRecord, ArchivedMedicalRecord
+from principal import login_required
+from views.helpers import allowed_file
+
+bp = Blueprint('records', __name__)
+
+@bp.route('/patients/<int:patient_id>/records')
+@login_required
+def patient_records(patient_id):
+    patient = Patient.query.get_or_404(patient_id)
+    
+    # Get filter parameters
+    view_filter = request.args.get('filter', 'all')  # all, recent, date, diagnosis
+    date_filter = request.args.get('date', '')
+    diagnosis_filter = request.args.get('diagnosis', '')
+    
+    # The patient's history: current and archived records (see archive.py)
+    records = []
+    diagnoses = set()
+    for model in (MedicalRecord, ArchivedMedicalRecord):
+        query = model.query.filter_by(patient_id=patient_id)
+        
+        if view_filter == 'recent':
+            # Get records from last 30 days
+            thirty_days_ago = date.today() - timedelta(days=30)
+            query = query.filter(model.record_date >= thirty_days_ago)
+        elif view_filter == 'date' and date_filter:
+            try:
+                filter_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
+                query = query.filter(model.record_date == filter_date)
+            except ValueError:
+                pass
+        elif view_filter == 'diagnosis' and diagnosis_filter:
+            query = query.filter(model.diagnosis.contains(diagnosis_filter))
+        
+        records.extend(query.order_by(model.record_date.desc()).all())
+        
+        # Get unique diagnoses for filter dropdown
+        all_diagnoses = db.session.query(model.diagnosis.distinct())\
+                                 .filter_by(patient_id=patient_id)\
+                                 .all()
+        diagnoses.update(d[0] for d in all_diagnoses if d[0])
+    records.sort(key=lambda record: record.record_date, reverse=True)
+    diagnoses = sorted(diagnoses)
+    
+    return render_template('patients/records.html', 
+                         patient=patient, 
+                         records=records,
+                         diagnoses=diagnoses,
+                         view_filter=view_filter,
+                         date_filter=date_filter,
+                         diagnosis_filter=diagnosis_filter)
+
+@bp.route('/patients/<int:patient_id>/records/add', methods=['GET', 'POST'])
+@login_required
+def add_medical_record(patient_id):
+    patient = Patient.query.get_or_404(patient_id)
+    
+    if request.method == 'POST':
+        try:
+            record_date = datetime.strptime(request.form['record_date'], '%Y-%m-%d').date()
+            
+            # Handle file upload
+            file_path = None
+            file_name = None
+            if 'file' in request.files:
+                file = request.files['file']
+                if file and file.filename != '' and allowed_file(file.filename):
+                    filename = secure_filename(file.filename)
+                    # Create unique filename
+                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                    file_extension = filename.rsplit('.', 1)[1].lower()
+                    unique_filename = f"patient_{patient_id}_{timestamp}.{file_extension}"
+                    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
+                    file.save(file_path)
+                    file_name = filename
+            
+            record = MedicalRecord(
+                patient_id=patient_id,
+                diagnosis=request.form['diagnosis'],
+                description=request.form.get('description', ''),
+                record_date=record_date,
+                file_path=file_path,
+                file_name=file_name
+            )
+            
+            db.session.add(record)
+            db.session.commit()
+            audit.record('create', 'record', record.id, f'{patient.first_name} {patient.last_name}: {record.diagnosis}')
+            event_bus.publish('record', 'create', record.id, patient_id=patient_id)
+            
+            flash('Medical record added successfully!', 'success')
+            return redirect(url_for('records.patient_records', patient_id=patient_id))
+            
+        except ValueError as e:
+            flash('Invalid date format.', 'error')
+        except Exception as e:
+            flash('Error adding medical record. Please try again.', 'error')
+            db.session.rollback()
+    
+    return render_template('patients/add_record.html', patient=patient, date=date)
+
+@bp.route('/patients/<int:patient_id>/records/<int:record_id>/edit', methods=['GET', 'POST'])
+@login_required
+def edit_medical_record(patient_id, record_id):
+    patient = Patient.query.get_or_404(patient_id)
+    record = MedicalRecord.query.get_or_404(record_id)
+    
+    if record.patient_id != patient_id:
+        flash('Record not found for this patient.', 'error')
+        return redirect(url_for('records.patient_records', patient_id=patient_id))
+    
+    if request.method == 'POST':
+        try:
+            record_date = datetime.strptime(request.form['record_date'], '%Y-%m-%d').date()
+            
+            # Handle file upload
+            if 'file' in request.files:
+                file = request.files['file']
+                if file and file.filename != '' and allowed_file(file.filename):
+                    # Delete old file if exists
+                    if record.file_path and os.path.exists(record.file_path):
+                        os.remove(record.file_path)
+                    
+                    filename = secure_filename(file.filename)
+                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                    file_extension = filename.rsplit('.', 1)[1].lower()
+                    unique_filename = f"patient_{patient_id}_{timestamp}.{file_extension}"
+                    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
+                    file.save(file_path)
+                    record.file_path = file_path
+                    record.file_name = filename
+            
+            record.diagnosis = request.form['diagnosis']
+            record.description = request.form.get('description', '')
+            record.record_date = record_date
+            
+            db.session.commit()
+            audit.record('update', 'record', record.id, f'{patient.first_name} {patient.last_name}: {record.diagnosis}')
+            event_bus.publish('record', 'update', record.id, patient_id=patient_id)
+            
+            flash('Medical record updated successfully!', 'success')
+            return redirect(url_for('records.patient_records', patient_id=patient_id))
+            
+        except ValueError as e:
+            flash('Invalid date format.', 'error')
+        except Exception as e:
+            flash('Error updating medical record. Please try again.', 'error')
+            db.session.rollback()
+    
+    return render_template('patients/edit_record.html', patient=patient, record=record)
+
+@bp.route('/patients/<int:patient_id>/records/<int:record_id>/delete', methods=['POST'])
+@login_required
+def delete_medical_record(patient_id, record_id):
+    record = MedicalRecord.query.get_or_404(record_id)
+    
+    if record.patient_id != patient_id:
+        flash('Record not found for this patient.', 'error')
+        return redirect(url_for('records.patient_records', patient_id=patient_id))
+    
+    try:
+        # Delete file if exists
+        if record.file_path and os.path.exists(record.file_path):
+            os.remove(record.file_path)
+        
+        db.session.delete(record)
+        db.session.commit()
+        audit.record('delete', 'record', record_id, f'Record #{record_id} of patient #{patient_id} was deleted')
+        event_bus.publish('record', 'delete', record_id, patient_id=patient_id)
+        
+        flash('Medical record deleted successfully!', 'success')
+    except Exception as e:
+        flash('Error deleting medical record. Please try again.', 'error')
+        db.session.rollback()
+    
+    return redirect(url_for('records.patient_records', patient_id=patient_id))
+
+@bp.route('/download/<int:record_id>')
+@login_required
+def download_file(record_id):
+    record = db.session.get(MedicalRecord, record_id) or db.get_or_404(ArchivedMedicalRecord, record_id)
+    
+    if not record.file_path or not os.path.exists(record.file_path):
+        flash('File not found.', 'error')
+        return redirect(url_for('records.patient_records', patient_id=record.patient_id))
+    
+    audit.record('download', 'record', record.id, f'{record.file_name} (patient #{record.patient_id})')
+    return send_file(record.file_path, as_attachment=True, download_name=record.file_name)
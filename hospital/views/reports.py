@@ -0,0 +1,103 @@
+"""Reports: the API over the daily rollups (rollups.py) and the analytics page (analytics.py)."""
+from flask import Blueprint, flash, jsonify, render_template, request
+from datetime import date, datetime, timedelta
+
+from bulk_export import DATASETS
+from extensions import analytics, bulk_export, db
+from principal import admin_required
+from rollups import APPOINTMENT_GROUPS, PERIODS, appointment_report, daily_count_report, patient_daily, record_daily
+
+bp = Blueprint('reports', __name__)
+
+def report_range():
+    """(start, end, period) from the query string, or an error message."""
+    try:
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else date.today()
+        start = (datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start')
+                 else end - timedelta(days=29))
+    except ValueError:
+        return None, None, None, 'Invalid date format'
+    if start > end:
+        return None, None, None, 'start is after end'
+    period = request.args.get('period', 'day')
+    if period not in PERIODS:
+        return None, None, None, f"period must be one of {', '.join(PERIODS)}"
+    return start, end, period, None
+
+@bp.route('/api/reports/appointments')
+@admin_required
+def appointments_report():
+    start, end, period, error = report_range()
+    if error:
+        return jsonify({'error': error}), 400
+    
+    group_by = [name for name in request.args.get('by', ','.join(APPOINTMENT_GROUPS)).split(',') if name]
+    if set(group_by) - set(APPOINTMENT_GROUPS):
+        return jsonify({'error': f"by must be a subset of {', '.join(APPOINTMENT_GROUPS)}"}), 400
+    
+    rows = appointment_report(db.session.connection(), start, end, period, group_by)
+    return jsonify({'start': start.isoformat(), 'end': end.isoformat(), 'period': period, 'rows': rows})
+
+@bp.route('/api/reports/registrations')
+@admin_required
+def registrations_report():
+    start, end, period, error = report_range()
+    if error:
+        return jsonify({'error': error}), 400
+    
+    rows = daily_count_report(db.session.connection(), patient_daily, start, end, period)
+    return jsonify({'start': start.isoformat(), 'end': end.isoformat(), 'period': period, 'rows': rows})
+
+@bp.route('/api/reports/records')
+@admin_required
+def records_report():
+    start, end, period, error = report_range()
+    if error:
+        return jsonify({'error': error}), 400
+    
+    rows = daily_count_report(db.session.connection(), record_daily, start, end, period)
+    return jsonify({'start': start.isoformat(), 'end': end.isoformat(), 'period': period, 'rows': rows})
+
+def analytics_range():
+    """(start, end) from the query string, defaulting to the last year, or an error message."""
+    try:
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else date.today()
+        start = (datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start')
+                 else end - timedelta(days=364))
+    except ValueError:
+        return None, None, 'Invalid date format'
+    if start > end:
+        return None, None, 'start is after end'
+    if (end - start).days >= analytics.max_days:
+        return None, None, f'The range may span at most {analytics.max_days} days'
+    return start, end, None
+
+@bp.route('/admin/analytics')
+@admin_required
+def analytics_page():
+    start, end, error = analytics_range()
+    report = None
+    if not analytics.available:
+        flash('Analytics need NumPy, which is not installed on this server.', 'error')
+    elif error:
+        flash(error, 'error')
+    else:
+        report = analytics.report(start, end)
+    
+    return render_template('admin/analytics.html',
+                         report=report,
+                         export_datasets=list(DATASETS),
+                         export_formats=bulk_export.formats,
+                         start=request.args.get('start', start.isoformat() if start else ''),
+                         end=request.args.get('end', end.isoformat() if end else ''))
+
+@bp.route('/api/reports/analytics')
+@admin_required
+def analytics_report():
+    if not analytics.available:
+        return jsonify({'error': 'Analytics need NumPy, which is not installed on this server'}), 503
+    start, end, error = analytics_range()
+    if error:
+        return jsonify({'error': error}), 400
+    
+    return jsonify(analytics.report(start, end))
@@ -4,16 +4,19 @@
 import os
 from flask import Flask, render_template, request, redirect, url_for, session, send_from_directory, flash, Response, jsonify
 from models import db, Patient, Doctor, Appointment, MedicalRecord, User, AccessRequest
+from session_store import ServerSessionStore
+from passwords import PasswordHasher, PasswordHasherBusy
+from purge import PatientPurger
+from projections import fetch, PatientRow, DoctorRow, AppointmentRow, PATIENT_ROWS, DOCTOR_ROWS, APPOINTMENT_ROWS
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
 import re
-from werkzeug.security import generate_password_hash, check_password_hash
 
 # Flask App Configuration
 app = Flask(__name__)
 # A secret key is required for sessions
 app.config['SECRET_KEY'] = 'your_very_secret_key_here'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///hospital.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('HOSPITAL_APP_DATABASE_URI', 'sqlite:///hospital.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Configure the directory for file uploads
@@ -22,12 +25,27 @@ if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# Sessions are kept server-side; the cookie only carries an opaque token (see session_store.py)
+app.config['SESSION_USER_KEY'] = 'username'
+session_store = ServerSessionStore(db, app)
+
 # Initialize the SQLAlchemy object with the Flask app
 db.init_app(app)
 
-# Create the database tables when the app starts
-with app.app_context():
+# Password hashes run on a bounded worker pool (see passwords.py)
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('HOSPITAL_APP_PASSWORD_HASH_METHOD', 'scrypt')
+passwords = PasswordHasher(app)
+
+# Deleted patients are purged in the background (see purge.py)
+purger = PatientPurger(db, app)
+
+def init_db():
+    """Creates the database tables and the sample doctors and admin account if missing."""
     db.create_all()
+    # create_all() leaves existing tables alone; add the indexes models gained since
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
     if not Doctor.query.first():
         sample_doctors = [
             Doctor(first_name='John', last_name='Doe', specialization='Cardiology'),
@@ -40,10 +58,29 @@ with app.app_context():
     # Check if Administrator account exists, if not, create it
     if not User.query.filter_by(username='Administrator').first():
         admin = User(username='Administrator')
-        admin.set_password('password') # The default admin password
+        admin.password_hash = passwords.hash('password') # The default admin password
         db.session.add(admin)
         db.session.commit()
 
+# Run once per database with `flask --app app init-db` (no database work happens at import)
+@app.cli.command('init-db')
+def init_db_command():
+    """Create the tables and the default doctors and admin account."""
+    init_db()
+    print('Database initialized.')
+
+@app.cli.command('sessions-sweep')
+def sessions_sweep_command():
+    """Delete expired server-side sessions."""
+    print(f'Removed {session_store.sweep()} expired sessions.')
+
+@app.cli.command('purge')
+def purge_command():
+    """Finish purging deleted patients now."""
+    print(f'Purged {purger.run()} deleted patients.')
+    for purge in purger.stats()['pending']:
+        print(f"Patient {purge['patient_id']} not finished: {purge['error']}")
+
 # --- Authentication Routes ---
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -53,9 +90,26 @@ def login():
         username = request.form['username']
         password = request.form['password']
         user = User.query.filter_by(username=username).first()
-        if user and user.check_password(password):
+        # Give the connection back to the pool while the hash waits for a worker
+        db.session.close()
+        try:
+            valid = user is not None and passwords.verify(user.password_hash, password)
+        except PasswordHasherBusy:
+            flash('Too many sign-ins right now. Please try again in a few seconds.', 'danger')
+            return render_template('login.html'), 503, {'Retry-After': '5'}
+        if valid:
             session['logged_in'] = True
             session['username'] = user.username
+            if passwords.needs_rehash(user.password_hash):
+                # Hash parameters changed since this password was set: upgrade it now
+                try:
+                    password_hash = passwords.hash(password)
+                except PasswordHasherBusy:
+                    password_hash = None  # next login will try again
+                if password_hash:
+                    db.session.add(user)
+                    user.password_hash = password_hash
+                    db.session.commit()
             flash('Login successful!', 'success')
             return redirect(url_for('index'))
         else:
@@ -71,6 +125,16 @@ def logout():
     flash('You have been logged out.', 'success')
     return redirect(url_for('login'))
 
+@app.route('/logout_everywhere')
+def logout_everywhere():
+    """Ends every session of the current user, on all devices."""
+    if not session.get('logged_in'):
+        return redirect(url_for('login'))
+    count = session_store.end_user_sessions(session['username'])
+    session.clear()
+    flash(f'Signed out of {count} session(s).', 'success')
+    return redirect(url_for('login'))
+
 # --- New Route for Handling Access Requests ---
 @app.route('/request_access', methods=['POST'])
 def request_access():
@@ -114,9 +178,11 @@ def index():
         return redirect(url_for('login'))
         
     try:
-        patients = Patient.query.all()
-        appointments = Appointment.query.all()
-        doctors = Doctor.query.all()
+        # Read-only rows instead of ORM objects (see projections.py)
+        connection = db.session.connection()
+        patients = fetch(connection, PATIENT_ROWS, PatientRow)
+        appointments = fetch(connection, APPOINTMENT_ROWS, AppointmentRow)
+        doctors = fetch(connection, DOCTOR_ROWS, DoctorRow)
         return render_template(
             'index.html',
             patients=patients,
@@ -196,7 +262,7 @@ def add_appointment_form():
     """Renders the form to schedule a new appointment."""
     if not session.get('logged_in'):
         return redirect(url_for('login'))
-    patients = Patient.query.all()
+    patients = Patient.live().all()
     doctors = Doctor.query.all()
     return render_template('add_appointment.html', patients=patients, doctors=doctors)
 
@@ -273,15 +339,14 @@ def get_booked_appointments(doctor_id, selected_date):
 
 @app.route('/delete_patient/<int:id>')
 def delete_patient(id):
-    """Deletes a patient and their associated records."""
+    """Deletes a patient; their appointments, records and files are purged in the background."""
     if not session.get('logged_in'):
         return redirect(url_for('login'))
     try:
-        patient_to_delete = Patient.query.get_or_404(id)
-        # Because of cascade='all, delete-orphan' in models.py,
-        # associated appointments and medical records will be deleted automatically.
-        db.session.delete(patient_to_delete)
+        patient_to_delete = Patient.live().filter_by(id=id).first_or_404()
+        purger.mark(patient_to_delete)
         db.session.commit()
+        purger.wake()
         flash('Patient deleted successfully!', 'success')
         return redirect(url_for('index'))
     except Exception as e:
@@ -289,13 +354,20 @@ def delete_patient(id):
         flash(f"An error occurred while deleting a patient: {e}", 'danger')
         return redirect(url_for('index'))
 
+@app.route('/purge_status')
+def purge_status():
+    """Admin route to follow the background purges of deleted patients."""
+    if not session.get('logged_in') or session.get('username') != 'Administrator':
+        return jsonify({'error': 'Access denied.'}), 403
+    return jsonify(purger.stats())
+
 @app.route('/patient_details/<int:id>')
 def patient_details(id):
     """Displays the details and medical records for a specific patient."""
     if not session.get('logged_in'):
         return redirect(url_for('login'))
 
-    patient = Patient.query.get_or_404(id)
+    patient = Patient.live().filter_by(id=id).first_or_404()
     filter_type = request.args.get('filter', 'all')
     records = []
     
@@ -323,7 +395,7 @@ def edit_patient_form(id):
         flash("You must be logged in to access this page.", "warning")
         return redirect(url_for('login'))
     
-    patient = Patient.query.get_or_404(id)
+    patient = Patient.live().filter_by(id=id).first_or_404()
     
     if request.method == 'POST':
         full_name = request.form['full_name']
@@ -356,7 +428,7 @@ def update_patient(id):
     if not session.get('logged_in'):
         return redirect(url_for('login'))
     try:
-        patient = Patient.query.get_or_404(id)
+        patient = Patient.live().filter_by(id=id).first_or_404()
         patient.first_name = request.form['first_name']
         patient.last_name = request.form['last_name']
         # Changed from 'age' to 'date_of_birth'
@@ -439,7 +511,7 @@ def export_all_records(patient_id):
     if not session.get('logged_in'):
         return redirect(url_for('login'))
 
-    patient = Patient.query.get_or_404(patient_id)
+    patient = Patient.live().filter_by(id=patient_id).first_or_404()
     records = MedicalRecord.query.filter_by(patient_id=patient_id).order_by(MedicalRecord.upload_date.asc()).all()
     
     output = f"Medical Records for Patient: {patient.full_name}\n"
@@ -503,7 +575,7 @@ def give_access():
             return render_template('give_access.html')
 
         new_user = User(username=username)
-        new_user.set_password(password)
+        new_user.password_hash = passwords.hash(password)
         db.session.add(new_user)
         db.session.commit()
         flash(f'User "{username}" created successfully.', 'success')
@@ -540,7 +612,7 @@ def approve_request(request_id):
 
     # Create a new user with a temporary password (can be changed later)
     new_user = User(username=username)
-    new_user.set_password("temp_password")
+    new_user.password_hash = passwords.hash("temp_password")
     db.session.add(new_user)
     
     # Delete the access request from the table
@@ -582,6 +654,7 @@ def delete_user(user_id):
     try:
         db.session.delete(user_to_delete)
         db.session.commit()
+        session_store.end_user_sessions(user_to_delete.username)
         flash(f'User "{user_to_delete.username}" deleted successfully.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -600,10 +673,11 @@ def reset_password(user_id):
     user_to_reset = User.query.get_or_404(user_id)
     new_password = "temp_password"
     
-    user_to_reset.set_password(new_password)
+    user_to_reset.password_hash = passwords.hash(new_password)
     
     try:
         db.session.commit()
+        session_store.end_user_sessions(user_to_reset.username)
         flash(f'Password for user "{user_to_reset.username}" has been reset to "{new_password}".', 'success')
     except Exception as e:
         db.session.rollback()
@@ -612,4 +686,6 @@ def reset_password(user_id):
     return redirect(url_for('list_users'))
 
 if __name__ == '__main__':
+    with app.app_context():
+        init_db()
     app.run(debug=True)
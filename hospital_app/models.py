@@ -17,8 +17,14 @@ class Patient(db.Model):
     # UPDATED: Changed from 'age' to 'date_of_birth'
     date_of_birth = db.Column(db.Date)
     gender = db.Column(db.String(10))
-    appointments = db.relationship('Appointment', backref='patient', lazy=True, cascade='all, delete-orphan')
-    medical_records = db.relationship('MedicalRecord', backref='patient', lazy=True, cascade='all, delete-orphan')
+    # No ORM cascade: purge.py deletes their rows in batches instead of loading them all
+    appointments = db.relationship('Appointment', backref='patient', lazy=True, passive_deletes=True)
+    medical_records = db.relationship('MedicalRecord', backref='patient', lazy=True, passive_deletes=True)
+
+    @classmethod
+    def live(cls):
+        """Patients that are not deleted and waiting for their purge."""
+        return cls.query.filter(cls.id.not_in(PatientPurge.pending()))
 
     @property
     def full_name(self):
@@ -48,7 +54,7 @@ class Appointment(db.Model):
     # Corrected attribute name is 'date'
     date_time = db.Column(db.DateTime, nullable=False) 
     diagnosis = db.Column(db.String(255), nullable=True)
-    patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False, index=True)
     doctor_id = db.Column(db.Integer, db.ForeignKey('doctor.id'), nullable=False)
 
 class MedicalRecord(db.Model):
@@ -58,7 +64,26 @@ class MedicalRecord(db.Model):
     diagnosis_summary = db.Column(db.String(200), nullable=True)
     upload_date = db.Column(db.DateTime, nullable=False)
     full_content = db.Column(db.Text, nullable=False)
-    patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False, index=True)
+
+# A deleted patient: hidden at once, their rows and files purged in the background (see purge.py)
+class PatientPurge(db.Model):
+    patient_id = db.Column(db.Integer, primary_key=True)
+    requested_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, index=True)
+    records_total = db.Column(db.Integer, nullable=False, default=0)
+    appointments_total = db.Column(db.Integer, nullable=False, default=0)
+    records = db.Column(db.Integer, nullable=False, default=0)  # removed so far
+    appointments = db.Column(db.Integer, nullable=False, default=0)
+    files = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.String(255))
+    claimed_by = db.Column(db.String(32))  # the purging process's lease (see purge.py)
+    claimed_until = db.Column(db.DateTime)
+
+    @classmethod
+    def pending(cls):
+        """Ids of the patients still to purge; once purged the patient row is gone, and the id may be reused."""
+        return db.select(cls.patient_id).where(cls.finished_at.is_(None))
 
 # New User model for authentication
 class User(db.Model):
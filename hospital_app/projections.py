@@ -0,0 +1,68 @@
+# projections.py
+# Read-only rows for the index page.
+#
+# The index lists every patient, appointment and doctor. Loading them as ORM
+# objects hydrates every column, tracks each object in the session and then
+# lazy-loads the patient and doctor of every appointment one query at a time.
+# These Core SELECTs fetch only the displayed columns (joining the names in)
+# and return compact tuples instead.
+
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import select
+from models import Patient, PatientPurge, Doctor, Appointment
+
+
+class PatientRow(namedtuple('PatientRow', ['id', 'first_name', 'last_name', 'date_of_birth', 'gender'])):
+    __slots__ = ()
+
+    @property
+    def full_name(self):
+        return f"{self.first_name} {self.last_name}"
+
+    @property
+    def age(self):
+        """Calculates the patient's age from their date of birth."""
+        if self.date_of_birth:
+            today = datetime.today().date()
+            return today.year - self.date_of_birth.year - ((today.month, today.day) < (self.date_of_birth.month, self.date_of_birth.day))
+        return None
+
+
+class DoctorRow(namedtuple('DoctorRow', ['id', 'first_name', 'last_name', 'specialization'])):
+    __slots__ = ()
+
+    @property
+    def full_name(self):
+        return f"{self.first_name} {self.last_name}"
+
+
+class AppointmentRow(namedtuple('AppointmentRow', ['id', 'date_time', 'patient_full_name', 'doctor_full_name'])):
+    __slots__ = ()
+
+
+_patient = Patient.__table__
+_doctor = Doctor.__table__
+_appointment = Appointment.__table__
+
+# Deleted patients waiting for their purge are left out (see purge.py)
+PATIENT_ROWS = select(_patient.c.id, _patient.c.first_name, _patient.c.last_name,
+                      _patient.c.date_of_birth, _patient.c.gender).where(_patient.c.id.not_in(PatientPurge.pending()))
+
+DOCTOR_ROWS = select(_doctor.c.id, _doctor.c.first_name, _doctor.c.last_name, _doctor.c.specialization)
+
+APPOINTMENT_ROWS = select(
+    _appointment.c.id,
+    _appointment.c.date_time,
+    (_patient.c.first_name + ' ' + _patient.c.last_name).label('patient_full_name'),
+    (_doctor.c.first_name + ' ' + _doctor.c.last_name).label('doctor_full_name'),
+).select_from(
+    _appointment.join(_patient, _appointment.c.patient_id == _patient.c.id)
+                .join(_doctor, _appointment.c.doctor_id == _doctor.c.id)
+).where(_patient.c.id.not_in(PatientPurge.pending()))
+
+
+def fetch(connection, statement, row_type):
+    """Executes a Core statement and wraps each row in row_type."""
+    make = row_type._make
+    return [make(row) for row in connection.execute(statement)]
@@ -0,0 +1,211 @@
+# purge.py
+# Deleting patients: a tombstone now, the purge in the background.
+#
+# Same scheme as hospital/purge.py (see there for the details). Deleting a
+# patient used to go through the ORM cascade, which loaded every appointment
+# and record (with its full text) into the session and deleted them in the
+# request, one transaction holding the write lock throughout; their files
+# stayed in uploads/. delete_patient now only calls mark(), which adds a
+# patient_purge row: the patient is hidden from then on (Patient.live() and
+# the Core rows in projections.py leave out pending purges). A worker thread
+# (one per process, started on the first request) removes their records
+# with their uploaded files, then their appointments, PURGE_BATCH_SIZE rows
+# per transaction with PURGE_BATCH_PAUSE between transactions, and last the
+# patient row. A file another patient's record also points to (uploads are
+# named after diagnosis, date and original name) is kept.
+#
+# The searchable text of a record is its full_content column, so it goes
+# with the row; there is no separate index to clean up.
+#
+# patient_purge keeps the progress (rows and files removed against the
+# totals, the last error); /purge_status and `flask --app app purge` show
+# it. Unfinished purges are picked up again every PURGE_POLL_INTERVAL
+# seconds, so a restart or a failed batch only delays them.
+#
+# Every process's worker polls, so a purge is claimed first: a conditional
+# UPDATE of claimed_by/claimed_until that matches nothing while another
+# process's lease (PURGE_LEASE seconds) is current, and the purge is skipped.
+# Each batch renews the lease as its first statement, which takes the write
+# lock too, so the rows it deletes and the files it counts are its own.
+
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, null, or_, select, update
+
+from models import Appointment, MedicalRecord, Patient, PatientPurge
+
+
+class PatientPurger:
+    """Tombstones deleted patients and purges them from a background thread."""
+
+    def __init__(self, db, app=None):
+        self.db = db
+        self.app = None
+        self.batch_size = 0
+        self.batch_pause = 0
+        self.poll_interval = 0
+        self.lease = timedelta(0)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._requested = False
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PURGE_BATCH_SIZE', 500)
+        app.config.setdefault('PURGE_BATCH_PAUSE', 0.05)  # seconds between batches
+        app.config.setdefault('PURGE_POLL_INTERVAL', 10)  # seconds between looks for unfinished purges
+        app.config.setdefault('PURGE_LEASE', 60)  # seconds a claimed purge may go without a batch
+        app.extensions['purger'] = self
+        self.app = app
+        self.batch_size = app.config['PURGE_BATCH_SIZE']
+        self.batch_pause = app.config['PURGE_BATCH_PAUSE']
+        self.poll_interval = app.config['PURGE_POLL_INTERVAL']
+        self.lease = timedelta(seconds=app.config['PURGE_LEASE'])
+        app.before_request(self._ensure_worker)
+
+    def mark(self, patient):
+        """Tombstones patient in the caller's transaction; call wake() after the commit."""
+        session = self.db.session
+        # SQLite hands a purged patient's id out again when it was the newest: drop the old purge's row
+        session.execute(delete(PatientPurge).where(PatientPurge.patient_id == patient.id))
+        session.add(PatientPurge(
+            patient_id=patient.id,
+            records_total=session.scalar(select(func.count()).where(MedicalRecord.patient_id == patient.id)),
+            appointments_total=session.scalar(select(func.count()).where(Appointment.patient_id == patient.id))))
+
+    def wake(self):
+        """Starts this process's worker if needed and has it purge now."""
+        self._ensure_worker()
+        with self._lock:
+            self._requested = True
+            self._wakeup.notify()
+
+    def run(self):
+        """Purges every deleted patient; returns how many were finished."""
+        with self.app.app_context():
+            with self.db.engine.connect() as connection:
+                patient_ids = connection.scalars(PatientPurge.pending().order_by(PatientPurge.requested_at)).all()
+            finished = 0
+            for patient_id in patient_ids:
+                try:
+                    finished += self.purge(patient_id)
+                except Exception as e:
+                    print(f"Could not purge patient {patient_id}, will retry: {e}")
+                    with self.db.engine.begin() as connection:
+                        connection.execute(update(PatientPurge).where(PatientPurge.patient_id == patient_id)
+                                           .values(error=str(e)[:255]))
+            return finished
+
+    def purge(self, patient_id):
+        """Deletes patient_id's records, files and appointments in batches, then the patient.
+
+        Returns False when another process holds the purge.
+        """
+        claim = self._claim(patient_id)
+        if claim is None:
+            return False
+        for model, column in ((MedicalRecord, 'records'), (Appointment, 'appointments')):
+            while True:
+                batch = self._purge_batch(model, column, patient_id, claim)
+                if batch is None:
+                    return False
+                if not batch:
+                    break
+                time.sleep(self.batch_pause)  # let requests write between batches
+        with self.db.engine.begin() as connection:
+            if not self._renew(connection, patient_id, claim):
+                return False
+            connection.execute(delete(Patient).where(Patient.id == patient_id))
+            connection.execute(update(PatientPurge).where(PatientPurge.patient_id == patient_id)
+                               .values(finished_at=datetime.utcnow(), error=None, claimed_by=None, claimed_until=None))
+        return True
+
+    def _claim(self, patient_id):
+        """Takes the purge of patient_id unless another lease on it is current; returns the claim or None."""
+        claim, now = uuid.uuid4().hex, datetime.utcnow()
+        with self.db.engine.begin() as connection:
+            claimed = connection.execute(
+                update(PatientPurge)
+                .where(PatientPurge.patient_id == patient_id, PatientPurge.finished_at.is_(None),
+                       or_(PatientPurge.claimed_until.is_(None), PatientPurge.claimed_until < now))
+                .values(claimed_by=claim, claimed_until=now + self.lease)).rowcount
+        return claim if claimed else None
+
+    def _renew(self, connection, patient_id, claim):
+        """Extends the lease in connection's transaction, taking the write lock; False if it was lost."""
+        renewed = connection.execute(
+            update(PatientPurge).where(PatientPurge.patient_id == patient_id, PatientPurge.claimed_by == claim)
+            .values(claimed_until=datetime.utcnow() + self.lease)).rowcount
+        if not renewed:
+            print(f"Lost the purge of patient {patient_id} to another process")
+        return bool(renewed)
+
+    def _purge_batch(self, model, column, patient_id, claim):
+        """Purges one batch; returns False when there is none left, None when the lease was lost."""
+        with_files = model is MedicalRecord
+        with self.db.engine.begin() as connection:
+            if not self._renew(connection, patient_id, claim):
+                return None
+            rows = connection.execute(
+                select(model.id, model.file_path if with_files else null()).where(model.patient_id == patient_id)
+                .order_by(model.id).limit(self.batch_size)).all()
+            if not rows:
+                return False
+            files = set()
+            if with_files:
+                paths = {path for _, path in rows}
+                shared = set(connection.scalars(select(MedicalRecord.file_path).where(
+                    MedicalRecord.file_path.in_(paths), MedicalRecord.patient_id != patient_id)))
+                files = paths - shared
+            deleted = connection.execute(delete(model).where(model.id.in_([row[0] for row in rows]))).rowcount
+            if deleted != len(rows):
+                # Cannot happen while we hold the write lock; start the batch over rather than miscount
+                connection.rollback()
+                return True
+            # Before the commit: a failed batch finds them gone, but a committed one leaves none behind
+            for path in files:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            connection.execute(update(PatientPurge).where(PatientPurge.patient_id == patient_id).values({
+                column: getattr(PatientPurge, column) + deleted, 'files': PatientPurge.files + len(files)}))
+        return True
+
+    def stats(self, limit=20):
+        """Unfinished purges and the most recent limit ones."""
+        def row(purge):
+            return {'patient_id': purge.patient_id, 'requested_at': purge.requested_at.isoformat(),
+                    'finished_at': purge.finished_at.isoformat() if purge.finished_at else None,
+                    'records': purge.records, 'records_total': purge.records_total,
+                    'appointments': purge.appointments, 'appointments_total': purge.appointments_total,
+                    'files': purge.files, 'error': purge.error}
+        pending = PatientPurge.query.filter(PatientPurge.finished_at.is_(None)).order_by(PatientPurge.requested_at)
+        recent = PatientPurge.query.filter(PatientPurge.finished_at.is_not(None)) \
+                                   .order_by(PatientPurge.finished_at.desc()).limit(limit)
+        return {'pending': [row(purge) for purge in pending], 'recent': [row(purge) for purge in recent]}
+
+    def _ensure_worker(self):
+        # Threads don't survive fork, so a pre-forked worker starts its own
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    threading.Thread(target=self._work_loop, name='patient-purge', daemon=True).start()
+                    self._pid = os.getpid()
+
+    def _work_loop(self):
+        while True:
+            try:
+                self.run()
+            except Exception as e:
+                print(f"Patient purge failed, will retry: {e}")
+            with self._lock:
+                if not self._requested:
+                    self._wakeup.wait(self.poll_interval)
+                self._requested = False
@@ -0,0 +1,271 @@
+# session_store.py
+# Server-side sessions: a small opaque cookie, the data kept on the server.
+#
+# Same store as hospital/session_store.py (see there for the details): the
+# cookie is "<token>.<version>", the data lives in the server_session table
+# keyed by the token's SHA-256, each worker keeps an LRU of recent sessions
+# that is trusted only for the cookie's version and SESSION_CACHE_TTL
+# seconds, last-seen times are written in batches, expired rows are swept
+# periodically, and end_user_sessions() logs a user out everywhere (a write to
+# a session whose row is gone starts the client over signed out instead of
+# inserting it again). Here the signed-in user is session['username'].
+#
+# This and passwords.py are copies of hospital/'s modules, not imports: the
+# two apps ship and run as separate projects (hospital.zip and
+# hospital_app.zip, each started from its own directory with flat imports),
+# so neither can import from the other. Fixes go into both.
+
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from sqlalchemy import Column, Float, Integer, String, Text, bindparam, delete, insert, select, update
+from werkzeug.datastructures import CallbackDict
+
+serializer = TaggedJSONSerializer()
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session dict that remembers its token, version and signed-in user."""
+
+    def __init__(self, initial=None, token=None, version=0, user=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.token = token
+        self.version = version
+        self.user = user
+        self.modified = False
+
+
+class ServerSessionStore(SessionInterface):
+    """Flask session interface backed by an LRU in front of a database table."""
+
+    def __init__(self, db, app=None):
+        self.db = db
+        # Own bind (same database, own connection pool): saving a session must not
+        # wait for a pooled connection while the request still holds one
+        self.table = db.Table(
+            'server_session',
+            Column('id', String(64), primary_key=True),  # SHA-256 of the cookie token
+            Column('user_key', String(80), index=True),
+            Column('data', Text, nullable=False),
+            Column('version', Integer, nullable=False),
+            Column('last_seen', Float, nullable=False),  # Unix time
+            Column('expires_at', Float, nullable=False, index=True),
+            bind_key='sessions',
+        )
+        self.user_key = 'user_id'
+        self.idle_timeout = 0
+        self.cache_size = 0
+        self.cache_ttl = 0
+        self.touch_interval = 0
+        self.sweep_interval = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # id -> (data JSON, version, user, loaded at)
+        self._touched = {}  # id -> last seen, not yet written
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._last_sweep = time.monotonic()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Call before ``db.init_app(app)``, which creates the 'sessions' bind's engine."""
+        app.config.setdefault('SQLALCHEMY_BINDS', {})
+        app.config['SQLALCHEMY_BINDS'].setdefault('sessions', app.config['SQLALCHEMY_DATABASE_URI'])
+        app.config.setdefault('SESSION_USER_KEY', 'user_id')
+        app.config.setdefault('SESSION_IDLE_TIMEOUT', timedelta(hours=12))
+        app.config.setdefault('SESSION_CACHE_SIZE', 10000)
+        app.config.setdefault('SESSION_CACHE_TTL', 30)
+        app.config.setdefault('SESSION_TOUCH_INTERVAL', 60)
+        app.config.setdefault('SESSION_SWEEP_INTERVAL', 600)
+        app.extensions['session_store'] = self
+        app.session_interface = self
+        self.user_key = app.config['SESSION_USER_KEY']
+        self.idle_timeout = app.config['SESSION_IDLE_TIMEOUT'].total_seconds()
+        self.cache_size = app.config['SESSION_CACHE_SIZE']
+        self.cache_ttl = app.config['SESSION_CACHE_TTL']
+        self.touch_interval = app.config['SESSION_TOUCH_INTERVAL']
+        self.sweep_interval = app.config['SESSION_SWEEP_INTERVAL']
+
+    # Flask session interface
+
+    def open_session(self, app, request):
+        token, version = self._parse_cookie(request.cookies.get(self.get_cookie_name(app)))
+        if token is None:
+            return ServerSession()
+        session_id = self._session_id(token)
+        entry = self._cached(session_id, version)
+        if entry is None:
+            self.misses += 1
+            row = self._load(session_id)
+            if row is None:
+                return ServerSession()
+            entry = self._remember(session_id, row.data, row.version, row.user_key)
+        else:
+            self.hits += 1
+        data, version, user, _ = entry
+        with self._lock:
+            self._touched[session_id] = time.time()
+        return ServerSession(serializer.loads(data), token, version, user)
+
+    def save_session(self, app, session, response):
+        if not session:
+            if session.token is not None and session.modified:
+                self._delete(self._session_id(session.token))
+                self._delete_cookie(app, response)
+            self._maintain()
+            return
+        user = self._user_of(session)
+        if session.modified or session.token is None or user != session.user:
+            if session.token is not None and user != session.user:
+                # Signed-in user changed: new token, so an old cookie can't ride the login
+                self._delete(self._session_id(session.token))
+                session.token = None
+            token = session.token or secrets.token_urlsafe(32)
+            version = self._write(self._session_id(token), serializer.dumps(dict(session)), session.version + 1,
+                                  user, session.token is None)
+            if version is None:
+                # Ended (log out everywhere, sweep) while this request ran: start over signed out
+                self._delete_cookie(app, response)
+                self._maintain()
+                return
+            response.set_cookie(self.get_cookie_name(app), f'{token}.{version}',
+                                expires=self.get_expiration_time(app, session), domain=self.get_cookie_domain(app),
+                                path=self.get_cookie_path(app), secure=self.get_cookie_secure(app),
+                                httponly=self.get_cookie_httponly(app), samesite=self.get_cookie_samesite(app))
+            response.vary.add('Cookie')
+        self._maintain()
+
+    # Maintenance and "log out everywhere"
+
+    def end_user_sessions(self, user):
+        """Deletes every session signed in as user; returns how many there were."""
+        user = str(user)
+        with self._lock:
+            for session_id in [key for key, entry in self._entries.items() if entry[2] == user]:
+                del self._entries[session_id]
+        with self._engine().begin() as connection:
+            return connection.execute(delete(self.table).where(self.table.c.user_key == user)).rowcount
+
+    def flush(self):
+        """Writes the batched last-seen times."""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._last_flush = time.monotonic()
+        if not touched:
+            return 0
+        statement = (update(self.table).where(self.table.c.id == bindparam('session_id'))
+                     .values(last_seen=bindparam('seen'), expires_at=bindparam('expires')))
+        with self._engine().begin() as connection:
+            connection.execute(statement, [{'session_id': session_id, 'seen': seen,
+                                            'expires': seen + self.idle_timeout}
+                                           for session_id, seen in touched.items()])
+        return len(touched)
+
+    def sweep(self):
+        """Deletes expired sessions; returns how many."""
+        self.flush()
+        with self._lock:
+            self._last_sweep = time.monotonic()
+        with self._engine().begin() as connection:
+            return connection.execute(delete(self.table).where(self.table.c.expires_at < time.time())).rowcount
+
+    def clear_cache(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                'pending_touches': len(self._touched)}
+
+    def _maintain(self):
+        now = time.monotonic()
+        if now - self._last_sweep >= self.sweep_interval:
+            self.sweep()
+        elif now - self._last_flush >= self.touch_interval:
+            self.flush()
+
+    # Storage
+
+    def _delete_cookie(self, app, response):
+        response.delete_cookie(self.get_cookie_name(app), domain=self.get_cookie_domain(app),
+                               path=self.get_cookie_path(app), secure=self.get_cookie_secure(app),
+                               httponly=self.get_cookie_httponly(app), samesite=self.get_cookie_samesite(app))
+
+    def _engine(self):
+        return self.db.engines['sessions']
+
+    def _parse_cookie(self, value):
+        token, _, version = (value or '').partition('.')
+        if not token or not version.isdigit():
+            return None, 0
+        return token, int(version)
+
+    def _session_id(self, token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _user_of(self, session):
+        user = session.get(self.user_key)
+        return str(user) if user is not None else None
+
+    def _cached(self, session_id, version):
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or entry[1] != version or time.monotonic() - entry[3] > self.cache_ttl:
+                return None
+            self._entries.move_to_end(session_id)
+            return entry
+
+    def _remember(self, session_id, data, version, user):
+        entry = (data, version, user, time.monotonic())
+        with self._lock:
+            self._entries[session_id] = entry
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.cache_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _load(self, session_id):
+        table = self.table
+        with self._engine().connect() as connection:
+            return connection.execute(
+                select(table.c.data, table.c.version, table.c.user_key)
+                .where(table.c.id == session_id, table.c.expires_at >= time.time())
+            ).first()
+
+    def _write(self, session_id, data, version, user, new):
+        """Stores the session; returns its new version, or None when its row is gone."""
+        now = time.time()
+        values = {'data': data, 'version': version, 'user_key': user,
+                  'last_seen': now, 'expires_at': now + self.idle_timeout}
+        with self._engine().begin() as connection:
+            if new:
+                connection.execute(insert(self.table).values(id=session_id, **values))
+            elif not connection.execute(update(self.table).where(self.table.c.id == session_id)
+                                        .values(**values)).rowcount:
+                # Deleted since it was read: inserting it again would undo a revocation
+                self._forget(session_id)
+                return None
+        with self._lock:
+            self._touched.pop(session_id, None)
+        self._remember(session_id, data, version, user)
+        return version
+
+    def _forget(self, session_id):
+        with self._lock:
+            self._entries.pop(session_id, None)
+            self._touched.pop(session_id, None)
+
+    def _delete(self, session_id):
+        self._forget(session_id)
+        with self._engine().begin() as connection:
+            connection.execute(delete(self.table).where(self.table.c.id == session_id))